@@ -0,0 +1,69 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Sequence
+
+from main import UnmannedAircraft
+
+DEFAULT_CHUNK_SIZE = 1024  # 每个线程任务解码的报文数
+
+
+def decode_frame(data: bytes) -> UnmannedAircraft:
+    """将报文解码为新的航空器对象
+
+    每次调用都使用独立的对象，不读写任何共享的可变状态，可以在多个线程中并发调用。
+    """
+    ua = UnmannedAircraft()
+    ua.decode_message(data)
+    return ua
+
+
+def _decode_chunk(chunk: Sequence[bytes], skip_errors: bool) -> List[Optional[UnmannedAircraft]]:
+    results = []
+    for data in chunk:
+        try:
+            results.append(decode_frame(data))
+        except (ValueError, NotImplementedError):
+            if not skip_errors:
+                raise
+            results.append(None)
+    return results
+
+
+class BatchDecoder:
+    """基于线程池的批量解码器，结果顺序与输入一致
+
+    报文按块分配给线程，每块内顺序解码，减少任务调度开销。在启用GIL的CPython上
+    线程只能交替执行，在自由线程（free-threaded）构建上可以并行解码，且无需像多进程那样序列化数据。
+    """
+
+    def __init__(self, workers: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        if chunk_size < 1:
+            raise ValueError("每块报文数必须大于0")
+        self.chunk_size = chunk_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="remote-id-decode")
+
+    def decode(self, messages: Iterable[bytes], skip_errors: bool = False) -> List[Optional[UnmannedAircraft]]:
+        """批量解码报文；skip_errors 为 True 时无法解码的报文对应 None，否则抛出第一个错误"""
+        if not isinstance(messages, Sequence):
+            messages = list(messages)
+        size = self.chunk_size
+        chunks = [messages[i:i + size] for i in range(0, len(messages), size)]
+        results: List[Optional[UnmannedAircraft]] = []
+        for chunk_results in self._executor.map(_decode_chunk, chunks, [skip_errors] * len(chunks)):
+            results.extend(chunk_results)
+        return results
+
+    def close(self) -> None:
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def decode_batch(messages: Iterable[bytes], workers: Optional[int] = None,
+                 skip_errors: bool = False) -> List[Optional[UnmannedAircraft]]:
+    """使用临时线程池批量解码报文，频繁调用时应复用 BatchDecoder"""
+    with BatchDecoder(workers) as decoder:
+        return decoder.decode(messages, skip_errors)
@@ -0,0 +1,839 @@
+"""性能基准测试
+
+用法: python bench.py [名称 ...]，不带参数时运行全部基准
+"""
+import sys
+import timeit
+
+from main import UnmannedAircraft
+from enums import *
+
+BENCHMARKS = {}
+
+
+def benchmark(func):
+    """注册基准测试函数"""
+    BENCHMARKS[func.__name__.removeprefix('bench_')] = func
+    return func
+
+
+def report(name: str, seconds: float, count: int) -> None:
+    """输出单项耗时与吞吐量"""
+    print(f"{name:<40} {seconds / count * 1e6:10.3f} us/op {count / seconds:14,.0f} op/s")
+
+
+def sample_location() -> bytes:
+    """生成一个位置向量报文"""
+    return UnmannedAircraft(
+        operational_status=OperationalStatus.AIRBORNE,
+        direction=200,
+        horizontal_speed=15.0,
+        latitude=39.9042,
+        longitude=116.4074,
+        geodetic_altitude=100.0,
+    ).encode_location()
+
+
+@benchmark
+def bench_frame_view():
+    """完整解码与惰性视图读取经纬度的对比"""
+    from view import FrameView
+
+    message = sample_location()
+    count = 100000
+
+    def full_decode():
+        ua = UnmannedAircraft()
+        ua.decode_message(message)
+        return ua.latitude, ua.longitude
+
+    def view_projection():
+        view = FrameView(message)
+        return view.latitude, view.longitude
+
+    report("decode_message + lat/lon", timeit.timeit(full_decode, number=count), count)
+    report("FrameView lat/lon", timeit.timeit(view_projection, number=count), count)
+
+
+@benchmark
+def bench_filters():
+    """逐个解码后筛选与字节级向量化筛选的对比"""
+    import random
+    import filters
+    from view import FrameView
+
+    random.seed(0)
+    frames = []
+    for _ in range(100000):
+        ua = UnmannedAircraft(latitude=random.uniform(-60, 60), longitude=random.uniform(-180, 180))
+        frames.append(ua.encode_location() if random.random() < 0.5 else ua.encode_system())
+    buffer = b''.join(frames)
+    predicate = filters.bounding_box(30, 100, 45, 125)
+
+    def decode_all():
+        selected = []
+        for frame in frames:
+            ua = UnmannedAircraft()
+            ua.decode_message(frame)
+            if (FrameView(frame).message_type == MessageType.LOCATION
+                    and 30 <= ua.latitude <= 45 and 100 <= ua.longitude <= 125):
+                selected.append(frame)
+        return selected
+
+    report("decode_message + filter (per frame)", timeit.timeit(decode_all, number=1), len(frames))
+    report("bounding_box predicate (per frame)", timeit.timeit(lambda: predicate.select(buffer), number=10), len(frames) * 10)
+
+
+@benchmark
+def bench_daemon():
+    """单个报文：冷启动解释器解码与常驻解码服务的请求延迟对比"""
+    import os
+    import subprocess
+    import tempfile
+    import time
+    from daemon import DecodeClient
+
+    message = sample_location()
+    here = os.path.dirname(os.path.abspath(__file__))
+    script = f"from records import decode_records; decode_records(bytes.fromhex('{message.hex()}'))"
+
+    count = 20
+    start = time.perf_counter()
+    for _ in range(count):
+        subprocess.run([sys.executable, "-c", script], cwd=here, check=True)
+    report("cold start python + decode", time.perf_counter() - start, count)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "decoder.sock")
+        server = subprocess.Popen([sys.executable, "-m", "daemon", "-s", path, "-w", "2"], cwd=here)
+        try:
+            deadline = time.monotonic() + 10
+            while not os.path.exists(path):
+                if server.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("解码服务未能启动")
+                time.sleep(0.01)
+            with DecodeClient(path) as client:
+                client.decode(message)
+                count = 10000
+                report("daemon request (reused connection)", timeit.timeit(lambda: client.decode(message), number=count), count)
+            count = 1000
+
+            def connect_and_decode():
+                with DecodeClient(path) as client:
+                    client.decode(message)
+            report("daemon request (new connection)", timeit.timeit(connect_and_decode, number=count), count)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+@benchmark
+def bench_threads():
+    """线程池批量解码在不同线程数下的吞吐量（自由线程构建上可并行）"""
+    import os
+    import sysconfig
+    from batch import BatchDecoder
+
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print(f"Python {sys.version.split()[0]}  free-threaded build: {bool(sysconfig.get_config_var('Py_GIL_DISABLED'))}"
+          f"  GIL enabled: {gil}  CPUs: {os.cpu_count()}")
+    ua = UnmannedAircraft(id="DRONE001", latitude=39.9042, longitude=116.4074)
+    messages = [ua.encode_location(), ua.encode_basic_id(), ua.encode_system()] * 20000
+    for workers in (1, 2, 4, 8):
+        with BatchDecoder(workers) as decoder:
+            report(f"BatchDecoder workers={workers}", timeit.timeit(lambda: decoder.decode(messages), number=1), len(messages))
+
+
+@benchmark
+def bench_fleet():
+    """100万架航空器的结构化数组状态表：内存、写入和快照"""
+    import time
+    import tracemalloc
+    import numpy as np
+    from fleet import FleetStore
+
+    count = 1000000
+    addresses = [i.to_bytes(6, 'big') for i in range(count)]
+    ua = UnmannedAircraft(id="DRONE001", latitude=39.9042, longitude=116.4074)
+    location, basic_id = ua.encode_location(), ua.encode_basic_id()
+
+    tracemalloc.start()
+    store = FleetStore(capacity=count)
+    store.update_many(addresses, np.frombuffer(location * count, dtype=np.uint8).reshape(-1, 25), 1.0)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"FleetStore memory: {current / count:.0f} B/aircraft (arrays {store.nbytes / count:.0f} B)")
+    del store
+
+    store = FleetStore(capacity=count)
+    start = time.perf_counter()
+    for address in addresses:
+        store.update(address, location, 1.0)
+    report("FleetStore.update (new aircraft)", time.perf_counter() - start, count)
+
+    report("FleetStore.update (existing aircraft)", timeit.timeit(lambda: store.update(addresses[12345], basic_id, 2.0), number=count), count)
+    frames = np.frombuffer(location * count, dtype=np.uint8).reshape(-1, 25)
+    report("FleetStore.update_many", timeit.timeit(lambda: store.update_many(addresses, frames, 3.0), number=1), count)
+    report("FleetStore.location snapshot (per aircraft)", timeit.timeit(store.location, number=1), count)
+
+    tracemalloc.start()
+    sample = 10000
+    fleet = {}
+    for address in addresses[:sample]:
+        aircraft = fleet[address] = UnmannedAircraft()
+        aircraft.decode_message(location)
+        aircraft.decode_message(basic_id)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"dict of UnmannedAircraft memory: {current / sample:.0f} B/aircraft")
+
+
+@benchmark
+def bench_geofence():
+    """5000个禁飞区、10万个位置：网格索引与逐个多边形检查"""
+    import numpy as np
+    from geofence import GeofenceIndex, Zone
+
+    rng = np.random.default_rng(0)
+    zones = []
+    for i, (lat, lon) in enumerate(rng.uniform((30.0, 110.0), (40.0, 120.0), (5000, 2))):
+        angles = np.sort(rng.uniform(0, 2 * np.pi, 8))
+        radius = rng.uniform(0.005, 0.05, 8)
+        zones.append(Zone(f"zone{i}", list(zip(lat + radius * np.sin(angles), lon + radius * np.cos(angles)))))
+    index = GeofenceIndex(zones)
+
+    count = 100000
+    latitude = rng.uniform(30.0, 40.0, count)
+    longitude = rng.uniform(110.0, 120.0, count)
+    altitude = np.full(count, 100.0)
+    report("GeofenceIndex.contains (per point)", timeit.timeit(lambda: index.contains(latitude, longitude, altitude), number=1), count)
+    report("GeofenceIndex.zones_at", timeit.timeit(lambda: index.zones_at(latitude[0], longitude[0], 100.0), number=10000), 10000)
+
+    sample = 1000
+    bounds = index._bounds
+
+    def linear_scan():
+        # 不用网格：每个点与全部禁飞区的外接矩形比较，再对命中的做射线法判断
+        for i in range(sample):
+            lat, lon = latitude[i:i + 1], longitude[i:i + 1]
+            hits = np.flatnonzero((bounds[:, 0] <= lat) & (lat <= bounds[:, 2]) & (bounds[:, 1] <= lon) & (lon <= bounds[:, 3]))
+            for zone in hits.tolist():
+                index._inside(zone, lat, lon)
+    report("linear scan over all zones (per point)", timeit.timeit(linear_scan, number=1), sample)
+
+
+@benchmark
+def bench_vlos():
+    """100万架航空器的控制站距离与视距检查：全机群重算与增量更新"""
+    import numpy as np
+    from vlos import VLOSMonitor
+
+    count = 1000000
+    rng = np.random.default_rng(0)
+    addresses = [i.to_bytes(6, 'big') for i in range(count)]
+    ua = UnmannedAircraft(latitude=39.9042, longitude=116.4074, geodetic_altitude=120.0,
+                          operator_latitude=39.9, operator_longitude=116.4, area_radius=500.0)
+    location = np.frombuffer(ua.encode_location(), dtype=np.uint8)
+    frames = np.tile(location, (count, 1))
+    latitudes = (rng.uniform(39.89, 39.91, count) * 1e7).astype('<i4')
+    frames[:, 5:9] = latitudes.view(np.uint8).reshape(-1, 4)
+
+    monitor = VLOSMonitor(vlos_range=500.0)
+    monitor.store.update_many(addresses, np.tile(np.frombuffer(ua.encode_system(), dtype=np.uint8), (count, 1)), 1.0)
+    monitor.store.update_many(addresses, frames, 1.0)
+    report("VLOSMonitor.refresh (per aircraft)", timeit.timeit(monitor.refresh, number=1), count)
+
+    changed = 1000
+    batch = [addresses[i] for i in rng.choice(count, changed, replace=False)]
+    def update_and_tick():
+        monitor.update_many(batch, frames[:changed], 2.0)
+        monitor.tick()
+    report("update_many + tick (1000 changed, per aircraft)", timeit.timeit(update_and_tick, number=100), 100 * changed)
+    data = ua.encode_location()
+    report("VLOSMonitor.update", timeit.timeit(lambda: monitor.update(addresses[0], data, 3.0), number=100000), 100000)
+    monitor.tick()
+
+
+@benchmark
+def bench_conflict():
+    """5万架航空器的冲突检测：全量计算与增量更新"""
+    import numpy as np
+    from conflict import ConflictDetector
+
+    count = 50000
+    rng = np.random.default_rng(0)
+    addresses = [i.to_bytes(6, 'big') for i in range(count)]
+    ua = UnmannedAircraft()
+    frames = []
+    for _ in range(count):
+        # 约 220km x 170km 区域内，平均间距约 870 米
+        ua.latitude, ua.longitude = 39.0 + rng.uniform(0, 2.0), 115.5 + rng.uniform(0, 2.0)
+        ua.geodetic_altitude = float(rng.uniform(30, 120))
+        ua.direction, ua.horizontal_speed = int(rng.integers(0, 360)), float(rng.uniform(0, 25))
+        ua.vertical_speed = float(rng.uniform(-2, 2))
+        frames.append(ua.encode_location())
+    frames = np.frombuffer(b''.join(frames), dtype=np.uint8).reshape(-1, 25)
+
+    detector = ConflictDetector()
+    detector.update_many(addresses, frames, 0.0)
+    start = timeit.default_timer()
+    conflicts = detector.tick(1.0)
+    report("ConflictDetector full tick (per aircraft)", timeit.default_timer() - start, count)
+    print(f"  {detector.pairs_tested:,} pairs tested of {count * (count - 1) // 2:,}, {len(conflicts):,} conflicts")
+
+    for changed in (500, 5000):
+        def incremental():
+            slots = rng.choice(count, changed, replace=False)
+            detector.update_many([addresses[i] for i in slots], frames[slots], 1.0)
+            detector.tick(1.0)
+        report(f"update_many + tick ({changed} changed, per aircraft)", timeit.timeit(incremental, number=10), 10 * changed)
+        print(f"  {detector.pairs_tested:,} pairs tested")
+
+
+@benchmark
+def bench_generator():
+    """模拟机群负载生成：批量编码与逐个编码，以及限速发送的实际速率"""
+    import socket
+    from generator import FleetSimulator, LoadGenerator, UDPSink
+
+    class NullSink:
+        def send(self, records):
+            pass
+
+    simulator = FleetSimulator(10000, seed=0)
+    load = LoadGenerator(simulator, malformed=0.001, seed=0)
+    count = 200000
+    report("LoadGenerator.batch (per frame)", timeit.timeit(lambda: load.batch(count), number=1), count)
+
+    ua = UnmannedAircraft(id="SIM0000000001", latitude=39.9042, longitude=116.4074, description="Simulated flight 1")
+    encoders = [ua.encode_location, ua.encode_basic_id, ua.encode_location, ua.encode_system, ua.encode_location,
+                ua.encode_self_id, ua.encode_location, ua.encode_operator_id, ua.encode_location]
+    report("UnmannedAircraft encoders (per frame)",
+           timeit.timeit(lambda: [encode() for encode in encoders], number=count // len(encoders)), count)
+
+    stats = load.run(NullSink(), limit=count)
+    print(f"unlimited, null sink: {stats.achieved:,.0f} frames/s")
+    stats = LoadGenerator(simulator, rate=50000).run(NullSink(), duration=2.0)
+    print(f"target 50,000/s, null sink: {stats.achieved:,.0f} frames/s")
+
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))
+    sink = UDPSink("127.0.0.1", receiver.getsockname()[1])
+    stats = LoadGenerator(simulator, rate=50000).run(sink, duration=2.0)
+    print(f"target 50,000/s, UDP localhost: {stats.achieved:,.0f} frames/s")
+    sink.close()
+    receiver.close()
+
+
+@benchmark
+def bench_replay():
+    """抓包回放的节奏误差：绝对计划时刻加批量发送与逐个报文 sleep"""
+    import time
+    import numpy as np
+    from replay import Replayer
+
+    class NullSink:
+        def send(self, records):
+            pass
+
+    frame = sample_location()
+    rng = np.random.default_rng(0)
+    # 2秒内2万条报文，泊松到达，平均间隔0.1毫秒
+    received = 1000.0 + np.cumsum(rng.exponential(0.0001, 20000))
+    records = [(t, b"\x02" * 6, frame) for t in received.tolist()]
+
+    for speed in (1.0, 10.0):
+        stats = Replayer(records, speed=speed).run(NullSink())
+        summary = stats.summary()
+        print(f"Replayer {speed:g}x: {stats.elapsed:.3f} s for {received[-1] - received[0]:.3f} s of capture / {speed:g}, "
+              f"{stats.batches} batches, error p50 {summary['p50'] * 1e3:.3f} ms, p99 {summary['p99'] * 1e3:.3f} ms")
+
+    start = time.monotonic()
+    errors = []
+    for i in range(len(received)):
+        if i:
+            time.sleep(received[i] - received[i - 1])
+        errors.append(time.monotonic() - start - (received[i] - received[0]))
+    errors = np.abs(errors)
+    print(f"sleep per frame 1x: {time.monotonic() - start:.3f} s, drift at end {errors[-1] * 1e3:.1f} ms, "
+          f"error p50 {np.percentile(errors, 50) * 1e3:.3f} ms")
+
+
+@benchmark
+def bench_pipeline():
+    """持续过载下的分阶段流水线：各溢出策略的队列长度与丢弃数，以及不同解码线程数的吞吐"""
+    import time
+    from fleet import FleetStore
+    from generator import FleetSimulator, LoadGenerator
+    from pipeline import OverflowPolicy, ingest_pipeline
+
+    simulator = FleetSimulator(1000, seed=0, start=1.7e9)
+    records, _ = LoadGenerator(simulator, seed=0).batch(100000, 1.7e9)
+
+    def slow_sink(item):
+        time.sleep(0.00005)
+
+    for policy in OverflowPolicy:
+        store = FleetStore()
+        start = time.perf_counter()
+        with ingest_pipeline(store, slow_sink, capacity=4096, sink_policy=policy) as p:
+            p.feed(records)
+        elapsed = time.perf_counter() - start
+        sink = p.metrics()["sink"]
+        print(f"{policy.name:12s}: {len(records) / elapsed:,.0f} records/s, sink max depth {sink.max_depth}/{sink.capacity}, "
+              f"processed {sink.processed}, dropped {sink.dropped}")
+
+    for workers in (1, 2, 4):
+        store = FleetStore()
+        start = time.perf_counter()
+        with ingest_pipeline(store, lambda item: None, decode_workers=workers) as p:
+            p.feed(records)
+        elapsed = time.perf_counter() - start
+        print(f"decode_workers={workers}: {len(records) / elapsed:,.0f} records/s")
+
+
+@benchmark
+def bench_timestamps():
+    """位置向量时间戳展开：逐条 TimestampUnwrapper.update 与批量 update_many"""
+    import time
+    import numpy as np
+    from timestamps import TimestampUnwrapper
+
+    rng = np.random.default_rng(0)
+    count = 1000000
+    addresses = [bytes([2, 0, 0, 0, i >> 8, i & 0xFF]) for i in range(1000)]
+    rows = rng.integers(0, len(addresses), count)
+    received = 1.7e9 + np.sort(rng.uniform(0, 7200, count))
+    timestamps = np.round((received % 3600) * 10).astype(np.int64) % 36000
+    batch_addresses = [addresses[i] for i in rows.tolist()]
+
+    unwrapper = TimestampUnwrapper()
+    start = time.perf_counter()
+    for address, ts, r in zip(batch_addresses[:100000], timestamps[:100000].tolist(), received[:100000].tolist()):
+        unwrapper.update(address, ts, r)
+    report("TimestampUnwrapper.update", time.perf_counter() - start, 100000)
+
+    unwrapper = TimestampUnwrapper()
+    start = time.perf_counter()
+    for i in range(0, count, 10000):
+        unwrapper.update_many(batch_addresses[i:i + 10000], timestamps[i:i + 10000], received[i:i + 10000])
+    report("TimestampUnwrapper.update_many (10000/batch)", time.perf_counter() - start, count)
+
+
+@benchmark
+def bench_pack():
+    """每次广播的打包报文：encode_pack 重新编码全部子报文与 PackBuffer 原地更新"""
+    from pack import DEFAULT_MESSAGES, PackBuffer
+
+    ua = UnmannedAircraft(id="DRONE001", latitude=30.0, longitude=120.0, operator_id="OPERATOR001")
+    number = 20000
+    report("encode_pack (5 messages)", timeit.timeit(lambda: ua.encode_pack(DEFAULT_MESSAGES), number=number), number)
+    pack = PackBuffer(ua)
+    report("PackBuffer.update", timeit.timeit(lambda: pack.update(), number=number), number)
+    ua.timestamp = 0
+    report("PackBuffer.update (explicit timestamp)", timeit.timeit(lambda: pack.update(1.7e9), number=number), number)
+
+
+@benchmark
+def bench_serialize():
+    """解码结果输出为 JSON Lines：asdict + json.dumps、records + json.dumps 与预编译模板"""
+    import json
+    from dataclasses import asdict
+    from filters import frames_array
+    from records import decode_records
+    from serialize import Serializer
+
+    frame = sample_location()
+    ua = UnmannedAircraft()
+    ua.decode_message(frame)
+    serializer = Serializer('jsonl')
+    number = 20000
+
+    def dumps_asdict():
+        record = asdict(ua)
+        json.dumps({name: value.name if isinstance(value, Enum) else value for name, value in record.items()},
+                   ensure_ascii=False)
+
+    report("asdict + json.dumps", timeit.timeit(dumps_asdict, number=number), number)
+    records = decode_records(frame)
+    report("records + json.dumps", timeit.timeit(lambda: json.dumps(records[0], ensure_ascii=False), number=number), number)
+    report("Serializer.format_aircraft", timeit.timeit(
+        lambda: serializer.format_aircraft(ua, MessageType.LOCATION), number=number), number)
+    report("Serializer.format_records", timeit.timeit(lambda: serializer.format_records(records), number=number), number)
+
+    report("decode_records + json.dumps", timeit.timeit(
+        lambda: [json.dumps(record, ensure_ascii=False) for record in decode_records(frame)], number=number), number)
+    report("Serializer.format_message", timeit.timeit(lambda: serializer.format_message(frame), number=number), number)
+    frames = frames_array(frame * 100000)
+    report("Serializer.format_frames (100000)", timeit.timeit(lambda: serializer.format_frames(frames), number=1), 100000)
+
+
+@benchmark
+def bench_netrid():
+    """区域查询服务负载测试：本地长连接客户端并发查询，同时持续写入位置向量报文"""
+    import asyncio
+    import time
+    import numpy as np
+    from generator import FleetSimulator, Region
+    from netrid import FlightIndex, NetRIDServer
+
+    simulator = FleetSimulator(20000, seed=0, regions=[Region("bench", 30.0, 120.0, 0.5, ClassificationType.CHINA)],
+                               start=time.time())
+    rng = np.random.default_rng(0)
+    clients, duration, feed_rate = 16, 3.0, 20000  # 并发连接数、测试时长（秒）、每秒写入的位置向量报文数
+
+    async def client(port, latencies):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            lat, lon = 30.0 + rng.uniform(-0.45, 0.45), 120.0 + rng.uniform(-0.45, 0.45)
+            start = time.perf_counter()
+            writer.write(f"GET /flights?view={lat},{lon},{lat + 0.02},{lon + 0.02} HTTP/1.1\r\n\r\n".encode())
+            length = 0
+            await reader.readline()
+            while (line := await reader.readline()) != b"\r\n":
+                if line.lower().startswith(b"content-length"):
+                    length = int(line.split(b":")[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+        writer.close()
+        await writer.wait_closed()
+
+    async def feeder(index):
+        deadline = time.monotonic() + duration
+        batch = feed_rate // 100
+        while time.monotonic() < deadline:
+            simulator.advance(time.time())
+            rows = rng.integers(0, simulator.count, batch)
+            index.update_many([simulator.addresses[i] for i in rows.tolist()],
+                              simulator.location_frames(rows), time.time())
+            await asyncio.sleep(0.01)
+
+    async def run(ttl):
+        index = FlightIndex(ttl=ttl)
+        simulator.advance(time.time())
+        index.update_many(simulator.addresses, simulator.location_frames(np.arange(simulator.count)), time.time())
+        server = NetRIDServer(index, port=0)
+        await server.start()
+        latencies = []
+        start = time.perf_counter()
+        await asyncio.gather(feeder(index), *(client(server.port, latencies) for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+        await server.close()
+        latencies = np.array(latencies) * 1e3
+        print(f"ttl {ttl:g} s: {len(latencies) / elapsed:,.0f} req/s, latency p50 {np.percentile(latencies, 50):.2f} ms, "
+              f"p99 {np.percentile(latencies, 99):.2f} ms, tile cache hit rate "
+              f"{index.hits / max(index.hits + index.misses, 1):.0%}")
+
+    for ttl in (0.0, 1.0):
+        asyncio.run(run(ttl))
+
+
+@benchmark
+def bench_history():
+    """历史库：批量写入数百万行位置向量记录的持续速率与常用查询延迟"""
+    import os
+    import tempfile
+    import time
+    import numpy as np
+    from generator import FleetSimulator
+    from history import History, HistorySink
+
+    simulator = FleetSimulator(5000, seed=0, start=1.7e9)
+    rng = np.random.default_rng(0)
+    count, batch = 2000000, 10000
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "history.db")
+        with HistorySink(path, batch_size=50000) as sink:
+            everyone = np.arange(simulator.count)
+            sink.write_many(simulator.addresses, simulator.frames(MessageType.BASIC_ID, everyone), 1.7e9)
+            start = time.perf_counter()
+            for i in range(0, count, batch):
+                now = 1.7e9 + i / 1000  # 每秒 1000 条，共约 33 分钟
+                simulator.advance(now)
+                rows = rng.integers(0, simulator.count, batch)
+                sink.write_many([simulator.addresses[j] for j in rows.tolist()], simulator.location_frames(rows), now)
+            sink.flush()
+            report(f"HistorySink.write_many ({sink.commits} commits)", time.perf_counter() - start, count)
+
+        with History(path) as history:
+            addresses = simulator.addresses
+            end = 1.7e9 + count / 1000
+            number = 200
+            report("History.track (10 min)", timeit.timeit(
+                lambda: history.track(addresses[rng.integers(len(addresses))], end - 600, end), number=number), number)
+            report("History.latest", timeit.timeit(
+                lambda: history.latest(addresses[rng.integers(len(addresses))]), number=number), number)
+            report("History.find", timeit.timeit(lambda: history.find("SIM0000000042"), number=number), number)
+            report("History.active (10 s)", timeit.timeit(lambda: history.active(end - 10, end), number=20), 20)
+
+
+def _queue_producer(queue, frames, batch):
+    """bench_ring 的生产者进程：逐个或按列表放入 multiprocessing.Queue"""
+    if batch == 1:
+        for row in frames:
+            queue.put(row.tobytes())
+    else:
+        for i in range(0, len(frames), batch):
+            queue.put([row.tobytes() for row in frames[i:i + batch]])
+    queue.put(None)
+
+
+def _ring_producer(ring, frames, batch):
+    """bench_ring 的生产者进程：按批写入共享内存环形缓冲区"""
+    if batch == 1:
+        for row in frames:
+            ring.put(row)
+    else:
+        for i in range(0, len(frames), batch):
+            ring.put_many(frames[i:i + batch])
+
+
+def _ring_consumer(ring, batch, results):
+    """bench_ring 的消费者进程：取得共享内存上的报文视图并计数"""
+    count = 0
+    for frames in ring.batches(batch):
+        count += len(frames)
+    results.put(count)
+
+
+@benchmark
+def bench_ring():
+    """跨进程传递报文：multiprocessing.Queue 与共享内存环形缓冲区（SPSC 与 2 生产者 / 2 消费者），消费者只计数"""
+    import multiprocessing
+    import time
+    import numpy as np
+    from generator import FleetSimulator
+    from ring import FrameRing
+
+    simulator = FleetSimulator(1000, seed=0, start=1.7e9)
+    frames = simulator.location_frames(np.arange(1000000) % simulator.count)
+
+    def run_queue(count, batch):
+        queue = multiprocessing.Queue(maxsize=max(10000 // batch, 4))
+        producer = multiprocessing.Process(target=_queue_producer, args=(queue, frames[:count], batch))
+        start = time.perf_counter()
+        producer.start()
+        received = 0
+        while (item := queue.get()) is not None:
+            received += len(item) if batch > 1 else 1
+        elapsed = time.perf_counter() - start
+        producer.join()
+        assert received == count
+        report(f"multiprocessing.Queue (batch={batch})", elapsed, count)
+
+    def run_ring(count, batch, producers=1, consumers=1):
+        with FrameRing(1 << 16, multi_producer=producers > 1, multi_consumer=consumers > 1) as ring:
+            results = multiprocessing.Queue()
+            processes = [multiprocessing.Process(target=_ring_producer, args=(ring, part, batch))
+                         for part in np.array_split(frames[:count], producers)]
+            processes += [multiprocessing.Process(target=_ring_consumer, args=(ring, batch, results))
+                          for _ in range(consumers)]
+            start = time.perf_counter()
+            for process in processes:
+                process.start()
+            for process in processes[:producers]:
+                process.join()
+            ring.close()
+            received = sum(results.get() for _ in range(consumers))
+            elapsed = time.perf_counter() - start
+            for process in processes[producers:]:
+                process.join()
+        assert received == count
+        report(f"FrameRing {producers}P/{consumers}C (batch={batch})", elapsed, count)
+
+    run_queue(100000, 1)
+    run_queue(1000000, 1000)
+    run_ring(100000, 1)
+    run_ring(1000000, 1000)
+    run_ring(1000000, 1000, 2, 2)
+
+
+@benchmark
+def bench_tracing():
+    """编解码追踪的开销（关闭、每 100 次采样一次、全部记录）及各阶段平均耗时"""
+    import tracing
+
+    frame = sample_location()
+    ua = UnmannedAircraft()
+    pack = UnmannedAircraft(id="DRONE001", latitude=30.0, longitude=120.0).encode_pack(
+        [MessageType.BASIC_ID, MessageType.LOCATION, MessageType.SYSTEM])
+    number = 50000
+
+    for label, sample_every in (("off", None), ("1/100", 100), ("1/1", 1)):
+        tracer = tracing.enable(sample_every) if sample_every else None
+        seconds = min(timeit.repeat(lambda: ua.decode_message(frame), number=number, repeat=5))
+        report(f"decode_message (tracing {label})", seconds, number)
+        seconds = min(timeit.repeat(lambda: ua.decode_message(pack), number=number // 5, repeat=5))
+        report(f"decode_message pack (tracing {label})", seconds, number // 5)
+        tracing.disable()
+
+    print("stage averages (tracing 1/1):")
+    for name, (count, mean) in tracer.summary().items():
+        print(f"  {name:<38} {mean / 1000:10.3f} us {count:>10,} spans")
+
+
+@benchmark
+def bench_ids():
+    """识别码字段：每次解码新字符串与识别码字典的对比，以及下游按识别码查字典"""
+    from ids import IdTable
+
+    number = 200000
+    frames = [UnmannedAircraft(id=f"DRONE{i:06d}").encode_basic_id() for i in range(1000)]
+    fields = [frame[2:22] for frame in frames] * (number // 1000)
+    table = IdTable()
+    tracks = {table.text(table.intern(field)): None for field in fields[:1000]}
+    handles = [None] * 1000
+
+    def decode_string():
+        for field in fields:
+            tracks[field.decode('ascii').rstrip('\0')]
+
+    def interned_string():
+        for field in fields:
+            tracks[table.texts[table.intern(field)]]
+
+    def interned_handle():
+        for field in fields:
+            handles[table.intern(field)]
+
+    report("decode + rstrip + dict lookup", min(timeit.repeat(decode_string, number=1, repeat=5)), number)
+    report("interned str + dict lookup", min(timeit.repeat(interned_string, number=1, repeat=5)), number)
+    report("handle + list index", min(timeit.repeat(interned_handle, number=1, repeat=5)), number)
+
+    ua = UnmannedAircraft()
+    report("decode_message basic_id", min(timeit.repeat(lambda: ua.decode_message(frames[0]), number=number,
+                                                        repeat=5)), number)
+
+
+@benchmark
+def bench_changefeed():
+    """变更流：10万架航空器中1%发生变化时，增量查询与全量快照的对比，以及重复报文的合并开销"""
+    from changefeed import ChangeFeed
+
+    count = 100000
+    feed = ChangeFeed(history=1 << 20)
+    aircraft = [UnmannedAircraft(id=f"DRONE{i:06d}", latitude=30.0 + i * 1e-5, longitude=120.0, timestamp=0)
+                for i in range(count)]
+    addresses = [i.to_bytes(6, 'big') for i in range(count)]
+    basic_ids = [ua.encode_basic_id() for ua in aircraft]
+    for address, ua, basic_id in zip(addresses, aircraft, basic_ids):
+        feed.update(address, basic_id)
+        feed.update(address, ua.encode_location())
+
+    repeated = basic_ids[:count // 10]
+    start = timeit.default_timer()
+    for address, basic_id in zip(addresses, repeated):
+        feed.update(address, basic_id)
+    report("update (unchanged basic_id)", timeit.default_timer() - start, len(repeated))
+
+    changed = range(0, count, 100)
+    frames = []
+    for i in changed:
+        aircraft[i].latitude += 1e-4
+        aircraft[i].timestamp = 10
+        frames.append((addresses[i], aircraft[i].encode_location()))
+    version = feed.version
+    start = timeit.default_timer()
+    for address, frame in frames:
+        feed.update(address, frame)
+    report("update (changed location)", timeit.default_timer() - start, len(frames))
+
+    number = 20
+    seconds = timeit.timeit(lambda: feed.changes_since(version), number=number)
+    report(f"changes_since ({len(frames):,} changed)", seconds, number)
+    seconds = timeit.timeit(feed.snapshot, number=2)
+    report(f"snapshot ({count:,} aircraft)", seconds, 2)
+
+
+@benchmark
+def bench_retention():
+    """分层降采样：100架航空器 1 Hz 写入4小时后压缩，比较行数、占用空间、压缩速率和轨迹查询延迟"""
+    import os
+    import tempfile
+    import time
+    import numpy as np
+    from generator import FleetSimulator
+    from history import History, HistorySink
+    from retention import Retention, Tier
+
+    simulator = FleetSimulator(100, seed=0, start=1.7e9)
+    everyone = np.arange(simulator.count)
+    seconds = 4 * 3600
+    end = 1.7e9 + seconds
+    tiers = [Tier(1800, 10), Tier(7200, 60)]  # 最近30分钟全分辨率，2小时内 0.1 Hz，更早每分钟一条
+
+    def usage(path):
+        with History(path) as history:
+            connection = history.connection
+            rows = connection.execute("SELECT COUNT(*) FROM locations").fetchone()[0]
+            pages = (connection.execute("PRAGMA page_count").fetchone()[0]
+                     - connection.execute("PRAGMA freelist_count").fetchone()[0])
+            size = pages * connection.execute("PRAGMA page_size").fetchone()[0]
+            address = simulator.addresses[42]
+            track = timeit.timeit(lambda: history.track(address, 1.7e9, end), number=20) / 20
+        return rows, size, track
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "history.db")
+        with HistorySink(path, batch_size=50000) as sink:
+            sink.write_many(simulator.addresses, simulator.frames(MessageType.BASIC_ID, everyone), 1.7e9)
+            for second in range(seconds):
+                now = 1.7e9 + second
+                simulator.advance(now)
+                sink.write_many(simulator.addresses, simulator.location_frames(everyone), now)
+
+        before = usage(path)
+        with Retention(path, tiers=tiers) as retention:
+            start = time.perf_counter()
+            chunks = retention.compact(end)
+            elapsed = time.perf_counter() - start
+            report(f"Retention.compact ({chunks} chunks)", elapsed, before[0])
+        after = usage(path)
+        for label, (rows, size, track) in (("before", before), ("after", after)):
+            print(f"{label:<8} {rows:>12,} rows {size / 2 ** 20:10.1f} MiB   track (4 h) {track * 1e3:8.2f} ms")
+
+
+@benchmark
+def bench_heatmap():
+    """交通密度：1万架航空器 1 Hz 逐个报文更新、时间片过期与快照的耗时"""
+    import time
+    import numpy as np
+    from generator import DEFAULT_REGIONS, FleetSimulator
+    from heatmap import Heatmap
+
+    beijing = DEFAULT_REGIONS[0]
+    simulator = FleetSimulator(10000, seed=0, regions=[beijing], start=1.7e9)
+    everyone = np.arange(simulator.count)
+    bounds = (beijing.latitude - 0.5, beijing.longitude - 0.5, beijing.latitude + 0.5, beijing.longitude + 0.5)
+    heatmap = Heatmap(bounds, cell_sizes=(0.1, 0.01, 0.002))
+    for address, frame in zip(simulator.addresses, simulator.frames(MessageType.BASIC_ID, everyone)):
+        heatmap.update(address, frame.tobytes(), 1.7e9)
+
+    seconds = 300
+    elapsed = 0.0
+    for second in range(seconds):
+        now = 1.7e9 + second
+        simulator.advance(now)
+        frames = [frame.tobytes() for frame in simulator.location_frames(everyone)]
+        start = time.perf_counter()
+        for address, frame in zip(simulator.addresses, frames):
+            heatmap.update(address, frame, now)
+        elapsed += time.perf_counter() - start
+    report(f"Heatmap.update ({len(heatmap.cell_sizes)} levels)", elapsed, seconds * simulator.count)
+    print(f"live aircraft {heatmap.live(0).sum():,}, window frames {heatmap.window(0).sum():,}")
+
+    for level, size in enumerate(heatmap.cell_sizes):
+        shape = heatmap.live(level).shape
+        number = 20
+        report(f"live() {size} deg {shape[0]}x{shape[1]}", timeit.timeit(lambda: heatmap.live(level), number=number),
+               number)
+    number = 20
+    report("live(2).sum(axis=(2, 3))", timeit.timeit(lambda: heatmap.live(2).sum(axis=(2, 3)), number=number), number)
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        print(f"== {name}")
+        BENCHMARKS[name]()
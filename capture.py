@@ -0,0 +1,151 @@
+import struct
+import time
+from typing import BinaryIO, Callable, Iterator, Optional, Tuple
+
+from enums import MessageType
+from view import FRAME_SIZE
+
+ADDRESS_SIZE = 6  # 广播地址（蓝牙/Wi-Fi MAC地址）长度
+
+
+def pack_datagram(address: bytes, data: bytes) -> bytes:
+    """将广播地址与报文打包为一个实时数据报"""
+    if len(address) != ADDRESS_SIZE:
+        raise ValueError("广播地址必须为6字节")
+    return address + data
+
+
+def unpack_datagram(datagram: bytes) -> Tuple[bytes, memoryview]:
+    """拆分实时数据报，返回广播地址和报文（不复制报文数据）"""
+    if len(datagram) <= ADDRESS_SIZE:
+        raise ValueError("数据报长度不符合要求")
+    buf = memoryview(datagram)
+    return bytes(buf[:ADDRESS_SIZE]), buf[ADDRESS_SIZE:]
+
+
+def format_address(address: bytes) -> str:
+    """格式化广播地址，例如 02:00:00:00:00:01"""
+    return address.hex(':').upper()
+
+
+MAGIC = b'RIDCAP01'  # 抓包文件标识
+RECORD_HEADER = struct.Struct('<d6sH')  # 接收时间（Unix时间戳）、广播地址、报文长度
+NO_ADDRESS = bytes(ADDRESS_SIZE)
+_PACK = MessageType.PACK.value
+
+Record = Tuple[float, bytes, bytes]  # (接收时间, 广播地址, 报文)
+
+
+def frame_length(buffer: bytes, offset: int = 0) -> int:
+    """根据报文的前3个字节计算整个报文的长度，打包报文为 3 + 25 * 报文数量"""
+    if (buffer[offset] >> 4) & 0x0F == _PACK:
+        if buffer[offset + 1] != FRAME_SIZE:
+            raise ValueError("打包中每个报文的长度不符合要求")
+        if buffer[offset + 2] > 9:
+            raise ValueError("打包中报文数量最多为9个")
+        return 3 + buffer[offset + 2] * FRAME_SIZE
+    return FRAME_SIZE
+
+
+class CaptureWriter:
+    """写入抓包文件：文件头后依次为记录头和报文"""
+
+    def __init__(self, stream: BinaryIO):
+        self._stream = stream
+        self._stream.write(MAGIC)
+
+    def write(self, data: bytes, address: bytes = NO_ADDRESS, received: Optional[float] = None) -> None:
+        if received is None:
+            received = time.time()
+        if len(address) != ADDRESS_SIZE:
+            raise ValueError("广播地址必须为6字节")
+        self._stream.write(RECORD_HEADER.pack(received, address, len(data)))
+        self._stream.write(data)
+
+
+def iter_frames(stream: BinaryIO, chunk_size: int = 1 << 16,
+                on_error: Optional[Callable[[ValueError], None]] = None) -> Iterator[bytes]:
+    """读取首尾相接的原始报文流，打包报文按其长度整体返回
+
+    未提供 on_error 时遇到错误抛出 ValueError；提供时以异常调用 on_error 后继续：报文头错误的打包报文
+    按一个25字节报文跳过，末尾不完整的数据丢弃。
+    """
+    buffer = b''
+    while True:
+        chunk = stream.read(chunk_size)
+        if chunk:
+            buffer += chunk
+        pos = 0
+        while len(buffer) - pos >= 3:
+            try:
+                length = frame_length(buffer, pos)
+            except ValueError as error:
+                if on_error is None:
+                    raise
+                if len(buffer) - pos < FRAME_SIZE and chunk:
+                    break
+                on_error(error)
+                pos += FRAME_SIZE
+                continue
+            if len(buffer) - pos < length:
+                break
+            yield buffer[pos:pos + length]
+            pos += length
+        buffer = buffer[pos:]
+        if not chunk:
+            break
+    if buffer:
+        _error(ValueError("数据长度不符合要求"), on_error)
+
+
+def iter_records(stream: BinaryIO, chunk_size: int = 1 << 16,
+                 on_error: Optional[Callable[[ValueError], None]] = None) -> Iterator[Record]:
+    """读取抓包文件中的记录；没有文件标识时按原始报文流读取，接收时间记为0
+
+    on_error 的含义同 iter_frames，抓包文件末尾不完整的记录丢弃。
+    """
+    magic = stream.read(len(MAGIC))
+    if magic != MAGIC:
+        yield from ((0.0, NO_ADDRESS, data) for data in iter_frames(_Prepend(magic, stream), chunk_size, on_error))
+        return
+
+    buffer = b''
+    header_size = RECORD_HEADER.size
+    unpack_from = RECORD_HEADER.unpack_from
+    while True:
+        chunk = stream.read(chunk_size)
+        if chunk:
+            buffer += chunk
+        pos = 0
+        while len(buffer) - pos >= header_size:
+            received, address, length = unpack_from(buffer, pos)
+            end = pos + header_size + length
+            if len(buffer) < end:
+                break
+            yield received, address, buffer[pos + header_size:end]
+            pos = end
+        buffer = buffer[pos:]
+        if not chunk:
+            break
+    if buffer:
+        _error(ValueError("抓包文件记录不完整"), on_error)
+
+
+def _error(error: ValueError, on_error: Optional[Callable[[ValueError], None]]) -> None:
+    if on_error is None:
+        raise error
+    on_error(error)
+
+
+class _Prepend:
+    """在流前补回已读取的字节"""
+
+    def __init__(self, head: bytes, stream: BinaryIO):
+        self._head = head
+        self._stream = stream
+
+    def read(self, size: int = -1) -> bytes:
+        head, self._head = self._head, b''
+        if size < 0:
+            return head + self._stream.read()
+        return head + self._stream.read(max(size - len(head), 0))
@@ -0,0 +1,349 @@
+import os
+from array import array
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit,
+                           QComboBox, QPushButton, QProgressBar, QTableView,
+                           QHeaderView, QFileDialog, QMessageBox)
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, QObject, QThread, pyqtSignal
+
+import filters
+from capture import ADDRESS_SIZE, iter_records, format_address
+from columns import location_columns, message_types
+from enums import *
+from view import FRAME_SIZE, FrameView, iter_views
+
+COLUMNS = ["序号", "接收时间", "广播地址", "报文类型", "识别码/描述",
+           "运行状态", "纬度", "经度", "几何高度(m)", "地速(m/s)"]
+_LOCATION_COLUMNS = {6: 'latitude', 7: 'longitude', 8: 'geodetic_altitude', 9: 'horizontal_speed'}
+_TEXT_TYPES = (MessageType.BASIC_ID.value, MessageType.SELF_ID.value, MessageType.OPERATOR_ID.value)
+_PROGRESS_INTERVAL = 1 << 16  # 每读取多少条记录报告一次进度
+
+
+class CaptureTable:
+    """抓包文件的解码结果：按列保存原始报文、接收时间和广播地址，单元格在显示时才解码"""
+
+    def __init__(self, frames: np.ndarray, received: np.ndarray, addresses: np.ndarray):
+        self.frames = frames  # (N, 25) uint8
+        self.received = received  # (N,) float64
+        self.addresses = addresses  # (N, 6) uint8
+        self.types = message_types(frames)
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def text(self, row: int, column: int):
+        """单个单元格的显示值"""
+        if column == 0:
+            return row
+        if column == 1:
+            received = self.received[row]
+            return datetime.fromtimestamp(received).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3] if received else ""
+        if column == 2:
+            return format_address(self.addresses[row].tobytes())
+
+        message_type = int(self.types[row])
+        if column == 3:
+            try:
+                return MessageType(message_type).name
+            except ValueError:
+                return f"0x{message_type:X}"
+        try:
+            view = FrameView(self.frames[row])
+            if column == 4:
+                if message_type == MessageType.BASIC_ID.value:
+                    return view.id
+                if message_type == MessageType.SELF_ID.value:
+                    return view.description
+                if message_type == MessageType.OPERATOR_ID.value:
+                    return view.operator_id
+                return ""
+            if message_type != MessageType.LOCATION.value:
+                return ""
+            if column == 5:
+                return view.operational_status.name
+            return getattr(view, _LOCATION_COLUMNS[column])
+        except ValueError:
+            return "解码错误"
+
+    def sort_key(self, column: int) -> np.ndarray:
+        """按列排序时使用的数组，直接由原始报文向量化计算"""
+        if column == 0:
+            return np.arange(len(self))
+        if column == 1:
+            return self.received
+        if column == 2:
+            shifts = np.arange(ADDRESS_SIZE - 1, -1, -1, dtype=np.uint64) * 8
+            return (self.addresses.astype(np.uint64) << shifts).sum(axis=1)
+        if column == 3:
+            return self.types
+        if column == 4:
+            text = np.ascontiguousarray(self.frames[:, 2:FRAME_SIZE]).view('S23').ravel()
+            return np.where(np.isin(self.types, _TEXT_TYPES), text, b'')
+
+        is_location = self.types == MessageType.LOCATION.value
+        if column == 5:
+            return np.where(is_location, (self.frames[:, 1] >> 4).astype(np.int16), -1)  # uint8 中 -1 会变为 255
+        values = location_columns(self.frames)[_LOCATION_COLUMNS[column]]
+        return np.where(is_location, values, np.nan)
+
+
+class CaptureTableModel(QAbstractTableModel):
+    """抓包文件表格模型：只保存可见行到报文序号的映射，排序和筛选都在数组上完成"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.table: Optional[CaptureTable] = None
+        self._order = np.empty(0, dtype=np.intp)  # 显示行 -> 报文序号
+        self._sort_column = 0
+        self._sort_order = Qt.SortOrder.AscendingOrder
+
+    def set_table(self, table: Optional[CaptureTable]) -> None:
+        self.beginResetModel()
+        self.table = table
+        self._order = np.arange(len(table)) if table is not None else np.empty(0, dtype=np.intp)
+        self._sort_column = 0
+        self._sort_order = Qt.SortOrder.AscendingOrder
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._order)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and index.isValid():
+            return self.table.text(int(self._order[index.row()]), index.column())
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return COLUMNS[section]
+        return None
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        if self.table is None:
+            return
+        self._sort_column, self._sort_order = column, order
+        self.layoutAboutToBeChanged.emit()
+        self._order = self._sorted(self._order)
+        self.layoutChanged.emit()
+
+    def set_filter(self, predicate: Optional[filters.Predicate]) -> None:
+        """按谓词筛选报文，None 表示显示全部"""
+        if self.table is None:
+            return
+        self.beginResetModel()
+        if predicate is None:
+            order = np.arange(len(self.table))
+        else:
+            order = np.flatnonzero(predicate.mask(self.table.frames))
+        self._order = self._sorted(order)
+        self.endResetModel()
+
+    def _sorted(self, order: np.ndarray) -> np.ndarray:
+        key = self.table.sort_key(self._sort_column)[order]
+        order = order[np.argsort(key, kind='stable')]
+        if self._sort_order == Qt.SortOrder.DescendingOrder:
+            order = order[::-1]
+        return order
+
+
+class CaptureLoader(QObject):
+    """后台读取抓包文件，打包报文展开为子报文"""
+    progress = pyqtSignal(int)  # 已读取的百分比
+    loaded = pyqtSignal(object)  # CaptureTable
+    failed = pyqtSignal(str)
+    finished = pyqtSignal()
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self.skipped = 0  # 为空、长度不符合要求或打包报文格式错误而跳过的记录数
+        self._cancelled = False
+
+    def run(self):
+        try:
+            table = self._load()
+            if table is not None:
+                self.loaded.emit(table)
+        except (OSError, ValueError) as e:
+            self.failed.emit(str(e))
+        finally:
+            self.finished.emit()
+
+    def cancel(self):
+        self._cancelled = True
+
+    def _skip(self, error: ValueError) -> None:
+        self.skipped += 1
+
+    def _load(self) -> Optional[CaptureTable]:
+        size = max(os.path.getsize(self.path), 1)
+        frames = bytearray()
+        received = array('d')
+        addresses = bytearray()
+        pack = MessageType.PACK.value
+
+        with open(self.path, 'rb') as f:
+            for n, (t, address, data) in enumerate(iter_records(f, 1 << 20, on_error=self._skip)):
+                if n % _PROGRESS_INTERVAL == 0:
+                    if self._cancelled:
+                        return None
+                    self.progress.emit(f.tell() * 100 // size)
+                if not data:
+                    self.skipped += 1
+                elif (data[0] >> 4) == pack:
+                    try:
+                        views = list(iter_views(data))
+                    except ValueError:
+                        self.skipped += 1
+                        continue
+                    for view in views:
+                        frames += view.buffer
+                    received.extend([t] * len(views))
+                    addresses += address * len(views)
+                elif len(data) == FRAME_SIZE:
+                    frames += data
+                    received.append(t)
+                    addresses += address
+                else:
+                    self.skipped += 1
+
+        self.progress.emit(100)
+        return CaptureTable(np.frombuffer(frames, dtype=np.uint8).reshape(-1, FRAME_SIZE),
+                            np.frombuffer(received, dtype=np.float64),
+                            np.frombuffer(addresses, dtype=np.uint8).reshape(-1, ADDRESS_SIZE))
+
+
+class CaptureViewerWidget(QWidget):
+    """抓包文件浏览：后台加载，表格只显示可见行"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.model = CaptureTableModel(self)
+        self.loader: Optional[CaptureLoader] = None
+        self.thread: Optional[QThread] = None
+
+        layout = QVBoxLayout(self)
+
+        # 文件加载
+        file_layout = QHBoxLayout()
+        self.open_button = QPushButton("打开抓包文件")
+        self.open_button.clicked.connect(self.choose_file)
+        file_layout.addWidget(self.open_button)
+
+        self.cancel_button = QPushButton("取消")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel)
+        file_layout.addWidget(self.cancel_button)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        file_layout.addWidget(self.progress_bar, 1)
+        layout.addLayout(file_layout)
+
+        # 筛选条件
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(QLabel("报文类型:"))
+        self.type_combo = QComboBox()
+        self.type_combo.setMinimumHeight(30)
+        self.type_combo.addItems(["全部"] + [t.name for t in MessageType if t != MessageType.PACK])
+        filter_layout.addWidget(self.type_combo)
+
+        filter_layout.addWidget(QLabel("识别码前缀:"))
+        self.prefix_edit = QLineEdit()
+        self.prefix_edit.setMinimumHeight(30)
+        filter_layout.addWidget(self.prefix_edit)
+
+        self.filter_button = QPushButton("筛选")
+        self.filter_button.clicked.connect(self.apply_filter)
+        filter_layout.addWidget(self.filter_button)
+
+        self.status_label = QLabel()
+        filter_layout.addWidget(self.status_label, 1)
+        layout.addLayout(filter_layout)
+
+        # 报文表格：固定行高，只有可见行会向模型取数据
+        self.table_view = QTableView()
+        self.table_view.setModel(self.model)
+        self.table_view.setSortingEnabled(True)
+        self.table_view.sortByColumn(0, Qt.SortOrder.AscendingOrder)
+        self.table_view.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.table_view.verticalHeader().setDefaultSectionSize(24)
+        self.table_view.verticalHeader().hide()
+        self.table_view.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        layout.addWidget(self.table_view)
+
+    def choose_file(self):
+        path, _ = QFileDialog.getOpenFileName(self, "打开抓包文件", "", "抓包文件 (*.ridcap *.bin);;所有文件 (*)")
+        if path:
+            self.load(path)
+
+    def load(self, path: str) -> None:
+        """在后台线程中加载抓包文件"""
+        if self.thread is not None:
+            return
+        self.loader = CaptureLoader(path)
+        self.thread = QThread(self)
+        self.loader.moveToThread(self.thread)
+        self.thread.started.connect(self.loader.run)
+        self.loader.progress.connect(self.progress_bar.setValue)
+        self.loader.loaded.connect(self.on_loaded)
+        self.loader.failed.connect(self.on_failed)
+        self.loader.finished.connect(self.thread.quit)
+        self.thread.finished.connect(self.on_finished)
+        self.thread.start()
+
+        self.progress_bar.setValue(0)
+        self.open_button.setEnabled(False)
+        self.cancel_button.setEnabled(True)
+        self.status_label.setText(f"正在加载: {os.path.basename(path)}")
+
+    def cancel(self) -> None:
+        """取消加载并等待线程退出"""
+        if self.thread is None:
+            return
+        self.loader.cancel()
+        self.thread.quit()
+        self.thread.wait()
+
+    def on_loaded(self, table: CaptureTable) -> None:
+        self.model.set_table(table)
+        self.apply_filter()
+
+    def on_failed(self, message: str) -> None:
+        QMessageBox.critical(self, "加载错误", message)
+
+    def on_finished(self) -> None:
+        self.thread = None
+        self.open_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
+        self.update_status()
+
+    def update_status(self) -> None:
+        if self.model.table is None:
+            self.status_label.setText("")
+        else:
+            self.status_label.setText(f"显示 {self.model.rowCount()} / {len(self.model.table)} 条报文")
+
+    def apply_filter(self) -> None:
+        """根据筛选条件更新显示的报文"""
+        if self.model.table is None:
+            return
+        predicate = None
+        if self.type_combo.currentIndex() > 0:
+            predicate = filters.message_type(getattr(MessageType, self.type_combo.currentText()))
+        prefix = self.prefix_edit.text().strip()
+        if prefix:
+            try:
+                by_prefix = filters.id_prefix(prefix) | filters.operator_id_prefix(prefix)
+            except (ValueError, UnicodeEncodeError) as e:
+                QMessageBox.critical(self, "筛选错误", str(e))
+                return
+            predicate = by_prefix if predicate is None else predicate & by_prefix
+        self.model.set_filter(predicate)
+        self.update_status()
@@ -0,0 +1,222 @@
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from operator import attrgetter
+from typing import Any, Dict, List, Optional, Tuple
+
+from main import UnmannedAircraft, PROTOCOL_VERSION
+from enums import *
+from records import MESSAGE_FIELDS
+from view import FRAME_SIZE, iter_views
+
+DEFAULT_HISTORY = 1 << 16  # 保留的变更记录条数，落后更多的订阅者需要全量同步
+_PACK = MessageType.PACK.value
+_MESSAGE_FIELDS = {message_type.value: names for message_type, names in MESSAGE_FIELDS.items()}
+_GETTERS = {message_type.value: attrgetter(*names) for message_type, names in MESSAGE_FIELDS.items()}
+_MESSAGE_TYPES = {message_type.value: message_type for message_type in MESSAGE_FIELDS}
+
+
+@dataclass
+class Change:
+    """一架航空器的一组变更：发生变化的报文类型和字段的新值"""
+    address: bytes  # 广播地址
+    version: int  # 最近一次变更的版本号
+    message_types: List[MessageType] = field(default_factory=list)  # 发生变化的报文类型
+    fields: Dict[str, Any] = field(default_factory=dict)  # 字段名 -> 新值
+    removed: bool = False  # 航空器已被移除
+
+
+@dataclass
+class ChangeSet:
+    """一次查询的结果；resync 为 True 时 changes 是全部航空器的完整状态，订阅者应丢弃本地状态后重建"""
+    version: int  # 当前版本号，下次查询时传入
+    changes: List[Change]
+    resync: bool = False
+
+
+@dataclass
+class _Entry:
+    aircraft: UnmannedAircraft = field(default_factory=UnmannedAircraft)
+    frames: Dict[int, bytes] = field(default_factory=dict)  # 报文类型 -> 最近一次的原始字节
+    received: float = 0.0  # 最近一次收到报文的时间
+
+
+class ChangeFeed:
+    """带全局版本号的航空器状态变更流
+
+    每次 update() 按报文类型比较原始字节，内容未变化的报文（重复广播的基本ID、系统报文等）不解码也不产生变更；
+    有变化时只解码该报文并比较其字段，版本号加一，记录变化的报文类型和字段。订阅者用 changes_since(version)
+    取得此后的变更，同一航空器的多次变更合并为一条，耗时与变更条数成正比，与机群规模无关。变更记录最多保留
+    history 条，落后更多的订阅者得到全部航空器的完整状态（resync）。所有方法都是线程安全的。
+    """
+
+    def __init__(self, history: int = DEFAULT_HISTORY):
+        if history < 1:
+            raise ValueError("变更记录条数必须大于0")
+        self.history = history
+        self._condition = threading.Condition()
+        self._aircraft: Dict[bytes, _Entry] = {}
+        # (版本号, 广播地址, 报文类型, 字段)，字段为 None 表示移除；版本号连续，可由版本号直接算出下标
+        self._log: List[Tuple[int, bytes, Tuple[int, ...], Optional[Dict[str, Any]]]] = []
+        self._head = 0  # _log 中第一条有效记录的下标，超过一半时整体截断
+        self.version = 0
+
+    def __len__(self) -> int:
+        with self._condition:
+            return len(self._aircraft)
+
+    def update(self, address: bytes, data: bytes, received: Optional[float] = None) -> int:
+        """合并一个报文（打包报文逐个合并子报文），返回产生的版本号，内容没有变化时返回 0"""
+        if not data:
+            raise ValueError("空数据")
+        if data[0] & 0x0F > PROTOCOL_VERSION:
+            raise ValueError(f"协议版本不兼容: {data[0] & 0x0F}，当前版本: {PROTOCOL_VERSION}")
+        if data[0] >> 4 == _PACK:
+            frames = [view.buffer.tobytes() for view in iter_views(data)]
+        elif len(data) != FRAME_SIZE:
+            raise ValueError("数据长度不符合要求")
+        else:
+            frames = [bytes(data)]
+        for frame in frames:
+            if frame[0] >> 4 not in _MESSAGE_FIELDS:
+                raise ValueError(f"未知的报文类型: {frame[0] >> 4}")
+        if received is None:
+            received = time.time()
+
+        with self._condition:
+            entry = self._aircraft.get(address)
+            if entry is None:
+                entry = self._aircraft[address] = _Entry()
+            entry.received = received
+            aircraft = entry.aircraft
+            types: List[int] = []
+            changed: Dict[str, Any] = {}
+            try:
+                for frame in frames:
+                    message_type = frame[0] >> 4
+                    previous = entry.frames.get(message_type)
+                    if previous == frame:
+                        continue
+                    getter = _GETTERS[message_type]
+                    old = getter(aircraft)
+                    decoded = replace(aircraft)  # 在副本上解码，中途失败时已保存的状态不被部分覆盖
+                    decoded.decode_message(frame)
+                    entry.aircraft = aircraft = decoded
+                    entry.frames[message_type] = frame
+                    types.append(message_type)
+                    values = getter(aircraft)
+                    for name, value, new in zip(_MESSAGE_FIELDS[message_type], old, values):
+                        if previous is None or new != value:
+                            changed[name] = new
+            finally:
+                # 打包报文中途解码失败时，已合并的子报文仍然产生变更
+                version = self._append(address, tuple(types), changed) if types else 0
+                if not entry.frames:
+                    del self._aircraft[address]
+            return version
+
+    def remove(self, address: bytes) -> int:
+        """移除一架航空器（例如超时未收到报文），订阅者收到 removed 为 True 的变更；不存在时返回 0"""
+        with self._condition:
+            if self._aircraft.pop(address, None) is None:
+                return 0
+            return self._append(address, (), None)
+
+    def expire(self, older_than: float) -> List[bytes]:
+        """移除最近一次收到报文早于 older_than 的航空器，返回其广播地址"""
+        with self._condition:
+            expired = [address for address, entry in self._aircraft.items() if entry.received < older_than]
+            for address in expired:
+                del self._aircraft[address]
+                self._append(address, (), None)
+            return expired
+
+    def _append(self, address: bytes, types: Tuple[int, ...], changed: Optional[Dict[str, Any]]) -> int:
+        self.version += 1
+        log = self._log
+        log.append((self.version, address, types, changed))
+        if len(log) - self._head > self.history:
+            self._head += 1
+            if self._head > len(log) // 2:
+                del log[:self._head]
+                self._head = 0
+        self._condition.notify_all()
+        return self.version
+
+    def changes_since(self, version: int) -> ChangeSet:
+        """版本号 version 之后的变更，同一航空器合并为一条；已不在变更记录中时返回全量状态"""
+        with self._condition:
+            log = self._log
+            first = log[self._head][0] if self._head < len(log) else self.version + 1
+            if version > self.version or version < first - 1:
+                return self._snapshot()
+            merged: Dict[bytes, Change] = {}
+            for position in range(self._head + version - first + 1, len(log)):
+                current, address, types, changed = log[position]
+                change = merged.get(address)
+                if change is None:
+                    change = merged[address] = Change(address, current)
+                change.version = current
+                if changed is None:
+                    change.removed = True
+                    change.message_types.clear()
+                    change.fields.clear()
+                    continue
+                change.removed = False
+                for message_type in types:
+                    message_type = _MESSAGE_TYPES[message_type]
+                    if message_type not in change.message_types:
+                        change.message_types.append(message_type)
+                change.fields.update(changed)
+            return ChangeSet(self.version, list(merged.values()))
+
+    def snapshot(self) -> ChangeSet:
+        """全部航空器的完整状态"""
+        with self._condition:
+            return self._snapshot()
+
+    def _snapshot(self) -> ChangeSet:
+        changes = []
+        for address, entry in self._aircraft.items():
+            aircraft = entry.aircraft
+            types = [_MESSAGE_TYPES[message_type] for message_type in entry.frames]
+            fields = {name: getattr(aircraft, name) for message_type in entry.frames
+                      for name in _MESSAGE_FIELDS[message_type]}
+            changes.append(Change(address, self.version, types, fields))
+        return ChangeSet(self.version, changes, resync=True)
+
+    def wait(self, version: int, timeout: Optional[float] = None) -> bool:
+        """等待版本号超过 version，返回是否在超时前有新的变更"""
+        with self._condition:
+            return self._condition.wait_for(lambda: self.version > version, timeout)
+
+    def get(self, address: bytes) -> Optional[UnmannedAircraft]:
+        """返回航空器状态的副本"""
+        with self._condition:
+            entry = self._aircraft.get(address)
+            return None if entry is None else replace(entry.aircraft)
+
+    def subscribe(self, resync: bool = True) -> 'Subscription':
+        """创建订阅，resync 为 True 时第一次 poll() 返回全量状态，否则只返回此后的变更"""
+        return Subscription(self, 0 if resync else self.version)
+
+
+class Subscription:
+    """记录订阅者已同步到的版本号，每次 poll() 返回此后的变更"""
+
+    def __init__(self, feed: ChangeFeed, version: int):
+        self.feed = feed
+        self.version = version
+        self._started = version > 0
+
+    def poll(self, timeout: Optional[float] = None) -> ChangeSet:
+        """取出新的变更；timeout 不为 None 时，没有新变更则最多等待 timeout 秒"""
+        if timeout is not None:
+            self.feed.wait(self.version, timeout)
+        if not self._started:
+            self._started = True
+            changes = self.feed.snapshot()
+        else:
+            changes = self.feed.changes_since(self.version)
+        self.version = changes.version
+        return changes
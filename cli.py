@@ -0,0 +1,241 @@
+"""Remote ID 报文流式编解码命令行工具
+
+用法:
+    python -m cli decode [-f hex|raw] [-t jsonl|csv] [-i 输入文件] [-o 输出文件] [-w 进程数]
+    python -m cli encode [-f jsonl|csv] [-t hex|raw] [-i 输入文件] [-o 输出文件] [-w 进程数]
+
+未指定输入/输出文件时读写标准输入/标准输出。raw 输入为首尾相接的原始报文或抓包文件，
+逐批读取和输出，内存占用与输入大小无关。结束时在标准错误输出吞吐量统计。
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from capture import NO_ADDRESS, Record, format_address, iter_records
+from records import encode_record
+from serialize import CSV_FIELDS, Serializer
+
+BATCH_SIZE = 4096  # 每批处理的报文数
+SERIALIZERS = {output_format: Serializer(output_format) for output_format in ('jsonl', 'csv')}
+
+# 每批处理结果：(输出内容, 输出记录数, 错误数)
+BatchResult = Tuple[Any, int, int]
+
+
+class Stats:
+    """吞吐量统计"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.inputs = 0  # 输入的报文/记录数
+        self.outputs = 0  # 输出的记录/报文数
+        self.errors = 0  # 无法处理的报文/记录数
+
+    def report(self, stream: TextIO) -> None:
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        print(f"输入: {self.inputs}  输出: {self.outputs}  错误: {self.errors}  "
+              f"耗时: {elapsed:.3f} 秒  速率: {self.inputs / elapsed:,.0f} 条/秒", file=stream)
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[List]:
+    """按固定大小分批"""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _counted(items: Iterable, stats: Stats) -> Iterator:
+    for item in items:
+        stats.inputs += 1
+        yield item
+
+
+def run_ordered(func: Callable, batches: Iterable[List], output_format: str, workers: int) -> Iterator[BatchResult]:
+    """按输入顺序逐批处理；多进程时最多同时提交 2 * workers 批，保证内存有界"""
+    if workers <= 1:
+        for batch in batches:
+            yield func(batch, output_format)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for batch in batches:
+            pending.append(executor.submit(func, batch, output_format))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def read_hex(stream: TextIO, stats: Stats) -> Iterator[Record]:
+    """读取十六进制文本，每行一个报文，允许字节间有空格，忽略空行和 # 开头的行"""
+    for line in stream:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            yield 0.0, NO_ADDRESS, bytes.fromhex(line)
+        except ValueError:
+            stats.inputs += 1
+            stats.errors += 1
+
+
+def read_jsonl(stream: TextIO, stats: Stats) -> Iterator[Any]:
+    """逐行读取 JSON Lines，忽略空行，无法解析的行计为错误"""
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            stats.inputs += 1
+            stats.errors += 1
+
+
+def read_csv(stream: TextIO, stats: Stats) -> Iterator[Dict[str, str]]:
+    """逐行读取 CSV，格式错误的行计为错误"""
+    reader = csv.DictReader(stream)
+    while True:
+        try:
+            yield next(reader)
+        except StopIteration:
+            return
+        except csv.Error:
+            stats.inputs += 1
+            stats.errors += 1
+
+
+def _input_error(stats: Stats) -> Callable[[ValueError], None]:
+    """无法分帧的原始数据计为一个错误的输入"""
+    def on_error(error: ValueError) -> None:
+        stats.inputs += 1
+        stats.errors += 1
+    return on_error
+
+
+def decode_batch(batch: List[Record], output_format: str) -> BatchResult:
+    """解码一批报文并格式化为 JSON Lines 或 CSV 文本"""
+    serializer = SERIALIZERS[output_format]
+    lines = []
+    errors = 0
+    for received, address, data in batch:
+        try:
+            if received or address != NO_ADDRESS:
+                lines.extend(serializer.message_lines(data, received, format_address(address)))
+            else:
+                lines.extend(serializer.message_lines(data))
+        except (ValueError, NotImplementedError):
+            errors += 1
+    return ''.join(lines), len(lines), errors
+
+
+def encode_batch(batch: List[Dict[str, Any]], output_format: str) -> BatchResult:
+    """编码一批记录为十六进制文本或原始字节"""
+    messages = []
+    errors = 0
+    for record in batch:
+        try:
+            messages.append(encode_record(record))
+        except (ValueError, TypeError, NotImplementedError, UnicodeEncodeError):
+            errors += 1
+
+    if output_format == 'hex':
+        return ''.join(message.hex().upper() + '\n' for message in messages), len(messages), errors
+    return b''.join(messages), len(messages), errors
+
+
+def decode(source: BinaryIO, target: BinaryIO, input_format: str, output_format: str,
+           workers: int, stats: Stats) -> None:
+    text = None
+    if input_format == 'hex':
+        text = io.TextIOWrapper(source, encoding='ascii', errors='replace')
+        frames = read_hex(text, stats)
+    else:
+        frames = iter_records(source, on_error=_input_error(stats))
+
+    out = io.TextIOWrapper(target, encoding='utf-8', newline='', write_through=True)
+    try:
+        if output_format == 'csv':
+            out.write(SERIALIZERS['csv'].header())
+        for lines, count, errors in run_ordered(decode_batch, batched(_counted(frames, stats), BATCH_SIZE),
+                                                output_format, workers):
+            out.write(lines)
+            stats.outputs += count
+            stats.errors += errors
+        out.flush()
+    finally:
+        # 分离包装层，由调用方关闭底层文件（标准输入输出不关闭）
+        out.detach()
+        if text is not None:
+            text.detach()
+
+
+def encode(source: BinaryIO, target: BinaryIO, input_format: str, output_format: str,
+           workers: int, stats: Stats) -> None:
+    text = io.TextIOWrapper(source, encoding='utf-8', newline='')
+    try:
+        records = read_csv(text, stats) if input_format == 'csv' else read_jsonl(text, stats)
+        for data, count, errors in run_ordered(encode_batch, batched(_counted(records, stats), BATCH_SIZE),
+                                               output_format, workers):
+            target.write(data.encode('ascii') if isinstance(data, str) else data)
+            stats.outputs += count
+            stats.errors += errors
+        target.flush()
+    finally:
+        text.detach()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m cli", description="Remote ID 报文流式编解码")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    decode_parser = subparsers.add_parser('decode', help="解码报文")
+    decode_parser.add_argument('-f', '--from', dest='input_format', choices=['hex', 'raw'], default='raw',
+                               help="输入格式：十六进制文本或原始字节/抓包文件（默认 raw）")
+    decode_parser.add_argument('-t', '--to', dest='output_format', choices=['jsonl', 'csv'], default='jsonl',
+                               help="输出格式（默认 jsonl）")
+
+    encode_parser = subparsers.add_parser('encode', help="编码报文")
+    encode_parser.add_argument('-f', '--from', dest='input_format', choices=['jsonl', 'csv'], default='jsonl',
+                               help="输入格式（默认 jsonl）")
+    encode_parser.add_argument('-t', '--to', dest='output_format', choices=['hex', 'raw'], default='hex',
+                               help="输出格式（默认 hex）")
+
+    for subparser in (decode_parser, encode_parser):
+        subparser.add_argument('-i', '--input', help="输入文件，默认标准输入")
+        subparser.add_argument('-o', '--output', help="输出文件，默认标准输出")
+        subparser.add_argument('-w', '--workers', type=int, default=1, help="并行处理的进程数（默认 1）")
+        subparser.add_argument('-q', '--quiet', action='store_true', help="不输出吞吐量统计")
+
+    args = parser.parse_args(argv)
+    stats = Stats()
+    source = open(args.input, 'rb') if args.input else sys.stdin.buffer
+    target = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        command = decode if args.command == 'decode' else encode
+        command(source, target, args.input_format, args.output_format, args.workers, stats)
+    except BrokenPipeError:
+        return 1
+    finally:
+        if args.input:
+            source.close()
+        if args.output:
+            target.close()
+    if not args.quiet:
+        stats.report(sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+from typing import Dict
+
+import numpy as np
+
+from enums import *
+from filters import field
+from view import LATITUDE_OFFSET, LONGITUDE_OFFSET, GEODETIC_ALTITUDE_OFFSET, TIMESTAMP_OFFSET
+
+
+def message_types(frames: np.ndarray) -> np.ndarray:
+    """每个报文的报文类型取值（报文头高4位）"""
+    return frames[:, 0] >> 4
+
+
+def location_columns(frames: np.ndarray) -> Dict[str, np.ndarray]:
+    """向量化解码位置向量报文的数值字段，取值与 UnmannedAircraft._decode_location 一致
+
+    枚举字段以取值形式返回；非位置向量报文对应的行没有意义，调用方应按报文类型过滤。
+    """
+    status = frames[:, 1]
+    speed = frames[:, 3].astype(np.float64)
+    return {
+        'operational_status': status >> 4,
+        'height_type': (status >> 2) & 0x01,
+        'direction': frames[:, 2] + ((status >> 1) & 0x01).astype(np.uint16) * 180,
+        'horizontal_speed': np.where(status & 0x01, 255 * 0.25 + speed * 0.75, speed * 0.25),
+        'vertical_speed': frames[:, 4].view(np.int8) * 0.5,
+        'latitude': field(frames, LATITUDE_OFFSET, '<i4') / 1e7,
+        'longitude': field(frames, LONGITUDE_OFFSET, '<i4') / 1e7,
+        'pressure_altitude': field(frames, 13, '<u2') * 0.5 - 1000,
+        'geodetic_altitude': field(frames, GEODETIC_ALTITUDE_OFFSET, '<u2') * 0.5 - 1000,
+        'height': field(frames, 17, '<u2') * 0.5 - 1000,
+        'geodetic_accuracy': frames[:, 19] >> 4,
+        'horizontal_accuracy': frames[:, 19] & 0x0F,
+        'pressure_accuracy': frames[:, 20] >> 4,
+        'speed_accuracy': frames[:, 20] & 0x0F,
+        'timestamp': field(frames, TIMESTAMP_OFFSET, '<u2'),
+        'timestamp_accuracy': (frames[:, 23] & 0x0F) / 10,
+    }
+
+
+def system_columns(frames: np.ndarray) -> Dict[str, np.ndarray]:
+    """向量化解码系统报文的数值字段，取值与 UnmannedAircraft._decode_system 一致"""
+    flag = frames[:, 1]
+    return {
+        'classification_type': (flag >> 2) & 0x07,
+        'operator_location_source_type': flag & 0x03,
+        'operator_latitude': field(frames, 2, '<i4') / 1e7,
+        'operator_longitude': field(frames, 6, '<i4') / 1e7,
+        'area_count': field(frames, 10, '<u2'),
+        'area_radius': frames[:, 12].astype(np.uint16) * 10,
+        'area_ceiling': field(frames, 13, '<u2') * 0.5 - 1000,
+        'area_floor': field(frames, 15, '<u2') * 0.5 - 1000,
+        'ua_classification': frames[:, 17],
+        'operator_altitude': field(frames, 18, '<u2') * 0.5 - 1000,
+        'timestamp': field(frames, 20, '<u4'),
+    }
@@ -0,0 +1,227 @@
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from enums import MessageType
+from columns import location_columns
+from fleet import FleetStore
+from view import INVALID_ALTITUDE, METERS_PER_DEGREE
+
+MAX_SPEED = 254.25  # 水平速度取值上限，达到时表示速度未知
+MAX_VERTICAL_SPEED = 62.0  # 垂直速度取值上限，超过时表示速度未知
+_RELEVANT = {MessageType.LOCATION.value, MessageType.PACK.value}
+
+
+@dataclass
+class Conflict:
+    """两架航空器预计间隔不足的时段（绝对时间，秒）"""
+    first: bytes
+    second: bytes
+    start: float
+    end: float
+
+
+def velocity(columns: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """由位置向量字段计算东向、北向、天向速度（米/秒），航迹角或速度未知时对应分量为0"""
+    direction = np.radians(columns['direction'])
+    speed = np.where((columns['direction'] <= 360) & (columns['horizontal_speed'] < MAX_SPEED),
+                     columns['horizontal_speed'], 0.0)
+    vertical = columns['vertical_speed']
+    vertical = np.where(np.abs(vertical) <= MAX_VERTICAL_SPEED, vertical, 0.0)
+    return speed * np.sin(direction), speed * np.cos(direction), vertical
+
+
+def extrapolate(latitude, longitude, altitude, east, north, up, dt) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """航位推算：按恒定速度外推 dt 秒后的经纬度和高度，高度无效时保持无效"""
+    latitude = np.asarray(latitude, dtype=np.float64)
+    dt = np.asarray(dt, dtype=np.float64)
+    cos_lat = np.maximum(np.cos(np.radians(latitude)), 1e-6)
+    altitude = np.asarray(altitude, dtype=np.float64)
+    return (latitude + north * dt / METERS_PER_DEGREE,
+            longitude + east * dt / (METERS_PER_DEGREE * cos_lat),
+            np.where(altitude == INVALID_ALTITUDE, INVALID_ALTITUDE, altitude + up * dt))
+
+
+def _interval(a: np.ndarray, b: np.ndarray, c: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """a t² + b t + c < 0 成立的时间区间，不成立时返回空区间（起点大于终点）"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        root = np.sqrt(b * b - 4 * a * c)
+        lo = np.where(a > 0, (-b - root) / (2 * a), np.where(c < 0, -np.inf, np.inf))
+        hi = np.where(a > 0, (-b + root) / (2 * a), np.where(c < 0, np.inf, -np.inf))
+    return np.where(np.isnan(lo), np.inf, lo), np.where(np.isnan(hi), -np.inf, hi)
+
+
+class ConflictDetector:
+    """基于航位推算和均匀空间哈希的航空器间冲突检测
+
+    报文写入 FleetStore 时只记录有更新的航空器。每次调用 tick 时：
+    1. 将所有活跃航空器按恒定速度外推到当前时刻，计算其在预测时段内扫过范围（按水平间隔的一半外扩）
+       的外接矩形，登记到均匀经纬度网格的单元中；
+    2. 同一单元中、且至少一方有更新的航空器组成候选对，按相对运动解析求出水平和垂直间隔同时不足的时段；
+    3. 未更新的航空器对沿用上次求得的时段。
+
+    预测时段为 look_ahead + max_age 秒：超过 max_age 秒未收到位置向量报文的航空器不再参与检测，
+    因此任意一对活跃航空器最近一次被计算时的预测时段都覆盖了当前的 look_ahead 窗口。
+    每次 tick 的网格构建是全机群的向量化排序，精确计算只针对有更新的航空器，总体代价接近线性。
+
+    经纬度按局部平面处理，不支持跨越180度经线的航空器对；高度无效时只检查水平间隔。
+    """
+
+    def __init__(self, store: Optional[FleetStore] = None, horizontal_separation: float = 150.0,
+                 vertical_separation: float = 30.0, look_ahead: float = 30.0, max_age: float = 10.0,
+                 cell_size: Optional[float] = None):
+        if horizontal_separation <= 0 or vertical_separation <= 0:
+            raise ValueError("间隔标准必须大于0")
+        if look_ahead < 0 or max_age < 0:
+            raise ValueError("预测时间必须不小于0")
+        self.store = store if store is not None else FleetStore()
+        self.horizontal_separation = horizontal_separation
+        self.vertical_separation = vertical_separation
+        self.look_ahead = look_ahead
+        self.max_age = max_age
+        self.cell_size = cell_size or max(4 * horizontal_separation, 1000.0)  # 网格单元大小，米
+        self._dirty: List[int] = []
+        self._dirty_batches: List[np.ndarray] = []
+        # 已知冲突：每行为一对航空器的行号（前者较小）及冲突起止时间
+        self._pairs = np.empty((0, 2), dtype=np.intp)
+        self._spans = np.empty((0, 2), dtype=np.float64)
+        self.pairs_tested = 0  # 最近一次 tick 精确计算的航空器对数
+
+    def update(self, address: bytes, data: bytes, received: Optional[float] = None) -> int:
+        """写入一个报文，位置向量报文（或包含它的打包报文）会使该航空器在下次 tick 时重新计算"""
+        slot = self.store.update(address, data, received)
+        if data[0] >> 4 in _RELEVANT:
+            self._dirty.append(slot)
+        return slot
+
+    def update_many(self, addresses: Sequence[bytes], frames, received=None) -> np.ndarray:
+        """批量写入25字节报文，返回各报文的行号"""
+        slots = self.store.update_many(addresses, frames, received)
+        self._dirty_batches.append(slots)
+        return slots
+
+    def positions(self, at: Optional[float] = None) -> Dict[str, np.ndarray]:
+        """按行号排列的各航空器外推到 at 时刻的经纬度和高度，未收到位置向量报文的为 NaN"""
+        if at is None:
+            at = time.time()
+        columns = location_columns(self.store.frames(MessageType.LOCATION))
+        received = self.store.received(MessageType.LOCATION)
+        latitude, longitude, altitude = extrapolate(columns['latitude'], columns['longitude'],
+                                                    columns['geodetic_altitude'], *velocity(columns), at - received)
+        return {'latitude': latitude, 'longitude': longitude, 'altitude': altitude}
+
+    def refresh(self, now: Optional[float] = None) -> List[Conflict]:
+        """重新计算所有航空器对"""
+        self._dirty_batches.append(np.arange(len(self.store), dtype=np.intp))
+        return self.tick(now)
+
+    def tick(self, now: Optional[float] = None) -> List[Conflict]:
+        """重新计算有更新的航空器，返回 [now, now + look_ahead] 内预计间隔不足的航空器对"""
+        if now is None:
+            now = time.time()
+        count = len(self.store)
+        dirty = np.zeros(count, dtype=bool)
+        if self._dirty:
+            dirty[self._dirty] = True
+        for slots in self._dirty_batches:
+            dirty[slots] = True
+        self._dirty = []
+        self._dirty_batches = []
+
+        columns = location_columns(self.store.frames(MessageType.LOCATION))
+        received = self.store.received(MessageType.LOCATION)
+        active = ((now - received <= self.max_age)
+                  & ((columns['latitude'] != 0) | (columns['longitude'] != 0)))
+        dirty &= active
+
+        if dirty.any():
+            # 有更新的航空器重新计算，先删除其旧结果
+            keep = ~(dirty[self._pairs[:, 0]] | dirty[self._pairs[:, 1]])
+            pairs, spans = self._evaluate(np.flatnonzero(active), dirty, columns, received, now)
+            self._pairs = np.concatenate([self._pairs[keep], pairs])
+            self._spans = np.concatenate([self._spans[keep], spans])
+        else:
+            self.pairs_tested = 0
+
+        # 删除已结束或涉及失去联系航空器的冲突
+        keep = (self._spans[:, 1] >= now) & active[self._pairs[:, 0]] & active[self._pairs[:, 1]]
+        self._pairs, self._spans = self._pairs[keep], self._spans[keep]
+
+        current = np.flatnonzero(self._spans[:, 0] <= now + self.look_ahead)
+        current = current[np.lexsort((self._pairs[current, 1], self._pairs[current, 0], self._spans[current, 0]))]
+        addresses = self.store.addresses
+        return [Conflict(addresses[first], addresses[second], start, end)
+                for (first, second), (start, end) in zip(self._pairs[current].tolist(), self._spans[current].tolist())]
+
+    def _evaluate(self, slots: np.ndarray, dirty: np.ndarray, columns: Dict[str, np.ndarray],
+                  received: np.ndarray, now: float) -> Tuple[np.ndarray, np.ndarray]:
+        """计算至少一方有更新的航空器对，返回冲突的行号对及冲突起止时间"""
+        window = self.look_ahead + self.max_age
+        east, north, up = (v[slots] for v in velocity(columns))
+        latitude, longitude, altitude = extrapolate(columns['latitude'][slots], columns['longitude'][slots],
+                                                    columns['geodetic_altitude'][slots], east, north, up,
+                                                    now - received[slots])
+
+        # 预测时段内扫过范围的外接矩形（度）
+        end_lat, end_lon, _ = extrapolate(latitude, longitude, altitude, east, north, up, window)
+        margin = self.horizontal_separation / 2 / METERS_PER_DEGREE
+        lon_margin = margin / np.maximum(np.cos(np.radians(np.maximum(np.abs(latitude), np.abs(end_lat)))), 1e-6)
+        cell = self.cell_size / METERS_PER_DEGREE
+        y0 = np.floor((np.minimum(latitude, end_lat) - margin + 90) / cell).astype(np.int64)
+        y1 = np.floor((np.maximum(latitude, end_lat) + margin + 90) / cell).astype(np.int64)
+        x0 = np.floor((np.minimum(longitude, end_lon) - lon_margin + 180) / cell).astype(np.int64)
+        x1 = np.floor((np.maximum(longitude, end_lon) + lon_margin + 180) / cell).astype(np.int64)
+
+        # 展开为 (单元编号, 航空器) 条目
+        ny, nx = y1 - y0 + 1, x1 - x0 + 1
+        counts = ny * nx
+        owner = np.repeat(np.arange(len(slots)), counts)
+        within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cell_y = y0[owner] + within // nx[owner]
+        cell_x = x0[owner] + within % nx[owner]
+        keys = cell_y * (1 << 32) + cell_x
+        is_dirty = dirty[slots]
+        if not is_dirty.all():
+            # 只保留有更新的航空器登记过的单元
+            touched = np.isin(keys, keys[is_dirty[owner]])
+            keys, owner, cell_y, cell_x = keys[touched], owner[touched], cell_y[touched], cell_x[touched]
+        order = np.argsort(keys, kind='stable')
+        keys, owner, cell_y, cell_x = keys[order], owner[order], cell_y[order], cell_x[order]
+
+        # 同一单元内至少一方有更新的航空器两两组成候选对。两个外接矩形重叠时可能共享多个单元，
+        # 只在重叠区域左下角所在的单元中生成该对，避免重复
+        firsts, seconds = [], []
+        for d in range(1, len(keys)):
+            same = keys[:-d] == keys[d:]
+            if not same.any():
+                break
+            a, b = owner[:-d][same], owner[d:][same]
+            same = ((is_dirty[a] | is_dirty[b])
+                    & (cell_y[:-d][same] == np.maximum(y0[a], y0[b]))
+                    & (cell_x[:-d][same] == np.maximum(x0[a], x0[b])))
+            firsts.append(np.minimum(a[same], b[same]))
+            seconds.append(np.maximum(a[same], b[same]))
+        first = np.concatenate(firsts) if firsts else np.empty(0, dtype=np.intp)
+        second = np.concatenate(seconds) if seconds else np.empty(0, dtype=np.intp)
+        self.pairs_tested = len(first)
+
+        # 相对运动下水平、垂直间隔同时不足的时段
+        mean_lat = np.radians((latitude[first] + latitude[second]) / 2)
+        px = (longitude[second] - longitude[first]) * METERS_PER_DEGREE * np.cos(mean_lat)
+        py = (latitude[second] - latitude[first]) * METERS_PER_DEGREE
+        vx, vy = east[second] - east[first], north[second] - north[first]
+        h_lo, h_hi = _interval(vx * vx + vy * vy, 2 * (px * vx + py * vy),
+                               px * px + py * py - self.horizontal_separation ** 2)
+        pz, vz = altitude[second] - altitude[first], up[second] - up[first]
+        known = (altitude[first] != INVALID_ALTITUDE) & (altitude[second] != INVALID_ALTITUDE)
+        # 高度未知时令不等式恒成立（-1 < 0）
+        v_lo, v_hi = _interval(np.where(known, vz * vz, 0.0), np.where(known, 2 * pz * vz, 0.0),
+                               np.where(known, pz * pz - self.vertical_separation ** 2, -1.0))
+        lo = np.maximum(np.maximum(h_lo, v_lo), 0.0)
+        hi = np.minimum(np.minimum(h_hi, v_hi), window)
+
+        hit = lo <= hi
+        return (np.column_stack([slots[first[hit]], slots[second[hit]]]),
+                np.column_stack([now + lo[hit], now + hi[hit]]))
@@ -0,0 +1,259 @@
+"""常驻解码服务：预先fork的工作进程在Unix域套接字上提供解码，省去每次启动解释器和导入模块的开销
+
+用法:
+    python -m daemon [-s 套接字路径] [-w 工作进程数]
+
+请求和响应都由5字节头部加负载组成：
+    请求头: 操作码(uint8) + 负载长度(uint32，小端)，解码请求的负载为首尾相接的若干报文
+    响应头: 状态码(uint8) + 负载长度(uint32，小端)，负载为UTF-8编码的JSON数组，
+            每个报文对应一个元素：解码得到的记录列表，或 {"error": 错误信息}
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import stat
+import struct
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from capture import frame_length
+from records import decode_records
+
+DEFAULT_SOCKET = "/tmp/remote-id-decoder.sock"
+HEADER = struct.Struct('<BI')
+MAX_PAYLOAD = 16 * 1024 * 1024  # 单个请求负载上限
+
+OP_DECODE = 0x01
+
+STATUS_OK = 0x00
+STATUS_ERROR = 0x01
+
+
+def _recv_exact(sock: socket.socket, size: int) -> Optional[bytes]:
+    """读取指定长度的数据，对端在读取前关闭连接时返回 None"""
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            if received == 0:
+                return None
+            raise ConnectionError("连接意外关闭")
+        received += n
+    return bytes(buffer)
+
+
+def decode_payload(payload: bytes) -> List[Any]:
+    """逐个解码负载中的报文，单个报文出错不影响其余报文"""
+    results = []
+    pos = 0
+    while pos < len(payload):
+        try:
+            end = pos + frame_length(payload, pos)
+            if end > len(payload):
+                raise ValueError("数据长度不符合要求")
+        except (ValueError, IndexError) as e:
+            results.append({'error': str(e) or "数据长度不符合要求"})
+            break
+        try:
+            results.append(decode_records(payload[pos:end]))
+        except (ValueError, NotImplementedError) as e:
+            results.append({'error': str(e)})
+        pos = end
+    return results
+
+
+def handle_request(op: int, payload: bytes) -> Tuple[int, bytes]:
+    """处理单个请求，返回状态码和响应负载"""
+    if op == OP_DECODE:
+        return STATUS_OK, json.dumps(decode_payload(payload), ensure_ascii=False).encode('utf-8')
+    return STATUS_ERROR, f"未知的操作码: {op}".encode('utf-8')
+
+
+def serve_connection(conn: socket.socket) -> None:
+    """在同一连接上循环处理请求，直到客户端关闭连接"""
+    with conn:
+        while True:
+            header = _recv_exact(conn, HEADER.size)
+            if header is None:
+                return
+            op, length = HEADER.unpack(header)
+            if length > MAX_PAYLOAD:
+                message = "请求负载过大".encode('utf-8')
+                conn.sendall(HEADER.pack(STATUS_ERROR, len(message)) + message)
+                return
+            payload = _recv_exact(conn, length) if length else b''
+            if payload is None:
+                return
+            status, body = handle_request(op, payload)
+            conn.sendall(HEADER.pack(status, len(body)) + body)
+
+
+def _remove_socket(path: str) -> None:
+    """删除上次运行遗留的套接字文件，不删除其它类型的文件"""
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise ValueError(f"路径已存在且不是套接字: {path}")
+    os.unlink(path)
+
+
+class DecodeDaemon:
+    """预先fork的解码服务：父进程监听套接字并看护工作进程，工作进程共享监听套接字各自 accept"""
+
+    def __init__(self, path: str = DEFAULT_SOCKET, workers: Optional[int] = None):
+        self.path = path
+        self.workers = workers or os.cpu_count() or 1
+        self._sock: Optional[socket.socket] = None
+        self._children = set()
+
+    def serve_forever(self) -> None:
+        """启动工作进程并在其退出时重新拉起，收到 SIGTERM/SIGINT 后停止；路径已存在且不是套接字时抛出 ValueError"""
+        _remove_socket(self.path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.bind(self.path)
+        self._sock.listen(128)
+
+        signal.signal(signal.SIGTERM, self._terminate)
+        try:
+            for _ in range(self.workers):
+                self._spawn()
+            while True:
+                try:
+                    pid, _ = os.wait()
+                except ChildProcessError:
+                    break
+                if pid in self._children:
+                    self._children.discard(pid)
+                    self._spawn()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+
+    def shutdown(self) -> None:
+        """终止全部工作进程并删除套接字文件"""
+        for pid in list(self._children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self._children.clear()
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+            try:
+                _remove_socket(self.path)
+            except ValueError:
+                pass  # 套接字文件已被其它文件替换
+
+    def _terminate(self, signum, frame):
+        raise KeyboardInterrupt
+
+    def _spawn(self) -> None:
+        # 记录子进程之前屏蔽 SIGTERM，否则父进程可能在记录前退出，遗留的工作进程不会被终止
+        signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGTERM})
+        pid = os.fork()
+        if pid:
+            self._children.add(pid)
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGTERM})
+            return
+
+        # 工作进程
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGTERM})
+        try:
+            while True:
+                conn, _ = self._sock.accept()
+                try:
+                    serve_connection(conn)
+                except (ConnectionError, OSError):
+                    pass
+        finally:
+            os._exit(0)
+
+
+class DecodeClient:
+    """解码服务客户端，复用同一连接发送多个请求，连接断开时自动重连一次"""
+
+    def __init__(self, path: str = DEFAULT_SOCKET, timeout: Optional[float] = None):
+        self.path = path
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+
+    def _connect(self) -> socket.socket:
+        if self._sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            self._sock = sock
+        return self._sock
+
+    def request(self, op: int, payload: bytes) -> bytes:
+        """发送请求并返回响应负载，服务端返回错误时抛出 ValueError"""
+        message = HEADER.pack(op, len(payload)) + payload
+        for attempt in range(2):
+            sock = self._connect()
+            try:
+                sock.sendall(message)
+                header = _recv_exact(sock, HEADER.size)
+                if header is None:
+                    raise ConnectionError("连接意外关闭")
+                status, length = HEADER.unpack(header)
+                body = _recv_exact(sock, length) if length else b''
+                if body is None:
+                    raise ConnectionError("连接意外关闭")
+                break
+            except ConnectionError:
+                self.close()
+                if attempt:
+                    raise
+            except BaseException:
+                # 超时等错误后连接中可能残留部分响应，不能被下一个请求读到
+                self.close()
+                raise
+        if status != STATUS_OK:
+            raise ValueError(body.decode('utf-8'))
+        return body
+
+    def decode_many(self, messages: Iterable[bytes]) -> List[Any]:
+        """在一个请求中解码多个报文，每个报文返回记录列表或 {"error": 错误信息}"""
+        return json.loads(self.request(OP_DECODE, b''.join(messages)))
+
+    def decode(self, data: bytes) -> List[Dict[str, Any]]:
+        """解码单个报文，返回每个（子）报文对应的记录"""
+        result = self.decode_many([data])[0]
+        if isinstance(result, dict):
+            raise ValueError(result['error'])
+        return result
+
+    def close(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m daemon", description="Remote ID 常驻解码服务")
+    parser.add_argument('-s', '--socket', default=DEFAULT_SOCKET, help=f"Unix域套接字路径（默认 {DEFAULT_SOCKET}）")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="工作进程数（默认为CPU核数）")
+    args = parser.parse_args(argv)
+    DecodeDaemon(args.socket, args.workers).serve_forever()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+from typing import Callable, Iterable, Union
+
+import numpy as np
+
+from enums import *
+from view import (FRAME_SIZE, ID_OFFSET, ID_LENGTH, LATITUDE_OFFSET,
+                  LONGITUDE_OFFSET, GEODETIC_ALTITUDE_OFFSET, iter_views)
+
+FrameSource = Union[bytes, bytearray, memoryview, np.ndarray, Iterable[bytes]]
+
+
+def frames_array(frames: FrameSource) -> np.ndarray:
+    """将报文转换为 (N, 25) 的 uint8 数组
+
+    连续的字节缓冲区（N个25字节报文首尾相接）直接按原内存构造视图，不复制数据；
+    报文序列中的打包报文会被展开为子报文。
+    """
+    if isinstance(frames, np.ndarray):
+        array = frames
+    elif isinstance(frames, (bytes, bytearray, memoryview)):
+        array = np.frombuffer(frames, dtype=np.uint8)
+    else:
+        chunks = []
+        for message in frames:
+            if message and (message[0] >> 4) & 0x0F == MessageType.PACK.value:
+                chunks.extend(view.buffer for view in iter_views(message))
+            else:
+                chunks.append(message)
+        array = np.frombuffer(b''.join(chunks), dtype=np.uint8)
+
+    if array.ndim == 1:
+        if array.size % FRAME_SIZE:
+            raise ValueError("数据长度不符合要求")
+        array = array.reshape(-1, FRAME_SIZE)
+    if array.ndim != 2 or array.shape[1] != FRAME_SIZE or array.dtype != np.uint8:
+        raise ValueError("报文数组必须为 (N, 25) 的 uint8 数组")
+    return np.ascontiguousarray(array)
+
+
+def field(frames: np.ndarray, offset: int, dtype: str) -> np.ndarray:
+    """按固定偏移取出每个报文中的多字节字段，返回跨步视图而不复制数据"""
+    return np.ndarray(shape=(frames.shape[0],), dtype=dtype, buffer=frames,
+                      offset=offset, strides=(frames.strides[0],))
+
+
+class Predicate:
+    """报文过滤谓词：对未解码的报文数组做字节级判断，返回布尔掩码
+
+    谓词可以用 &、|、~ 组合，组合后的谓词仍然整体以NumPy向量化执行。
+    """
+
+    def __init__(self, func: Callable[[np.ndarray], np.ndarray]):
+        self._func = func
+
+    def mask(self, frames: FrameSource) -> np.ndarray:
+        """计算每个报文是否满足谓词"""
+        return self._func(frames_array(frames))
+
+    def select(self, frames: FrameSource) -> np.ndarray:
+        """返回满足谓词的报文数组，被过滤掉的报文不会被解码"""
+        array = frames_array(frames)
+        return array[self._func(array)]
+
+    def __and__(self, other: 'Predicate') -> 'Predicate':
+        left, right = self._func, other._func
+        return Predicate(lambda frames: left(frames) & right(frames))
+
+    def __or__(self, other: 'Predicate') -> 'Predicate':
+        left, right = self._func, other._func
+        return Predicate(lambda frames: left(frames) | right(frames))
+
+    def __invert__(self) -> 'Predicate':
+        func = self._func
+        return Predicate(lambda frames: ~func(frames))
+
+
+def message_type(*message_types: MessageType) -> Predicate:
+    """报文头高4位为指定的报文类型"""
+    values = np.array([t.value for t in message_types], dtype=np.uint8)
+    if len(values) == 1:
+        value = values[0]
+        return Predicate(lambda frames: (frames[:, 0] >> 4) == value)
+    return Predicate(lambda frames: np.isin(frames[:, 0] >> 4, values))
+
+
+def _prefix(message: MessageType, prefix: str) -> Predicate:
+    prefix_bytes = prefix.encode('ascii')
+    if len(prefix_bytes) > ID_LENGTH:
+        raise ValueError("识别码前缀必须小于20字节")
+    expected = np.frombuffer(prefix_bytes, dtype=np.uint8)
+    end = ID_OFFSET + len(prefix_bytes)
+    value = message.value
+
+    def func(frames: np.ndarray) -> np.ndarray:
+        return ((frames[:, 0] >> 4) == value) & (frames[:, ID_OFFSET:end] == expected).all(axis=1)
+    return Predicate(func)
+
+
+def id_prefix(prefix: str) -> Predicate:
+    """基本ID报文的识别码以指定前缀开头"""
+    return _prefix(MessageType.BASIC_ID, prefix)
+
+
+def operator_id_prefix(prefix: str) -> Predicate:
+    """控制站ID报文的控制站ID以指定前缀开头"""
+    return _prefix(MessageType.OPERATOR_ID, prefix)
+
+
+def bounding_box(min_latitude: float, min_longitude: float,
+                 max_latitude: float, max_longitude: float) -> Predicate:
+    """位置向量报文的经纬度位于矩形范围内（含边界）
+
+    min_longitude 大于 max_longitude 时表示跨越180度经线的范围。
+    """
+    if abs(min_latitude) > 90 or abs(max_latitude) > 90:
+        raise ValueError("纬度必须小于 90 度")
+    if abs(min_longitude) > 180 or abs(max_longitude) > 180:
+        raise ValueError("经度必须小于 180 度")
+    # 将边界换算为报文中的整数单位，比较时无需对每个报文做浮点换算
+    lat_low, lat_high = round(min_latitude * 1e7), round(max_latitude * 1e7)
+    lon_low, lon_high = round(min_longitude * 1e7), round(max_longitude * 1e7)
+    wraps = lon_low > lon_high
+    value = MessageType.LOCATION.value
+
+    def func(frames: np.ndarray) -> np.ndarray:
+        latitude = field(frames, LATITUDE_OFFSET, '<i4')
+        longitude = field(frames, LONGITUDE_OFFSET, '<i4')
+        mask = (frames[:, 0] >> 4) == value
+        mask &= (latitude >= lat_low) & (latitude <= lat_high)
+        if wraps:
+            mask &= (longitude >= lon_low) | (longitude <= lon_high)
+        else:
+            mask &= (longitude >= lon_low) & (longitude <= lon_high)
+        return mask
+    return Predicate(func)
+
+
+def altitude_range(floor: float, ceiling: float) -> Predicate:
+    """位置向量报文的几何高度位于指定范围内（含边界）"""
+    low = max(0, int(np.ceil((floor + 1000) / 0.5)))
+    high = min(0xFFFF, int(np.floor((ceiling + 1000) / 0.5)))
+    value = MessageType.LOCATION.value
+
+    def func(frames: np.ndarray) -> np.ndarray:
+        altitude = field(frames, GEODETIC_ALTITUDE_OFFSET, '<u2')
+        return ((frames[:, 0] >> 4) == value) & (altitude >= low) & (altitude <= high)
+    return Predicate(func)
+
+
+def operational_status(*statuses: OperationalStatus) -> Predicate:
+    """位置向量报文的运行状态为指定值之一"""
+    values = np.array([s.value for s in statuses], dtype=np.uint8)
+    value = MessageType.LOCATION.value
+    return Predicate(lambda frames: ((frames[:, 0] >> 4) == value) & np.isin(frames[:, 1] >> 4, values))
@@ -0,0 +1,182 @@
+import time
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from main import UnmannedAircraft, PROTOCOL_VERSION
+from enums import *
+from columns import location_columns, system_columns
+from filters import frames_array
+from ids import IdTable
+from view import FRAME_SIZE, ID_OFFSET, ID_LENGTH, iter_views
+
+# 状态表中保存的报文类型
+STORED_TYPES = (MessageType.BASIC_ID, MessageType.LOCATION, MessageType.SELF_ID,
+                MessageType.SYSTEM, MessageType.OPERATOR_ID)
+_TYPE_INDEX = {message_type.value: i for i, message_type in enumerate(STORED_TYPES)}
+_PACK = MessageType.PACK.value
+
+
+class FleetStore:
+    """结构化数组形式的机群状态表
+
+    每类报文一个预分配的 (容量, 25) uint8 数组，每架航空器占一行，保存该类报文最近一次的原始字节；
+    另有每类报文的接收时间列（float64，NaN 表示尚未收到）。各字段通过固定偏移的跨步视图读取，
+    快照由 columns 模块向量化解码，不为每架航空器创建对象。
+
+    每架航空器占用 5 * 25 + 5 * 8 = 165 字节数组空间，另加广播地址到行号的字典条目和地址对象，
+    100万架时实测合计约250字节/架；而字典中保存 UnmannedAircraft 对象约需1.9KB/架
+    （见 python bench.py fleet）。
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._capacity = 0
+        self._count = 0
+        self._slots: Dict[bytes, int] = {}  # 广播地址 -> 行号
+        self._addresses: List[bytes] = []  # 行号 -> 广播地址
+        self._frames: List[np.ndarray] = [np.empty((0, FRAME_SIZE), dtype=np.uint8) for _ in STORED_TYPES]
+        self._received: List[np.ndarray] = [np.empty(0, dtype=np.float64) for _ in STORED_TYPES]
+        self._views: List[memoryview] = []
+        self._grow(max(capacity, 1))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, address: bytes) -> bool:
+        return address in self._slots
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def nbytes(self) -> int:
+        """预分配数组占用的字节数（不含地址字典）"""
+        return sum(a.nbytes for a in self._frames) + sum(a.nbytes for a in self._received)
+
+    @property
+    def addresses(self) -> List[bytes]:
+        """按行号排列的广播地址"""
+        return self._addresses
+
+    def _grow(self, capacity: int) -> None:
+        """按新容量重新分配数组并复制已有行"""
+        for i in range(len(STORED_TYPES)):
+            frames = np.zeros((capacity, FRAME_SIZE), dtype=np.uint8)
+            frames[:self._count] = self._frames[i][:self._count]
+            received = np.full(capacity, np.nan)
+            received[:self._count] = self._received[i][:self._count]
+            self._frames[i], self._received[i] = frames, received
+        self._views = [memoryview(frames).cast('B') for frames in self._frames]
+        self._capacity = capacity
+
+    def slot(self, address: bytes) -> int:
+        """返回航空器的行号，新航空器分配新行"""
+        slot = self._slots.get(address)
+        if slot is None:
+            if self._count == self._capacity:
+                self._grow(self._capacity * 2)
+            slot = self._slots[address] = self._count
+            self._addresses.append(address)
+            self._count += 1
+        return slot
+
+    def update(self, address: bytes, data: bytes, received: Optional[float] = None) -> int:
+        """将报文原始字节就地写入航空器所在行，打包报文逐个写入子报文，返回行号"""
+        if not data:
+            raise ValueError("空数据")
+        if data[0] & 0x0F > PROTOCOL_VERSION:
+            raise ValueError(f"协议版本不兼容: {data[0] & 0x0F}，当前版本: {PROTOCOL_VERSION}")
+        if received is None:
+            received = time.time()
+
+        if data[0] >> 4 == _PACK:
+            frames = [view.buffer for view in iter_views(data)]
+        elif len(data) != FRAME_SIZE:
+            raise ValueError("数据长度不符合要求")
+        else:
+            frames = [data]
+        indexes = []
+        for frame in frames:
+            index = _TYPE_INDEX.get(frame[0] >> 4)
+            if index is None:
+                raise ValueError(f"未知的报文类型: {frame[0] >> 4}")
+            indexes.append(index)
+
+        slot = self.slot(address)
+        start = slot * FRAME_SIZE
+        for index, frame in zip(indexes, frames):
+            self._views[index][start:start + FRAME_SIZE] = frame
+            self._received[index][slot] = received
+        return slot
+
+    def update_many(self, addresses: Sequence[bytes], frames, received: Union[float, np.ndarray, None] = None) -> np.ndarray:
+        """批量写入25字节报文（打包报文需先展开），按报文类型分组以向量化方式写入，返回各报文的行号"""
+        frames = frames_array(frames)
+        if len(addresses) != len(frames):
+            raise ValueError("广播地址数量与报文数量不一致")
+        if received is None:
+            received = time.time()
+        received = np.broadcast_to(np.asarray(received, dtype=np.float64), (len(frames),))
+
+        types = frames[:, 0] >> 4
+        if (frames[:, 0] & 0x0F).max(initial=0) > PROTOCOL_VERSION:
+            raise ValueError("协议版本不兼容")
+        known = np.isin(types, list(_TYPE_INDEX))
+        if not known.all():
+            raise ValueError(f"未知的报文类型: {types[~known][0]}")
+
+        slots = np.fromiter((self.slot(address) for address in addresses), dtype=np.intp, count=len(addresses))
+        for value, index in _TYPE_INDEX.items():
+            mask = types == value
+            if mask.any():
+                # 同一行出现多次时，花式索引赋值以最后一次为准，与逐个写入一致
+                self._frames[index][slots[mask]] = frames[mask]
+                self._received[index][slots[mask]] = received[mask]
+        return slots
+
+    def frames(self, message_type: MessageType) -> np.ndarray:
+        """已分配行中某类报文的原始字节，(N, 25) 视图"""
+        return self._frames[_TYPE_INDEX[message_type.value]][:self._count]
+
+    def received(self, message_type: MessageType) -> np.ndarray:
+        """已分配行中某类报文的接收时间，NaN 表示尚未收到"""
+        return self._received[_TYPE_INDEX[message_type.value]][:self._count]
+
+    def location(self) -> Dict[str, np.ndarray]:
+        """位置向量字段的向量化快照，附带 received 列"""
+        snapshot = location_columns(self.frames(MessageType.LOCATION))
+        snapshot['received'] = self.received(MessageType.LOCATION).copy()
+        return snapshot
+
+    def system(self) -> Dict[str, np.ndarray]:
+        """系统报文字段的向量化快照，附带 received 列"""
+        snapshot = system_columns(self.frames(MessageType.SYSTEM))
+        snapshot['received'] = self.received(MessageType.SYSTEM).copy()
+        return snapshot
+
+    def ids(self) -> np.ndarray:
+        """各航空器的识别码（'S20' 数组，未收到基本ID报文时为空）"""
+        frames = self.frames(MessageType.BASIC_ID)
+        return np.ascontiguousarray(frames[:, ID_OFFSET:ID_OFFSET + ID_LENGTH]).view('S20').ravel()
+
+    def id_handles(self, table: IdTable, message_type: MessageType = MessageType.BASIC_ID) -> np.ndarray:
+        """各航空器识别码（或 OPERATOR_ID 时的控制站ID）在识别码字典 table 中的句柄（int64），未收到该类报文时为 -1"""
+        if message_type not in (MessageType.BASIC_ID, MessageType.OPERATOR_ID):
+            raise ValueError(f"报文类型不包含识别码: {message_type}")
+        handles = np.full(self._count, -1, dtype=np.int64)
+        received = ~np.isnan(self.received(message_type))
+        frames = self.frames(message_type)[received]
+        handles[received] = table.intern_many(frames[:, ID_OFFSET:ID_OFFSET + ID_LENGTH])
+        return handles
+
+    def get(self, address: bytes) -> Optional[UnmannedAircraft]:
+        """将一架航空器的状态物化为 UnmannedAircraft"""
+        slot = self._slots.get(address)
+        if slot is None:
+            return None
+        ua = UnmannedAircraft()
+        for index in range(len(STORED_TYPES)):
+            if not np.isnan(self._received[index][slot]):
+                ua.decode_message(self._frames[index][slot].tobytes())
+        return ua
@@ -0,0 +1,410 @@
+"""模拟机群报文负载生成器，用于对接收端做压力测试
+
+用法:
+    python -m generator [-n 航空器数量] [-r 总速率] [-d 持续秒数 | -c 报文总数]
+                        [-o 抓包文件 | -u 主机:端口] [-m 畸形报文比例] [-s 随机种子]
+
+未指定输出时将抓包文件写到标准输出。结束时在标准错误输出实际达到的速率。
+"""
+import argparse
+import socket
+import sys
+import time
+from dataclasses import dataclass
+from typing import BinaryIO, List, Optional, Sequence, TextIO, Tuple
+
+import numpy as np
+
+from main import UnmannedAircraft, PROTOCOL_VERSION
+from enums import *
+from capture import CaptureWriter, Record, pack_datagram
+from filters import field
+from view import FRAME_SIZE, LATITUDE_OFFSET, LONGITUDE_OFFSET, GEODETIC_ALTITUDE_OFFSET, \
+    TIMESTAMP_OFFSET, SYSTEM_TIMESTAMP_OFFSET, SYSTEM_EPOCH, METERS_PER_DEGREE
+
+
+# 每架航空器依次发送的报文，位置向量报文约占一半
+SCHEDULE = (MessageType.LOCATION, MessageType.BASIC_ID, MessageType.LOCATION, MessageType.SYSTEM,
+            MessageType.LOCATION, MessageType.SELF_ID, MessageType.LOCATION, MessageType.OPERATOR_ID,
+            MessageType.LOCATION, MessageType.PACK)
+PACK_CONTENTS = (MessageType.BASIC_ID, MessageType.LOCATION, MessageType.SELF_ID,
+                 MessageType.SYSTEM, MessageType.OPERATOR_ID)
+_STATIC_TYPES = (MessageType.BASIC_ID, MessageType.SELF_ID, MessageType.SYSTEM, MessageType.OPERATOR_ID)
+
+
+@dataclass
+class Region:
+    """模拟航空器分布的区域"""
+    name: str
+    latitude: float
+    longitude: float
+    radius: float  # 半径，度
+    classification_type: ClassificationType
+
+
+DEFAULT_REGIONS = (
+    Region("Beijing", 39.9042, 116.4074, 0.3, ClassificationType.CHINA),
+    Region("Shenzhen", 22.5431, 114.0579, 0.2, ClassificationType.CHINA),
+    Region("Paris", 48.8566, 2.3522, 0.3, ClassificationType.EUROPEAN_UNION),
+    Region("Berlin", 52.5200, 13.4050, 0.3, ClassificationType.EUROPEAN_UNION),
+    Region("New York", 40.7128, -74.0060, 0.3, ClassificationType.UNDECLARED),
+)
+
+# 航空器类型及其占比
+UA_TYPES = ((UAType.MULTIROTOR, 0.7), (UAType.AEROPLANE, 0.1), (UAType.HYBRID_LIFT, 0.08),
+            (UAType.GYROPLANE, 0.04), (UAType.GLIDER, 0.03), (UAType.FREE_BALLOON, 0.03),
+            (UAType.AIRSHIP, 0.02))
+# 运行状态及初始占比
+STATUSES = ((OperationalStatus.GROUND, 0.15), (OperationalStatus.AIRBORNE, 0.8),
+            (OperationalStatus.UNDECLARED, 0.04), (OperationalStatus.EMERGENCY, 0.01))
+
+
+def encode_locations(columns: dict, timestamp: np.ndarray) -> np.ndarray:
+    """向量化编码位置向量报文，为 columns.location_columns 的逆过程，返回 (N, 25) uint8 数组
+
+    columns 中的数值字段与 UnmannedAircraft 同名，枚举字段以取值表示；timestamp 为每小时内的0.1秒数。
+    """
+    direction = np.asarray(columns['direction'], dtype=np.int64) % 360
+    speed = np.asarray(columns['horizontal_speed'], dtype=np.float64)
+    count = len(direction)
+    frames = np.zeros((count, FRAME_SIZE), dtype=np.uint8)
+
+    ew = direction >= 180
+    fast = speed > 255 * 0.25
+    speed_byte = np.where(fast, np.minimum(np.round((speed - 255 * 0.25) / 0.75), 254), np.round(speed / 0.25))
+    frames[:, 0] = (MessageType.LOCATION.value << 4) | PROTOCOL_VERSION
+    frames[:, 1] = ((np.asarray(columns['operational_status']) & 0x0F) << 4
+                    | (np.asarray(columns['height_type']) & 0x01) << 2 | ew << 1 | fast)
+    frames[:, 2] = direction - ew * 180
+    frames[:, 3] = speed_byte
+    frames[:, 4] = np.round(np.asarray(columns['vertical_speed']) / 0.5).astype(np.int8).view(np.uint8)
+    field(frames, LATITUDE_OFFSET, '<i4')[:] = np.round(np.asarray(columns['latitude']) * 1e7)
+    field(frames, LONGITUDE_OFFSET, '<i4')[:] = np.round(np.asarray(columns['longitude']) * 1e7)
+    field(frames, 13, '<u2')[:] = np.round((np.asarray(columns['pressure_altitude']) + 1000) / 0.5)
+    field(frames, GEODETIC_ALTITUDE_OFFSET, '<u2')[:] = np.round((np.asarray(columns['geodetic_altitude']) + 1000) / 0.5)
+    field(frames, 17, '<u2')[:] = np.round((np.asarray(columns['height']) + 1000) / 0.5)
+    frames[:, 19] = (np.asarray(columns['geodetic_accuracy']) & 0x0F) << 4 | np.asarray(columns['horizontal_accuracy']) & 0x0F
+    frames[:, 20] = (np.asarray(columns['pressure_accuracy']) & 0x0F) << 4 | np.asarray(columns['speed_accuracy']) & 0x0F
+    field(frames, TIMESTAMP_OFFSET, '<u2')[:] = timestamp
+    frames[:, 23] = np.round(np.asarray(columns['timestamp_accuracy']) * 10).astype(np.uint8) & 0x0F
+    return frames
+
+
+class FleetSimulator:
+    """模拟 N 架航空器的飞行轨迹
+
+    静态信息（基本ID、运行描述、系统、控制站ID报文）在创建时用 UnmannedAircraft 的编码器各编码一次，
+    动态信息保存在NumPy数组中，位置向量报文由 encode_locations 批量编码，系统报文只就地更新时间戳。
+    """
+
+    def __init__(self, count: int, seed: Optional[int] = None, regions: Sequence[Region] = DEFAULT_REGIONS,
+                 start: Optional[float] = None):
+        if count < 1:
+            raise ValueError("航空器数量必须大于0")
+        self.count = count
+        self.time = time.time() if start is None else start  # 模拟时钟（Unix时间戳）
+        self._rng = rng = np.random.default_rng(seed)
+        self.addresses = [bytes([0x02]) + (i + 1).to_bytes(5, 'big') for i in range(count)]
+
+        region = rng.integers(0, len(regions), count)
+        centers = np.array([(r.latitude, r.longitude, r.radius) for r in regions])[region]
+        self.latitude = centers[:, 0] + rng.uniform(-1, 1, count) * centers[:, 2]
+        self.longitude = centers[:, 1] + rng.uniform(-1, 1, count) * centers[:, 2]
+        self.altitude = rng.uniform(30, 120, count)
+        self.direction = rng.uniform(0, 360, count)
+        self.speed = rng.uniform(2, 25, count)
+        self.vertical_speed = np.zeros(count)
+        self.status = rng.choice([s.value for s, _ in STATUSES], count, p=[p for _, p in STATUSES])
+        self.ua_type = rng.choice([t.value for t, _ in UA_TYPES], count, p=[p for _, p in UA_TYPES])
+
+        # 静态报文：每类一个 (N, 25) 数组
+        self._static = {message_type: np.empty((count, FRAME_SIZE), dtype=np.uint8) for message_type in _STATIC_TYPES}
+        for i in range(count):
+            r = regions[region[i]]
+            ua = UnmannedAircraft(
+                id=f"SIM{i + 1:010d}",
+                id_type=IDType.SERIAL_NUMBER,
+                ua_type=UAType(int(self.ua_type[i])),
+                description=f"Simulated flight {i + 1}",
+                classification_type=r.classification_type,
+                operator_latitude=round(float(self.latitude[i]), 7),
+                operator_longitude=round(float(self.longitude[i]), 7),
+                operator_altitude=20.0,
+                area_radius=2000.0,
+                area_ceiling=500.0,
+                area_floor=0.0,
+                china_ua_class=ChinaUAClass.LIGHT,
+                eu_ua_category=EUUACategory.OPEN,
+                eu_ua_class=EUUAClass.CLASS_1,
+                operator_id=f"OP{region[i]:02d}{i + 1:010d}",
+            )
+            self._static[MessageType.BASIC_ID][i] = np.frombuffer(ua.encode_basic_id(), dtype=np.uint8)
+            self._static[MessageType.SELF_ID][i] = np.frombuffer(ua.encode_self_id(), dtype=np.uint8)
+            self._static[MessageType.SYSTEM][i] = np.frombuffer(ua.encode_system(), dtype=np.uint8)
+            self._static[MessageType.OPERATOR_ID][i] = np.frombuffer(ua.encode_operator_id(), dtype=np.uint8)
+
+    def advance(self, now: float) -> None:
+        """将模拟时钟推进到 now，所有航空器按当前航向和速度飞行，并随机调整航向、速度和状态"""
+        dt = now - self.time
+        if dt <= 0:
+            return
+        self.time = now
+        rng, count = self._rng, self.count
+        airborne = self.status != OperationalStatus.GROUND.value
+        heading = np.radians(self.direction)
+        distance = np.where(airborne, self.speed * dt, 0.0)
+        self.latitude = np.clip(self.latitude + distance * np.cos(heading) / METERS_PER_DEGREE, -89.9, 89.9)
+        self.longitude = (self.longitude + distance * np.sin(heading)
+                          / (METERS_PER_DEGREE * np.cos(np.radians(self.latitude))) + 180) % 360 - 180
+        self.altitude = np.clip(self.altitude + np.where(airborne, self.vertical_speed * dt, 0.0), 0.0, 500.0)
+
+        scale = min(dt, 10.0)
+        self.direction = (self.direction + rng.normal(0, 5, count) * scale) % 360
+        self.speed = np.clip(self.speed + rng.normal(0, 0.5, count) * scale, 0.0, 40.0)
+        self.vertical_speed = np.clip(self.vertical_speed + rng.normal(0, 0.3, count) * scale, -5.0, 5.0)
+        # 少量航空器起飞、降落或进入紧急状态
+        change = rng.random(count) < 0.001 * scale
+        if change.any():
+            self.status[change] = rng.choice([s.value for s, _ in STATUSES], int(change.sum()),
+                                             p=[p for _, p in STATUSES])
+
+    def location_frames(self, indices: np.ndarray) -> np.ndarray:
+        """按当前状态批量编码位置向量报文"""
+        tenths = int(self.time % 3600 * 10)
+        return encode_locations({
+            'operational_status': self.status[indices],
+            'height_type': np.zeros(len(indices), dtype=np.int64),
+            'direction': self.direction[indices].astype(np.int64),
+            'horizontal_speed': self.speed[indices],
+            'vertical_speed': self.vertical_speed[indices],
+            'latitude': self.latitude[indices],
+            'longitude': self.longitude[indices],
+            'pressure_altitude': self.altitude[indices] + 10,
+            'geodetic_altitude': self.altitude[indices],
+            'height': self.altitude[indices],
+            'geodetic_accuracy': np.full(len(indices), VerticalAccuracy.WITHIN_3m.value),
+            'horizontal_accuracy': np.full(len(indices), HorizontalAccuracy.WITHIN_3m.value),
+            'pressure_accuracy': np.full(len(indices), VerticalAccuracy.WITHIN_10m.value),
+            'speed_accuracy': np.full(len(indices), SpeedAccuracy.WITHIN_1mps.value),
+            'timestamp_accuracy': np.full(len(indices), 0.2),
+        }, np.full(len(indices), tenths))
+
+    def frames(self, message_type: MessageType, indices: np.ndarray) -> np.ndarray:
+        """批量取得指定航空器某类25字节报文的当前内容"""
+        if message_type == MessageType.LOCATION:
+            return self.location_frames(indices)
+        frames = self._static[message_type][indices]
+        if message_type == MessageType.SYSTEM:
+            field(frames, SYSTEM_TIMESTAMP_OFFSET, '<u4')[:] = max(int(self.time) - SYSTEM_EPOCH, 0)
+        return frames
+
+    def pack_frames(self, indices: np.ndarray) -> np.ndarray:
+        """批量编码包含全部五类报文的打包报文，返回 (N, 3 + 5 * 25) uint8 数组"""
+        packs = np.empty((len(indices), 3 + len(PACK_CONTENTS) * FRAME_SIZE), dtype=np.uint8)
+        packs[:, 0] = (MessageType.PACK.value << 4) | PROTOCOL_VERSION
+        packs[:, 1] = FRAME_SIZE
+        packs[:, 2] = len(PACK_CONTENTS)
+        for k, message_type in enumerate(PACK_CONTENTS):
+            packs[:, 3 + k * FRAME_SIZE:3 + (k + 1) * FRAME_SIZE] = self.frames(message_type, indices)
+        return packs
+
+
+def corrupt(data: bytes, rng: np.random.Generator) -> bytes:
+    """生成一个畸形报文：截断、协议版本错误、未知报文类型、随机字节或打包数量错误之一"""
+    kind = rng.integers(0, 5)
+    if kind == 0:
+        return data[:int(rng.integers(1, len(data)))]
+    if kind == 1:
+        return bytes([data[0] | 0x0F]) + data[1:]
+    if kind == 2:
+        return bytes([0x62]) + data[1:]
+    if kind == 3:
+        return rng.bytes(FRAME_SIZE)
+    return bytes([(MessageType.PACK.value << 4) | PROTOCOL_VERSION, FRAME_SIZE, 12]) + data[3:]
+
+
+class QueueSink:
+    """将记录放入进程内队列（如 queue.Queue），每条为 (接收时间, 广播地址, 报文)"""
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    def send(self, records: List[Record]) -> None:
+        put = self.queue.put
+        for record in records:
+            put(record)
+
+
+class CaptureSink:
+    """写入抓包文件"""
+
+    def __init__(self, stream: BinaryIO):
+        self._writer = CaptureWriter(stream)
+
+    def send(self, records: List[Record]) -> None:
+        write = self._writer.write
+        for received, address, data in records:
+            write(data, address, received)
+
+
+class UDPSink:
+    """以实时数据报（6字节广播地址 + 报文）发送到UDP端口"""
+
+    def __init__(self, host: str, port: int):
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._target = (host, port)
+
+    def send(self, records: List[Record]) -> None:
+        sendto, target = self._sock.sendto, self._target
+        for _, address, data in records:
+            sendto(pack_datagram(address, data), target)
+
+    def close(self) -> None:
+        self._sock.close()
+
+
+class GeneratorStats:
+    """生成速率统计"""
+
+    def __init__(self, rate: Optional[float]):
+        self.rate = rate  # 目标速率，None 表示不限速
+        self.sent = 0  # 发送的报文数（含畸形报文）
+        self.malformed = 0  # 其中的畸形报文数
+        self.elapsed = 0.0
+
+    @property
+    def achieved(self) -> float:
+        """实际达到的速率（条/秒）"""
+        return self.sent / self.elapsed if self.elapsed > 0 else 0.0
+
+    def report(self, stream: TextIO) -> None:
+        target = f"{self.rate:,.0f} 条/秒" if self.rate else "不限"
+        print(f"发送: {self.sent}  畸形: {self.malformed}  耗时: {self.elapsed:.3f} 秒  "
+              f"目标速率: {target}  实际速率: {self.achieved:,.0f} 条/秒", file=stream)
+
+
+class LoadGenerator:
+    """按总速率发送模拟机群的报文
+
+    以单调时钟计算截至当前应发送的报文数，不足时一次补发（每批最多 max_batch 条），
+    提前时休眠到下一条报文的时刻，因此短暂的延迟不会累积为速率偏差。
+    报文按 SCHEDULE 在航空器间轮转，每隔 count 条报文所有航空器各发送一条。
+    """
+
+    def __init__(self, simulator: FleetSimulator, rate: Optional[float] = None, malformed: float = 0.0,
+                 max_batch: int = 4096, seed: Optional[int] = None):
+        if rate is not None and rate <= 0:
+            raise ValueError("速率必须大于0")
+        if not 0 <= malformed <= 1:
+            raise ValueError("畸形报文比例必须在0-1之间")
+        self.simulator = simulator
+        self.rate = rate
+        self.malformed = malformed
+        self.max_batch = max_batch
+        self._rng = np.random.default_rng(seed)
+        self._counter = 0  # 已生成的报文序号
+
+    def batch(self, size: int, received: Optional[float] = None) -> Tuple[List[Record], int]:
+        """生成接下来的 size 条报文，返回记录列表和其中的畸形报文数"""
+        if received is None:
+            received = time.time()
+        simulator = self.simulator
+        simulator.advance(received)
+        sequence = np.arange(self._counter, self._counter + size)
+        self._counter += size
+        aircraft = sequence % simulator.count
+        kinds = (sequence // simulator.count) % len(SCHEDULE)
+
+        messages: List[Optional[bytes]] = [None] * size
+        for k, message_type in enumerate(SCHEDULE):
+            selected = np.flatnonzero(kinds == k)
+            if not len(selected):
+                continue
+            if message_type == MessageType.PACK:
+                rows = simulator.pack_frames(aircraft[selected])
+            else:
+                rows = simulator.frames(message_type, aircraft[selected])
+            data = rows.tobytes()
+            width = rows.shape[1]
+            for j, position in enumerate(selected.tolist()):
+                messages[position] = data[j * width:(j + 1) * width]
+
+        bad = 0
+        if self.malformed:
+            for position in np.flatnonzero(self._rng.random(size) < self.malformed).tolist():
+                messages[position] = corrupt(messages[position], self._rng)
+                bad += 1
+        addresses = simulator.addresses
+        return [(received, addresses[i], data) for i, data in zip(aircraft.tolist(), messages)], bad
+
+    def run(self, sink, duration: Optional[float] = None, limit: Optional[int] = None) -> GeneratorStats:
+        """发送报文直到达到持续时间或报文总数，返回统计"""
+        if duration is None and limit is None:
+            raise ValueError("必须指定持续时间或报文总数")
+        stats = GeneratorStats(self.rate)
+        start = time.perf_counter()
+        while True:
+            elapsed = time.perf_counter() - start
+            if (duration is not None and elapsed >= duration) or (limit is not None and stats.sent >= limit):
+                break
+            size = self.max_batch
+            if self.rate is not None:
+                due = int(self.rate * elapsed) + 1 - stats.sent
+                if due <= 0:
+                    wait = (stats.sent + 1) / self.rate - elapsed
+                    if duration is not None:
+                        wait = min(wait, duration - elapsed)
+                    time.sleep(max(wait, 0.0))
+                    continue
+                size = min(size, due)
+            if limit is not None:
+                size = min(size, limit - stats.sent)
+            records, bad = self.batch(size)
+            sink.send(records)
+            stats.sent += size
+            stats.malformed += bad
+        stats.elapsed = time.perf_counter() - start
+        return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m generator", description="Remote ID 模拟机群负载生成器")
+    parser.add_argument('-n', '--aircraft', type=int, default=1000, help="模拟航空器数量（默认 1000）")
+    parser.add_argument('-r', '--rate', type=float, default=None, help="总发送速率，条/秒（默认不限速）")
+    limit = parser.add_mutually_exclusive_group(required=True)
+    limit.add_argument('-d', '--duration', type=float, help="持续秒数")
+    limit.add_argument('-c', '--count', type=int, help="发送的报文总数")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument('-o', '--output', help="抓包文件，默认写到标准输出")
+    output.add_argument('-u', '--udp', metavar='HOST:PORT', help="发送到UDP端口")
+    parser.add_argument('-m', '--malformed', type=float, default=0.0, help="畸形报文比例（默认 0）")
+    parser.add_argument('-s', '--seed', type=int, default=None, help="随机种子")
+    parser.add_argument('-q', '--quiet', action='store_true', help="不输出速率统计")
+    args = parser.parse_args(argv)
+
+    generator = LoadGenerator(FleetSimulator(args.aircraft, args.seed), args.rate, args.malformed, seed=args.seed)
+    stream = None
+    if args.udp:
+        host, _, port = args.udp.rpartition(':')
+        sink = UDPSink(host or '127.0.0.1', int(port))
+    else:
+        stream = open(args.output, 'wb') if args.output else sys.stdout.buffer
+        sink = CaptureSink(stream)
+    try:
+        stats = generator.run(sink, args.duration, args.count)
+    except BrokenPipeError:
+        return 1
+    finally:
+        if isinstance(sink, UDPSink):
+            sink.close()
+        elif args.output:
+            stream.close()
+        else:
+            stream.flush()
+    if not args.quiet:
+        stats.report(sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+import math
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from enums import MessageType
+from columns import location_columns
+from filters import frames_array
+from view import INVALID_ALTITUDE, iter_views
+
+_STRIDE = 1 << 32  # 网格单元编号：纬向序号 * _STRIDE + 经向序号
+_LOCATION = MessageType.LOCATION.value
+
+
+@dataclass
+class Zone:
+    """禁飞区：多边形范围加高度区间（几何高度，米）"""
+    name: str
+    polygon: Sequence[Tuple[float, float]]  # 顶点 (纬度, 经度)，首尾不必重复
+    floor: float = -1000.0  # 高度下限
+    ceiling: float = 31767.0  # 高度上限
+
+
+class GeofenceEventType(Enum):
+    ENTER = 0x0
+    EXIT = 0x1
+
+
+@dataclass
+class GeofenceEvent:
+    """航空器进入或离开禁飞区"""
+    address: bytes
+    zone: Zone
+    event_type: GeofenceEventType
+    received: float
+
+
+class GeofenceIndex:
+    """禁飞区空间索引
+
+    预处理时将每个禁飞区的外接矩形登记到均匀经纬度网格的单元中，并为每个多边形预先计算
+    边表（起点经纬度、终点纬度、经度随纬度的变化率）。查询时只检查点所在单元中登记的禁飞区，
+    先比较外接矩形再用射线法判断点是否在多边形内，代价与禁飞区总数无关，只与单元内的禁飞区数量有关。
+    多边形按经纬度平面处理，不支持跨越180度经线的禁飞区。
+
+    高度无效（-1000米）的点视为位于任何高度区间内。
+    """
+
+    def __init__(self, zones: Iterable[Zone], cell_size: float = 0.05):
+        if cell_size <= 0:
+            raise ValueError("网格单元大小必须大于0")
+        self.zones = list(zones)
+        self.cell_size = cell_size
+        self._edges: List[np.ndarray] = []
+        bounds = []
+        for zone in self.zones:
+            if len(zone.polygon) < 3:
+                raise ValueError(f"禁飞区 {zone.name} 至少需要3个顶点")
+            vertices = np.asarray(zone.polygon, dtype=np.float64)
+            if np.abs(vertices[:, 0]).max() > 90 or np.abs(vertices[:, 1]).max() > 180:
+                raise ValueError(f"禁飞区 {zone.name} 的顶点超出经纬度范围")
+            self._edges.append(self._edge_table(vertices))
+            bounds.append((*vertices.min(axis=0), *vertices.max(axis=0)))
+        self._bounds = np.array(bounds, dtype=np.float64).reshape(-1, 4)  # 最小纬度, 最小经度, 最大纬度, 最大经度
+        self._floors = np.array([zone.floor for zone in self.zones], dtype=np.float64)
+        self._ceilings = np.array([zone.ceiling for zone in self.zones], dtype=np.float64)
+
+        self._cells: Dict[int, List[int]] = {}
+        for i, (min_lat, min_lon, max_lat, max_lon) in enumerate(self._bounds):
+            y0, x0 = self._cell(min_lat, min_lon)
+            y1, x1 = self._cell(max_lat, max_lon)
+            for y in range(y0, y1 + 1):
+                for x in range(x0, x1 + 1):
+                    self._cells.setdefault(y * _STRIDE + x, []).append(i)
+        self._cell_arrays = {key: np.array(zones, dtype=np.intp) for key, zones in self._cells.items()}
+
+    @staticmethod
+    def _edge_table(vertices: np.ndarray) -> np.ndarray:
+        """边表：每条边一行 (起点经度, 起点纬度, 终点纬度, 经度/纬度变化率)"""
+        start = vertices
+        end = np.roll(vertices, -1, axis=0)
+        d_lat = end[:, 0] - start[:, 0]
+        d_lon = end[:, 1] - start[:, 1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            slope = np.where(d_lat != 0, d_lon / d_lat, 0.0)
+        return np.column_stack([start[:, 1], start[:, 0], end[:, 0], slope])
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return (math.floor((latitude + 90) / self.cell_size),
+                math.floor((longitude + 180) / self.cell_size))
+
+    def _cell_keys(self, latitude: np.ndarray, longitude: np.ndarray) -> np.ndarray:
+        y = np.floor((latitude + 90) / self.cell_size).astype(np.int64)
+        x = np.floor((longitude + 180) / self.cell_size).astype(np.int64)
+        return y * _STRIDE + x
+
+    def _inside(self, zone: int, latitude: np.ndarray, longitude: np.ndarray) -> np.ndarray:
+        """射线法判断多个点是否在某个多边形内"""
+        x0, y0, y1, slope = self._edges[zone].T
+        lat = latitude[:, None]
+        crosses = (y0 > lat) != (y1 > lat)
+        x_cross = x0 + (lat - y0) * slope
+        return (crosses & (longitude[:, None] < x_cross)).sum(axis=1) % 2 == 1
+
+    def _altitude_ok(self, zone: int, altitude: np.ndarray) -> np.ndarray:
+        return (altitude == INVALID_ALTITUDE) | ((altitude >= self._floors[zone]) & (altitude <= self._ceilings[zone]))
+
+    def zones_at(self, latitude: float, longitude: float, altitude: float = INVALID_ALTITUDE) -> List[int]:
+        """返回包含该点的禁飞区序号"""
+        y, x = self._cell(latitude, longitude)
+        candidates = self._cells.get(y * _STRIDE + x)
+        if not candidates:
+            return []
+        lat = np.array([latitude])
+        lon = np.array([longitude])
+        alt = np.array([altitude])
+        result = []
+        for zone in candidates:
+            min_lat, min_lon, max_lat, max_lon = self._bounds[zone]
+            if (min_lat <= latitude <= max_lat and min_lon <= longitude <= max_lon
+                    and self._altitude_ok(zone, alt)[0] and self._inside(zone, lat, lon)[0]):
+                result.append(zone)
+        return result
+
+    def contains(self, latitude, longitude, altitude=None) -> Tuple[np.ndarray, np.ndarray]:
+        """批量查询，返回 (点序号, 禁飞区序号) 两个等长数组，列出所有“点在禁飞区内”的组合
+
+        点按网格单元分组，每个（单元, 禁飞区）组合只做一次向量化判断。
+        """
+        latitude = np.asarray(latitude, dtype=np.float64)
+        longitude = np.asarray(longitude, dtype=np.float64)
+        if altitude is None:
+            altitude = np.full(latitude.shape, INVALID_ALTITUDE)
+        altitude = np.asarray(altitude, dtype=np.float64)
+
+        keys = self._cell_keys(latitude, longitude)
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        order = np.argsort(inverse, kind='stable')
+        boundaries = np.searchsorted(inverse[order], np.arange(len(unique_keys) + 1))
+
+        point_parts, zone_parts = [], []
+        for u, key in enumerate(unique_keys.tolist()):
+            zones = self._cell_arrays.get(key)
+            if zones is None:
+                continue
+            points = order[boundaries[u]:boundaries[u + 1]]
+            lat, lon, alt = latitude[points], longitude[points], altitude[points]
+            for zone in zones.tolist():
+                min_lat, min_lon, max_lat, max_lon = self._bounds[zone]
+                mask = (lat >= min_lat) & (lat <= max_lat) & (lon >= min_lon) & (lon <= max_lon)
+                mask &= self._altitude_ok(zone, alt)
+                if not mask.any():
+                    continue
+                candidates = np.flatnonzero(mask)
+                hits = candidates[self._inside(zone, lat[candidates], lon[candidates])]
+                if len(hits):
+                    point_parts.append(points[hits])
+                    zone_parts.append(np.full(len(hits), zone, dtype=np.intp))
+
+        if not point_parts:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+        points = np.concatenate(point_parts)
+        zones = np.concatenate(zone_parts)
+        order = np.lexsort((zones, points))
+        return points[order], zones[order]
+
+
+class GeofenceMonitor:
+    """跟踪每架航空器所在的禁飞区，位置更新时产生进入/离开事件"""
+
+    def __init__(self, index: GeofenceIndex):
+        self.index = index
+        self._inside: Dict[bytes, FrozenSet[int]] = {}
+
+    def inside(self, address: bytes) -> List[Zone]:
+        """航空器当前所在的禁飞区"""
+        return [self.index.zones[i] for i in sorted(self._inside.get(address, ()))]
+
+    def _transition(self, address: bytes, zones: FrozenSet[int], received: float) -> List[GeofenceEvent]:
+        previous = self._inside.get(address, frozenset())
+        if zones == previous:
+            return []
+        if zones:
+            self._inside[address] = zones
+        else:
+            self._inside.pop(address, None)
+        events = [GeofenceEvent(address, self.index.zones[i], GeofenceEventType.EXIT, received)
+                  for i in sorted(previous - zones)]
+        events += [GeofenceEvent(address, self.index.zones[i], GeofenceEventType.ENTER, received)
+                   for i in sorted(zones - previous)]
+        return events
+
+    def update(self, address: bytes, latitude: float, longitude: float,
+               altitude: float = INVALID_ALTITUDE, received: Optional[float] = None) -> List[GeofenceEvent]:
+        """更新一架航空器的位置"""
+        if received is None:
+            received = time.time()
+        zones = frozenset(self.index.zones_at(latitude, longitude, altitude))
+        return self._transition(address, zones, received)
+
+    def update_frame(self, address: bytes, data: bytes, received: Optional[float] = None) -> List[GeofenceEvent]:
+        """用报文更新位置，只处理位置向量报文（包括打包报文中的），其它报文忽略"""
+        events = []
+        for view in iter_views(data):
+            if view.message_type == MessageType.LOCATION:
+                events += self.update(address, view.latitude, view.longitude, view.geodetic_altitude, received)
+        return events
+
+    def update_many(self, addresses: Sequence[bytes], latitude, longitude, altitude=None,
+                    received=None) -> List[GeofenceEvent]:
+        """批量更新位置，同一航空器出现多次时按输入顺序处理"""
+        if received is None:
+            received = time.time()
+        received = np.broadcast_to(np.asarray(received, dtype=np.float64), (len(addresses),))
+        points, zones = self.index.contains(latitude, longitude, altitude)
+
+        hits: Dict[int, List[int]] = {}
+        for point, zone in zip(points.tolist(), zones.tolist()):
+            hits.setdefault(point, []).append(zone)
+        events = []
+        for i, address in enumerate(addresses):
+            events += self._transition(address, frozenset(hits.get(i, ())), float(received[i]))
+        return events
+
+    def update_frames(self, addresses: Sequence[bytes], frames, received=None) -> List[GeofenceEvent]:
+        """批量用25字节报文更新位置，只处理其中的位置向量报文"""
+        frames = frames_array(frames)
+        if len(addresses) != len(frames):
+            raise ValueError("广播地址数量与报文数量不一致")
+        if received is None:
+            received = time.time()
+        received = np.broadcast_to(np.asarray(received, dtype=np.float64), (len(frames),))
+        selected = np.flatnonzero(frames[:, 0] >> 4 == _LOCATION)
+        columns = location_columns(frames[selected])
+        return self.update_many([addresses[i] for i in selected.tolist()], columns['latitude'],
+                                columns['longitude'], columns['geodetic_altitude'], received[selected])
@@ -8,6 +8,8 @@ from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QFont, QTextCharFormat, QColor, QTextCursor, QIcon
 from main import UnmannedAircraft
 from enums import *
+from monitor import LiveMonitorWidget
+from capture_viewer import CaptureViewerWidget
 import os
 
 class HexEditor(QTextEdit):
@@ -53,9 +55,12 @@ class HexEditor(QTextEdit):
         # 每两个字符添加一个空格
         formatted_text = " ".join(text[i:i+2] for i in range(0, len(text), 2))
 
-        # 如果文本不同，更新文本
+        # 如果文本不同，更新文本（屏蔽信号，避免 setPlainText 再次触发格式化）
         if formatted_text != self.toPlainText():
+            self.blockSignals(True)
             self.setPlainText(formatted_text)
+            self.blockSignals(False)
+            cursor = self.textCursor()
             cursor.movePosition(QTextCursor.MoveOperation.End)
             self.setTextCursor(cursor)
 
@@ -101,12 +106,16 @@ class RemoteIDGUI(QMainWindow):
         self.location_tab = self.create_location_tab()
         self.self_id_tab = self.create_self_id_tab()
         self.system_tab = self.create_system_tab()
+        self.live_tab = LiveMonitorWidget()
+        self.capture_tab = CaptureViewerWidget()
 
         # 添加标签页
         self.tab_widget.addTab(self.basic_id_tab, "基本ID信息")
         self.tab_widget.addTab(self.location_tab, "位置向量信息")
         self.tab_widget.addTab(self.self_id_tab, "运行描述信息")
         self.tab_widget.addTab(self.system_tab, "系统信息")
+        self.tab_widget.addTab(self.live_tab, "实时监视")
+        self.tab_widget.addTab(self.capture_tab, "抓包文件")
 
         # 添加标签页到主布局
         layout.addWidget(self.tab_widget)
@@ -114,6 +123,12 @@ class RemoteIDGUI(QMainWindow):
         # 设置默认值
         self.set_default_values()
 
+    def closeEvent(self, event):
+        """关闭窗口前停止后台线程"""
+        self.live_tab.stop()
+        self.capture_tab.cancel()
+        super().closeEvent(event)
+
     def create_basic_id_tab(self):
         """创建基本ID信息标签页"""
         tab = QWidget()
@@ -0,0 +1,243 @@
+import math
+import struct
+import time
+from array import array
+from collections import OrderedDict, deque
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from enums import *
+from view import FRAME_SIZE, LATITUDE_OFFSET, iter_views
+
+DEFAULT_CELL_SIZES = (0.1, 0.01)  # 各缩放级别的网格边长，度（约11公里、1.1公里）
+DEFAULT_WINDOW = 300.0  # 滑动窗口长度，秒
+DEFAULT_BUCKET = 10.0  # 滑动窗口的时间片长度，窗口按时间片整体过期
+DEFAULT_TIMEOUT = 30.0  # 超过该时间未收到报文的航空器不再计入实时分布
+DEFAULT_ROLLUP_HOURS = 24  # 保留的小时汇总数
+
+UA_TYPES = 16  # UAType 取值个数（4位）
+STATUSES = OperationalStatus.RESERVED.value + 1  # 保留值及以上都计入 RESERVED
+_CELL = UA_TYPES * STATUSES  # 每个网格的计数个数
+_BASIC_ID = MessageType.BASIC_ID.value
+_LOCATION = MessageType.LOCATION.value
+_PACK = MessageType.PACK.value
+_unpack_position = struct.Struct('<ii').unpack_from
+
+
+class _Aircraft:
+    """一架航空器在实时分布中的位置"""
+    __slots__ = ('ua_type', 'status', 'cells', 'last_seen')
+
+    def __init__(self):
+        self.ua_type = 0
+        self.status = 0
+        self.cells: Optional[List[int]] = None  # 各缩放级别的网格编号，不在范围内时为 None
+        self.last_seen = 0.0
+
+
+class Heatmap:
+    """按地理网格增量统计的交通密度
+
+    在 bounds 范围内按若干缩放级别（cell_sizes，度）划分网格，每个网格再按 UAType 和 OperationalStatus 分类计数，
+    各级别的计数都是 (行, 列, 16, 6) 的 int32 数组（行从南到北，列从西到东）：
+
+    - 实时分布 live()：每架航空器按最近一次位置向量报文计入一个网格，移动时从旧网格减一、新网格加一，
+      超过 timeout 秒未收到报文后移出；无人机类型来自基本ID报文，尚未收到时计为 0（NONE）。
+    - 滑动窗口 window()：最近 window 秒内位置向量报文的数量。窗口分为若干时间片，每个报文只在当前时间片中
+      追加各级别的计数下标；时间片结束时按下标一次性计入窗口和当前小时，过期时按下标整体减去，
+      代价与报文数成正比，与网格大小无关。
+    - 小时汇总 rollups()：每个整点小时内位置向量报文的数量，稀疏保存最近 rollup_hours 个小时。
+
+    每个报文的更新代价与缩放级别数成正比，与网格大小和航空器数量无关；时间由报文的接收时间推进，
+    不是线程安全的。
+    """
+
+    def __init__(self, bounds: Tuple[float, float, float, float], cell_sizes: Sequence[float] = DEFAULT_CELL_SIZES,
+                 window: float = DEFAULT_WINDOW, bucket: float = DEFAULT_BUCKET, timeout: float = DEFAULT_TIMEOUT,
+                 rollup_hours: int = DEFAULT_ROLLUP_HOURS):
+        south, west, north, east = bounds
+        if not (-90 <= south < north <= 90 and -180 <= west < east <= 180):
+            raise ValueError("范围不符合要求")
+        if not cell_sizes or min(cell_sizes) <= 0:
+            raise ValueError("网格边长必须大于0")
+        if bucket <= 0 or window < bucket:
+            raise ValueError("滑动窗口长度必须不小于时间片长度")
+        if 3600 % bucket:
+            raise ValueError("时间片长度必须能整除1小时")
+        self.bounds = bounds
+        self.cell_sizes = tuple(cell_sizes)
+        self.bucket = bucket
+        self.timeout = timeout
+        self.shapes = [(math.ceil((north - south) / size - 1e-9), math.ceil((east - west) / size - 1e-9))
+                       for size in self.cell_sizes]
+        self._grids = [(1 / size, rows, columns) for size, (rows, columns) in zip(self.cell_sizes, self.shapes)]
+        sizes = [rows * columns * _CELL for rows, columns in self.shapes]
+        self._live = [np.zeros(size, dtype=np.int32) for size in sizes]
+        self._window = [np.zeros(size, dtype=np.int32) for size in sizes]
+        self._hour = [np.zeros(size, dtype=np.int32) for size in sizes]
+        self._rollups: deque = deque(maxlen=rollup_hours)  # (整点时间, 各级别的 (下标, 计数))
+        self._buckets = [[array('q') for _ in sizes] for _ in range(math.ceil(window / bucket))]
+        self._bucket: Optional[int] = None  # 当前时间片编号
+        self._hour_start: Optional[float] = None
+        self._aircraft: 'OrderedDict[bytes, _Aircraft]' = OrderedDict()  # 按最近收到报文的时间排列
+
+    def __len__(self) -> int:
+        """实时分布中的航空器数量（含尚未收到位置或不在范围内的）"""
+        return len(self._aircraft)
+
+    def _cells(self, latitude: float, longitude: float) -> Optional[List[int]]:
+        south, west, north, east = self.bounds
+        if not (south <= latitude < north and west <= longitude < east):
+            return None
+        latitude -= south
+        longitude -= west
+        cells = []
+        for scale, rows, columns in self._grids:
+            row = int(latitude * scale)
+            column = int(longitude * scale)
+            if row >= rows:  # 浮点误差
+                row = rows - 1
+            if column >= columns:
+                column = columns - 1
+            cells.append((row * columns + column) * _CELL)
+        return cells
+
+    def _move(self, aircraft: _Aircraft, delta: int) -> None:
+        """将航空器在实时分布中的计数加上 delta"""
+        if aircraft.cells is not None:
+            offset = aircraft.ua_type * STATUSES + aircraft.status
+            for live, cell in zip(self._live, aircraft.cells):
+                live[cell + offset] += delta
+
+    def update(self, address: bytes, data: bytes, received: Optional[float] = None) -> None:
+        """合并一个报文（可为打包报文）：基本ID报文更新无人机类型，位置向量报文更新各项计数，其它报文只刷新在线时间"""
+        if not data:
+            raise ValueError("空数据")
+        if received is None:
+            received = time.time()
+        self.advance(received)
+        aircraft = self._aircraft.get(address)
+        if aircraft is None:
+            aircraft = self._aircraft[address] = _Aircraft()
+        else:
+            self._aircraft.move_to_end(address)
+        aircraft.last_seen = received
+
+        if data[0] >> 4 == _PACK:
+            frames = [view.buffer for view in iter_views(data)]
+        elif len(data) != FRAME_SIZE:
+            raise ValueError("数据长度不符合要求")
+        else:
+            frames = [data]
+        for frame in frames:
+            message_type = frame[0] >> 4
+            if message_type == _BASIC_ID:
+                ua_type = frame[1] & 0x0F
+                if ua_type != aircraft.ua_type:
+                    self._move(aircraft, -1)
+                    aircraft.ua_type = ua_type
+                    self._move(aircraft, 1)
+            elif message_type == _LOCATION:
+                latitude, longitude = _unpack_position(frame, LATITUDE_OFFSET)
+                status = min(frame[1] >> 4, STATUSES - 1)
+                cells = self._cells(latitude / 1e7, longitude / 1e7)
+                if status != aircraft.status or cells != aircraft.cells:  # 多数报文仍在原网格中
+                    self._move(aircraft, -1)
+                    aircraft.status = status
+                    aircraft.cells = cells
+                    self._move(aircraft, 1)
+                if cells is not None:
+                    offset = aircraft.ua_type * STATUSES + status
+                    current = self._buckets[self._bucket % len(self._buckets)]
+                    for level, cell in enumerate(cells):
+                        current[level].append(cell + offset)
+
+    def advance(self, now: float) -> None:
+        """将时钟推进到 now：过期滑动窗口中的时间片，结束已过去的小时，移出超时的航空器；时间不会倒退"""
+        number = int(now // self.bucket)
+        if self._bucket is None:
+            self._bucket = number
+            self._hour_start = now // 3600 * 3600
+        elif number > self._bucket:
+            # 结束当前时间片：一次性计入滑动窗口和当前小时（时间片不跨越整点）
+            count = len(self._buckets)
+            for level, indexes in enumerate(self._buckets[self._bucket % count]):
+                if indexes:
+                    indexes = np.frombuffer(indexes, dtype=np.int64)
+                    np.add.at(self._window[level], indexes, 1)
+                    np.add.at(self._hour[level], indexes, 1)
+            if number - self._bucket > count:
+                for counts in self._window:
+                    counts.fill(0)
+                for indexes in self._buckets:
+                    indexes[:] = [array('q') for _ in indexes]
+            else:
+                for expired in range(self._bucket + 1, number + 1):
+                    indexes = self._buckets[expired % count]
+                    for level, (counts, expiring) in enumerate(zip(self._window, indexes)):
+                        if expiring:
+                            np.subtract.at(counts, np.frombuffer(expiring, dtype=np.int64), 1)
+                            indexes[level] = array('q')
+            self._bucket = number
+
+        if now >= self._hour_start + 3600:
+            if any(counts.any() for counts in self._hour):
+                self._rollups.append((self._hour_start, [self._sparse(counts) for counts in self._hour]))
+                for counts in self._hour:
+                    counts.fill(0)
+            self._hour_start = now // 3600 * 3600
+
+        deadline = now - self.timeout
+        aircraft = self._aircraft
+        while aircraft:
+            address, oldest = next(iter(aircraft.items()))
+            if oldest.last_seen >= deadline:
+                break
+            self._move(oldest, -1)
+            del aircraft[address]
+
+    @staticmethod
+    def _sparse(counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        indexes = np.flatnonzero(counts)
+        return indexes, counts[indexes]
+
+    def _shape(self, level: int) -> Tuple[int, int, int, int]:
+        return self.shapes[level] + (UA_TYPES, STATUSES)
+
+    def _pending(self, counts: List[np.ndarray], level: int) -> np.ndarray:
+        """计数加上当前时间片中尚未计入的报文"""
+        counts = counts[level].copy()
+        if self._bucket is not None:
+            indexes = self._buckets[self._bucket % len(self._buckets)][level]
+            np.add.at(counts, np.frombuffer(indexes, dtype=np.int64), 1)
+        return counts.reshape(self._shape(level))
+
+    def live(self, level: int = 0) -> np.ndarray:
+        """实时分布的副本，(行, 列, 16, 6)"""
+        return self._live[level].reshape(self._shape(level)).copy()
+
+    def window(self, level: int = 0) -> np.ndarray:
+        """滑动窗口内位置向量报文数量的副本，(行, 列, 16, 6)"""
+        return self._pending(self._window, level)
+
+    def current_hour(self, level: int = 0) -> Tuple[float, np.ndarray]:
+        """当前小时的 (整点时间, 到目前为止的报文数量)"""
+        return self._hour_start, self._pending(self._hour, level)
+
+    def rollups(self, level: int = 0) -> List[Tuple[float, np.ndarray]]:
+        """已结束的各小时的 (整点时间, 报文数量)，按时间排列；没有报文的小时不记录"""
+        result = []
+        for hour, levels in self._rollups:
+            indexes, values = levels[level]
+            counts = np.zeros(self._live[level].size, dtype=np.int32)
+            counts[indexes] = values
+            result.append((hour, counts.reshape(self._shape(level))))
+        return result
+
+    def cell(self, latitude: float, longitude: float, level: int = 0) -> Optional[Tuple[int, int]]:
+        """经纬度所在网格的 (行, 列)，不在范围内时为 None"""
+        cells = self._cells(latitude, longitude)
+        if cells is None:
+            return None
+        return divmod(cells[level] // _CELL, self.shapes[level][1])
@@ -0,0 +1,279 @@
+import sqlite3
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from main import UnmannedAircraft, PROTOCOL_VERSION
+from enums import *
+from columns import location_columns
+from filters import frames_array
+from timestamps import TimestampUnwrapper
+from view import iter_views
+
+DEFAULT_BATCH_SIZE = 10000  # 待写入的行数达到该值时提交一次事务
+DEFAULT_FLUSH_INTERVAL = 1.0  # 距上次提交超过该时间时提交一次事务，秒
+CACHE_SIZE = 64 << 20  # 写入连接的页缓存大小，字节；索引按航空器随机插入，缓存越大越少换页
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS aircraft (
+    aircraft INTEGER PRIMARY KEY,
+    address BLOB NOT NULL UNIQUE,
+    id TEXT,
+    ua_type INTEGER
+);
+CREATE INDEX IF NOT EXISTS aircraft_id ON aircraft (id);
+CREATE TABLE IF NOT EXISTS locations (
+    aircraft INTEGER NOT NULL,
+    time REAL NOT NULL,
+    received REAL NOT NULL,
+    status INTEGER NOT NULL,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    geodetic_altitude REAL NOT NULL,
+    pressure_altitude REAL NOT NULL,
+    height REAL NOT NULL,
+    direction INTEGER NOT NULL,
+    speed REAL NOT NULL,
+    vertical_speed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS locations_track ON locations (aircraft, time, latitude, longitude, geodetic_altitude);
+CREATE INDEX IF NOT EXISTS locations_time ON locations (time, aircraft);
+CREATE TABLE IF NOT EXISTS messages (
+    aircraft INTEGER NOT NULL,
+    time REAL NOT NULL,
+    message_type INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_aircraft ON messages (aircraft, message_type, time);
+"""
+
+_INSERT_AIRCRAFT = "INSERT INTO aircraft (aircraft, address) VALUES (?, ?)"
+_INSERT_LOCATION = "INSERT INTO locations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+_INSERT_MESSAGE = "INSERT INTO messages VALUES (?, ?, ?, ?)"
+_UPDATE_AIRCRAFT = "UPDATE aircraft SET id = ?, ua_type = ? WHERE aircraft = ?"
+_LOCATION_FIELDS = ('operational_status', 'latitude', 'longitude', 'geodetic_altitude', 'pressure_altitude',
+                    'height', 'direction', 'horizontal_speed', 'vertical_speed')
+_LOCATION = MessageType.LOCATION.value
+_BASIC_ID = MessageType.BASIC_ID.value
+# write_many 接受的报文类型，与 write 能解码并写入的一致
+_STORED_TYPES = [message_type.value for message_type in (
+    MessageType.BASIC_ID, MessageType.LOCATION, MessageType.SELF_ID, MessageType.SYSTEM, MessageType.OPERATOR_ID)]
+
+
+class HistorySink:
+    """将解码后的报文批量写入 SQLite 的历史库
+
+    位置向量报文解码后写入 locations 表，时间为展开后的绝对 UTC 时间（见 timestamps 模块）；其它报文以原始字节
+    写入 messages 表，时间为接收时间。基本ID报文同时更新 aircraft 表中的识别码。航空器按广播地址编号，
+    编号在内存中缓存。
+
+    数据库使用 WAL 模式和 synchronous=NORMAL，写入连接使用 64 MiB 页缓存。写入先放入内存缓冲，待写入行数达到 batch_size 或距上次提交
+    超过 flush_interval 秒时，用固定 SQL 的 executemany 在一个事务中提交（sqlite3 会缓存预编译语句）。
+    flush_interval 只在写入时检查，没有后台定时器：报文流中断后缓冲中的行会一直等到下一次写入，
+    写入方空闲时应自行定期调用 flush()。断电时最多丢失最近一批。同一数据库只应有一个 HistorySink，且应在同一线程中写入。
+    """
+
+    def __init__(self, path: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        if batch_size < 1:
+            raise ValueError("每批行数必须大于0")
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.connection = sqlite3.connect(path, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.execute("PRAGMA temp_store = MEMORY")
+        self.connection.execute(f"PRAGMA cache_size = {-CACHE_SIZE // 1024}")
+        self.connection.executescript(SCHEMA)
+        self.unwrapper = TimestampUnwrapper()
+        self.rows = 0  # 已提交的行数
+        self.commits = 0
+        self._aircraft: Dict[bytes, int] = {
+            bytes(address): aircraft for aircraft, address in self.connection.execute("SELECT aircraft, address FROM aircraft")}
+        self._next = max(self._aircraft.values(), default=0) + 1
+        self._ids: Dict[int, Tuple[str, int]] = {}  # 编号 -> 已写入的 (识别码, 无人机类型)
+        self._new: List[Tuple[int, bytes]] = []  # 尚未写入 aircraft 表的 (编号, 广播地址)
+        self._locations: List[tuple] = []
+        self._messages: List[tuple] = []
+        self._updates: Dict[int, Tuple[str, int]] = {}
+        self._last_flush = time.monotonic()
+
+    def __len__(self) -> int:
+        """缓冲中尚未提交的行数"""
+        return len(self._new) + len(self._locations) + len(self._messages) + len(self._updates)
+
+    def aircraft(self, address: bytes) -> int:
+        """广播地址对应的航空器编号，首次出现时分配，随下一批写入 aircraft 表"""
+        aircraft = self._aircraft.get(address)
+        if aircraft is None:
+            aircraft = self._aircraft[address] = self._next
+            self._next += 1
+            self._new.append((aircraft, address))
+        return aircraft
+
+    def _basic_id(self, aircraft: int, uas_id: str, ua_type: int) -> None:
+        value = (uas_id, ua_type)
+        if self._ids.get(aircraft) != value:
+            self._ids[aircraft] = self._updates[aircraft] = value
+
+    def write(self, address: bytes, data: bytes, received: Optional[float] = None) -> None:
+        """写入一个报文（可为打包报文），无法解码时抛出 ValueError"""
+        if received is None:
+            received = time.time()
+        for view in iter_views(data):
+            ua = UnmannedAircraft()
+            ua.decode_message(bytes(view.buffer))
+            self.write_aircraft(address, ua, view.message_type, received, bytes(view.buffer))
+
+    def write_aircraft(self, address: bytes, ua: UnmannedAircraft, message_type: MessageType,
+                       received: Optional[float] = None, data: Optional[bytes] = None) -> None:
+        """写入 decode_message 解码后的一类报文；非位置向量报文需提供原始字节 data，未提供时重新编码"""
+        if received is None:
+            received = time.time()
+        aircraft = self.aircraft(address)
+        if message_type == MessageType.LOCATION:
+            timestamp = ua.timestamp if ua.timestamp is not None else 0xFFFF
+            absolute = self.unwrapper.update(address, timestamp, received)
+            self._locations.append((aircraft, absolute if absolute == absolute else received, received,
+                                    ua.operational_status.value, ua.latitude, ua.longitude, ua.geodetic_altitude,
+                                    ua.pressure_altitude, ua.height, ua.direction, ua.horizontal_speed,
+                                    ua.vertical_speed))
+        else:
+            if message_type == MessageType.BASIC_ID:
+                self._basic_id(aircraft, ua.id, ua.ua_type.value)
+            if data is None:
+                data = _ENCODERS[message_type](ua)
+            self._messages.append((aircraft, received, message_type.value, data))
+        self._maybe_flush()
+
+    def write_many(self, addresses: Sequence[bytes], frames, received=None) -> None:
+        """批量写入25字节报文（不含打包报文），位置向量报文向量化解码
+
+        与 write 一样拒绝协议版本不兼容和无法写入的报文类型（认证、打包及未知类型），有一个不符合要求时整批不写入。
+        """
+        frames = frames_array(frames)
+        if len(addresses) != len(frames):
+            raise ValueError("广播地址数量与报文数量不一致")
+        types = frames[:, 0] >> 4
+        if (frames[:, 0] & 0x0F).max(initial=0) > PROTOCOL_VERSION:
+            raise ValueError("协议版本不兼容")
+        known = np.isin(types, _STORED_TYPES)
+        if not known.all():
+            raise ValueError(f"不支持的报文类型: {types[~known][0]}")
+        if received is None:
+            received = time.time()
+        received = np.broadcast_to(np.asarray(received, dtype=np.float64), (len(frames),))
+        aircraft = np.fromiter((self.aircraft(address) for address in addresses), dtype=np.int64, count=len(frames))
+
+        rows = np.flatnonzero(types == _LOCATION)
+        if len(rows):
+            absolute = self.unwrapper.update_frames([addresses[i] for i in rows.tolist()], frames[rows], received[rows])
+            absolute = np.where(np.isnan(absolute), received[rows], absolute)
+            columns = location_columns(frames[rows])
+            self._locations.extend(zip(aircraft[rows].tolist(), absolute.tolist(), received[rows].tolist(),
+                                       *(columns[name].tolist() for name in _LOCATION_FIELDS)))
+
+        rows = np.flatnonzero(types != _LOCATION)
+        for row, data in zip(rows.tolist(), frames[rows]):
+            data = data.tobytes()
+            if types[row] == _BASIC_ID:
+                view = next(iter_views(data))
+                self._basic_id(int(aircraft[row]), view.id, view.ua_type.value)
+            self._messages.append((int(aircraft[row]), float(received[row]), int(types[row]), data))
+        self._maybe_flush()
+
+    def _maybe_flush(self) -> None:
+        if len(self) >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """在一个事务中提交缓冲中的全部行"""
+        self._last_flush = time.monotonic()
+        if not len(self):
+            return
+        connection = self.connection
+        connection.execute("BEGIN")
+        try:
+            connection.executemany(_INSERT_AIRCRAFT, self._new)
+            connection.executemany(_INSERT_LOCATION, self._locations)
+            connection.executemany(_INSERT_MESSAGE, self._messages)
+            connection.executemany(_UPDATE_AIRCRAFT, [(uas_id, ua_type, aircraft)
+                                                      for aircraft, (uas_id, ua_type) in self._updates.items()])
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self.rows += len(self)
+        self.commits += 1
+        self._new = []
+        self._locations = []
+        self._messages = []
+        self._updates = {}
+
+    def close(self) -> None:
+        self.flush()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+_ENCODERS = {
+    MessageType.BASIC_ID: UnmannedAircraft.encode_basic_id,
+    MessageType.SELF_ID: UnmannedAircraft.encode_self_id,
+    MessageType.SYSTEM: UnmannedAircraft.encode_system,
+    MessageType.OPERATOR_ID: UnmannedAircraft.encode_operator_id,
+}
+
+
+class History:
+    """历史库的常用查询（只读连接，可与 HistorySink 在不同线程或进程中同时使用）"""
+
+    def __init__(self, path: str):
+        self.connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def find(self, uas_id: str) -> List[bytes]:
+        """识别码对应的广播地址"""
+        return [bytes(address) for address, in
+                self.connection.execute("SELECT address FROM aircraft WHERE id = ?", (uas_id,))]
+
+    def track(self, address: bytes, start: float, end: float) -> List[Tuple[float, float, float, float]]:
+        """一架航空器在 [start, end] 内的 (时间, 纬度, 经度, 几何高度)，按时间排序"""
+        return self.connection.execute(
+            "SELECT time, latitude, longitude, geodetic_altitude FROM locations "
+            "WHERE aircraft = (SELECT aircraft FROM aircraft WHERE address = ?) AND time BETWEEN ? AND ? ORDER BY time",
+            (address, start, end)).fetchall()
+
+    def active(self, start: float, end: float) -> List[bytes]:
+        """[start, end] 内有位置记录的航空器的广播地址"""
+        return [bytes(address) for address, in self.connection.execute(
+            "SELECT address FROM aircraft WHERE aircraft IN "
+            "(SELECT DISTINCT aircraft FROM locations WHERE time BETWEEN ? AND ?)", (start, end))]
+
+    def latest(self, address: bytes) -> Optional[tuple]:
+        """一架航空器最近一条位置记录（locations 表的全部列）"""
+        return self.connection.execute(
+            "SELECT * FROM locations WHERE aircraft = (SELECT aircraft FROM aircraft WHERE address = ?) "
+            "ORDER BY time DESC LIMIT 1", (address,)).fetchone()
+
+    def messages(self, address: bytes, message_type: MessageType, start: float = float('-inf'),
+                 end: float = float('inf')) -> List[Tuple[float, bytes]]:
+        """一架航空器在 [start, end] 内某类报文的 (接收时间, 原始字节)"""
+        return [(received, bytes(data)) for received, data in self.connection.execute(
+            "SELECT time, data FROM messages WHERE aircraft = (SELECT aircraft FROM aircraft WHERE address = ?) "
+            "AND message_type = ? AND time BETWEEN ? AND ? ORDER BY time",
+            (address, message_type.value, start, end))]
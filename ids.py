@@ -0,0 +1,91 @@
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+ID_LENGTH = 20  # 基本ID和控制站ID报文中识别码字段的字节数
+
+
+class IdTable:
+    """识别码字典：将报文中原始的20字节识别码字段映射为从0开始连续分配的整数句柄
+
+    哈希表以原始字节为键，首次出现时解码一次字符串并保存，之后同一识别码只需一次字节串查表，
+    得到的句柄和字符串都是同一个对象（字符串的哈希值已缓存，下游按字符串查字典时不再重新计算）。
+    句柄可以反查原始字节和字符串。分配新句柄时加锁，可在多个线程中共用。
+
+    字典由使用方按需创建（例如 FleetState(ids=IdTable())），解码器本身不使用。条目不会删除，每个识别码约占用200字节；
+    设置 capacity 后最多保存 capacity 个识别码，之后的新识别码不再分配句柄（返回 -1），伪造的大量识别码不会使内存无限增长。
+    """
+
+    def __init__(self, capacity: Optional[int] = None):
+        if capacity is not None and capacity < 0:
+            raise ValueError("容量不能小于0")
+        self.capacity = capacity
+        self._handles: Dict[bytes, int] = {}  # 原始字节 -> 句柄
+        self._texts: Dict[str, int] = {}  # 字符串 -> 句柄
+        self.raw: List[bytes] = []  # 句柄 -> 原始字节
+        self.texts: List[str] = []  # 句柄 -> 字符串
+        self._lock = threading.Lock()  # 只在分配新句柄时持有
+
+    def __len__(self) -> int:
+        return len(self.raw)
+
+    def __contains__(self, raw: bytes) -> bool:
+        return raw in self._handles
+
+    def intern(self, raw: bytes) -> int:
+        """原始识别码字段对应的句柄，首次出现时分配，已满时返回 -1；不是 ASCII 时抛出 ValueError"""
+        if raw.__class__ is not bytes:
+            raw = bytes(raw)  # bytearray、可写的 memoryview 不能作为字典键
+        handle = self._handles.get(raw)
+        if handle is None:
+            if len(raw) != ID_LENGTH:
+                raise ValueError("识别码长度不符合要求")
+            text = raw.decode('ascii').rstrip('\0')
+            with self._lock:
+                handle = self._handles.get(raw)
+                if handle is None:
+                    handle = len(self.raw)
+                    if handle == self.capacity:
+                        return -1
+                    self.raw.append(raw)
+                    self.texts.append(text)
+                    self._texts.setdefault(text, handle)
+                    self._handles[raw] = handle  # 最后写入，其它线程查到句柄时反查表已就绪
+        return handle
+
+    def intern_text(self, text: str) -> int:
+        """识别码字符串对应的句柄（按编码器的方式补齐到20字节）"""
+        handle = self._texts.get(text)
+        if handle is None:
+            raw = text.encode('ascii')
+            if len(raw) > ID_LENGTH:
+                raise ValueError("识别码必须小于20字节")
+            handle = self.intern(raw.ljust(ID_LENGTH, b'\0'))
+        return handle
+
+    def get(self, raw: bytes) -> Optional[int]:
+        """已有识别码的句柄，不分配新句柄"""
+        return self._handles.get(raw)
+
+    def find(self, text: str) -> Optional[int]:
+        """按字符串查找已有识别码的句柄"""
+        return self._texts.get(text)
+
+    def text(self, handle: int) -> str:
+        if handle < 0:
+            raise ValueError("无效的识别码句柄")
+        return self.texts[handle]
+
+    def intern_many(self, fields) -> np.ndarray:
+        """批量取句柄，fields 为 (N, 20) uint8 数组（例如报文数组的 [:, 2:22] 列）；相同识别码只查一次表，已满时为 -1"""
+        fields = np.ascontiguousarray(fields, dtype=np.uint8)
+        if fields.ndim != 2 or fields.shape[1] != ID_LENGTH:
+            raise ValueError("识别码长度不符合要求")
+        if not len(fields):
+            return np.empty(0, dtype=np.int64)
+        # 定长20字节时去掉末尾0字节的 S20 取值与原始字节一一对应
+        _, first, inverse = np.unique(fields.view('S20').ravel(), return_index=True, return_inverse=True)
+        handles = np.fromiter((self.intern(fields[i].tobytes()) for i in first.tolist()),
+                              dtype=np.int64, count=len(first))
+        return handles[inverse]
@@ -1,12 +1,34 @@
 import struct
-from dataclasses import dataclass
-from typing import Tuple, List
-from datetime import datetime
+import threading
+from dataclasses import dataclass, field
+from typing import Tuple, List, Optional
+from datetime import datetime, timezone
 
 from enums import *
 
 PROTOCOL_VERSION = 0x2
 
+_tracer = None  # 启用追踪时为 tracing.Tracer，见 set_tracer()
+
+
+class _ActiveTrace(threading.local):
+    trace = None  # 当前线程中被采样的编解码调用的追踪记录（tracing.Trace），否则为 None
+
+
+_active = _ActiveTrace()
+
+
+def set_tracer(tracer) -> None:
+    """设置编解码追踪器（tracing.Tracer），None 表示关闭；通常通过 tracing.enable() / tracing.disable() 调用"""
+    global _tracer
+    _tracer = tracer
+
+
+def get_tracer():
+    """当前的编解码追踪器，未启用时为 None"""
+    return _tracer
+
+
 @dataclass
 class UnmannedAircraft:
     # 基本ID信息 (Message Type 0x0)
@@ -30,6 +52,7 @@ class UnmannedAircraft:
     pressure_accuracy: VerticalAccuracy = VerticalAccuracy.UNKNOWN  # 气压高度精度
     speed_accuracy: SpeedAccuracy = SpeedAccuracy.UNKNOWN  # 速度精度
     timestamp_accuracy: float = 0.0  # 时间戳精度
+    timestamp: Optional[int] = field(default=None, compare=False)  # 时间戳（UTC整点后的0.1秒数，0-35999），None 表示编码时取当前时间
 
     # 认证信息 (Message Type 0x2)
 
@@ -56,6 +79,15 @@ class UnmannedAircraft:
     operator_id: str = ""  # 控制站ID
     operator_id_type: OperatorIDType = OperatorIDType.OPERATOR_ID  # 控制站ID类型
 
+    def _traced(self, name: str, category: str, method, *args):
+        """在追踪器中记录一次被采样的调用并执行 method，内部各阶段通过当前线程的 _active.trace 记录"""
+        trace = _active.trace = _tracer.begin(name, category)
+        try:
+            return method(*args)
+        finally:
+            _active.trace = None
+            trace.end()
+
     def _create_header(self, message_type: MessageType) -> bytes:
         """创建报文头，高4位为消息类型，低4位为协议版本"""
         header = (message_type.value << 4) | PROTOCOL_VERSION
@@ -80,7 +112,16 @@ class UnmannedAircraft:
 
     def encode_location(self) -> bytes:
         """编码位置向量报文 (Message Type 0x1)"""
-        header = self._create_header(MessageType.LOCATION)
+        buffer = bytearray(25)
+        self.encode_location_into(buffer)
+        return bytes(buffer)
+
+    def encode_location_into(self, buffer, offset: int = 0) -> None:
+        """将位置向量报文（含报文头，25字节）直接写入 buffer 的 offset 处，用于原地更新已有的报文缓冲区"""
+        if _tracer is not None and _active.trace is None and _tracer.sample():
+            return self._traced('encode_location', 'encode', self.encode_location_into, buffer, offset)
+        trace = _active.trace if _tracer is not None else None
+        header = (MessageType.LOCATION.value << 4) | PROTOCOL_VERSION
 
         if self.direction < 180 and self.direction >= 0:
             ew_direction_segment = EWDirectionSegment.BELOW_180
@@ -125,6 +166,8 @@ class UnmannedAircraft:
             raise ValueError("距地高度必须在-1000-31767米之间")
         if self.timestamp_accuracy < 0 or self.timestamp_accuracy > 1.5:
             raise ValueError("时间戳精度必须在0-1.5秒之间")
+        if self.timestamp is not None and (self.timestamp < 0 or self.timestamp >= 36000):
+            raise ValueError("时间戳必须在0-35999之间")
 
         accuracy_byte1 = (
             ((self.geodetic_accuracy.value & 0x0F) << 4) |
@@ -134,9 +177,15 @@ class UnmannedAircraft:
             ((self.pressure_accuracy.value & 0x0F) << 4) |
             (self.speed_accuracy.value & 0x0F)
         )
+        if trace:
+            trace.mark('location.validate')
 
-        now = datetime.now()
-        timestamp = int(now.minute * 600 + now.second * 10 + now.microsecond // 100000)
+        timestamp = self.timestamp
+        if timestamp is None:
+            now = datetime.now(timezone.utc)
+            timestamp = int(now.minute * 600 + now.second * 10 + now.microsecond // 100000)
+        if trace:
+            trace.mark('location.timestamp')
 
         accuracy_byte3 = (
             (0x00 << 4) |  # 高四位保留，设为0
@@ -144,7 +193,8 @@ class UnmannedAircraft:
         )
         reserved_byte = 0x00
 
-        message = struct.pack('<BBBbiiHHHBBHBB',
+        struct.pack_into('<BBBBbiiHHHBBHBB', buffer, offset,
+                            header,
                             status_byte,
                             direction_byte,
                             speed_byte,
@@ -160,8 +210,8 @@ class UnmannedAircraft:
                             accuracy_byte3,
                             reserved_byte
                             )
-
-        return header + message
+        if trace:
+            trace.mark('location.pack')
 
     def encode_auth(self) -> bytes:
         """编码认证报文 (Message Type 0x2)"""
@@ -257,13 +307,20 @@ class UnmannedAircraft:
 
     def encode_pack(self, messages: List[MessageType]) -> bytes:
         """编码打包报文 (Message Type 0xF)"""
+        if _tracer is not None and _active.trace is None and _tracer.sample():
+            return self._traced('encode_pack', 'encode', self.encode_pack, messages)
+        trace = _active.trace if _tracer is not None else None
         header = self._create_header(MessageType.PACK)
         length = 0x19
         if len(messages) > 9:
             raise ValueError("打包中报文数量最多为9个")
 
         message = struct.pack('<bb', length, len(messages))
+        if trace:
+            trace.mark('pack.header')
         for message_type in messages:
+            if trace:
+                start = trace.last
             if message_type == MessageType.BASIC_ID:
                 message += self.encode_basic_id()
             elif message_type == MessageType.LOCATION:
@@ -278,6 +335,8 @@ class UnmannedAircraft:
                 message += self.encode_operator_id()
             else:
                 raise ValueError(f"未知的报文类型: {message_type}")
+            if trace:
+                trace.span(f'pack.{message_type.name.lower()}', start)
         return header + message
 
     def _parse_header(self, header: int) -> Tuple[MessageType, int]:
@@ -288,27 +347,41 @@ class UnmannedAircraft:
 
     def _decode_basic_id(self, data: bytes) -> None:
         """解码基本ID报文，直接更新当前对象的属性值"""
+        trace = _active.trace if _tracer is not None else None
 
         type_byte = data[1]
         self.id_type = IDType((type_byte >> 4) & 0x0F)
         self.ua_type = UAType(type_byte & 0x0F)
+        if trace:
+            trace.mark('basic_id.enum')
 
         self.id = data[2:22].decode('ascii').rstrip('\0')
+        if trace:
+            trace.mark('basic_id.string')
 
         # 保留字节（3字节）暂时不使用
         # reserved = data[22:25]
 
     def _decode_location(self, data: bytes) -> None:
         """解码位置向量报文，直接更新当前对象的属性值"""
+        trace = _active.trace if _tracer is not None else None
 
         (status_byte, direction_byte, speed_byte, speed_vertical,
          latitude, longitude, pressure_altitude, geodetic_altitude, height,
          accuracy_byte1, accuracy_byte2, timestamp, accuracy_byte3, reserved_byte) = struct.unpack('<BBBbiiHHHBBHBB', data[1:26])
+        if trace:
+            trace.mark('location.unpack')
 
         self.operational_status = OperationalStatus((status_byte >> 4) & 0x0F)
         self.height_type = HeightType((status_byte >> 2) & 0x01)
         ew_direction_segment = EWDirectionSegment((status_byte >> 1) & 0x01)
         speed_multiplier = SpeedMultiplier(status_byte & 0x01)
+        self.geodetic_accuracy = VerticalAccuracy((accuracy_byte1 >> 4) & 0x0F)
+        self.horizontal_accuracy = HorizontalAccuracy(accuracy_byte1 & 0x0F)
+        self.pressure_accuracy = VerticalAccuracy((accuracy_byte2 >> 4) & 0x0F)
+        self.speed_accuracy = SpeedAccuracy(accuracy_byte2 & 0x0F)
+        if trace:
+            trace.mark('location.enum')
 
         if ew_direction_segment == EWDirectionSegment.BELOW_180:
             self.direction = direction_byte
@@ -326,12 +399,10 @@ class UnmannedAircraft:
         self.pressure_altitude = pressure_altitude * 0.5 - 1000
         self.geodetic_altitude = geodetic_altitude * 0.5 - 1000
         self.height = height * 0.5 - 1000
-
-        self.geodetic_accuracy = VerticalAccuracy((accuracy_byte1 >> 4) & 0x0F)
-        self.horizontal_accuracy = HorizontalAccuracy(accuracy_byte1 & 0x0F)
-        self.pressure_accuracy = VerticalAccuracy((accuracy_byte2 >> 4) & 0x0F)
-        self.speed_accuracy = SpeedAccuracy(accuracy_byte2 & 0x0F)
         self.timestamp_accuracy = (accuracy_byte3 & 0x0F) / 10
+        self.timestamp = timestamp
+        if trace:
+            trace.mark('location.scale')
 
     def _decode_auth(self, data: bytes) -> None:
         """解码认证报文，直接更新当前对象的属性值"""
@@ -339,29 +410,29 @@ class UnmannedAircraft:
 
     def _decode_self_id(self, data: bytes) -> None:
         """解码运行描述报文，直接更新当前对象的属性值"""
+        trace = _active.trace if _tracer is not None else None
 
         self.description_type = DescriptionType(data[1])
+        if trace:
+            trace.mark('self_id.enum')
         self.description = data[2:25].decode('ascii').rstrip('\0')
+        if trace:
+            trace.mark('self_id.string')
 
     def _decode_system(self, data: bytes) -> None:
         """解码系统报文，直接更新当前对象的属性值"""
+        trace = _active.trace if _tracer is not None else None
 
         (flag_byte, operator_latitude, operator_longitude, area_count, area_radius,
          area_ceiling, area_floor, ua_classification_byte, operator_altitude,
          timestamp, reserved_byte) = struct.unpack('<BiiHBHHBHIB', data[1:25])
+        if trace:
+            trace.mark('system.unpack')
 
         # 解析flag_byte
         self.classification_type = ClassificationType((flag_byte >> 2) & 0x07)
         self.operator_location_source_type = OperatorLocationSourceType(flag_byte & 0x03)
 
-        # 解析坐标和运行区域信息
-        self.operator_latitude = operator_latitude / 1e7
-        self.operator_longitude = operator_longitude / 1e7
-        self.area_count = area_count
-        self.area_radius = area_radius * 10
-        self.area_ceiling = area_ceiling * 0.5 - 1000
-        self.area_floor = area_floor * 0.5 - 1000
-
         # 解析欧盟无人机分类信息
         if self.classification_type == ClassificationType.EUROPEAN_UNION:
             self.eu_ua_category = EUUACategory((ua_classification_byte >> 4) & 0x0F)
@@ -369,25 +440,47 @@ class UnmannedAircraft:
         elif self.classification_type == ClassificationType.CHINA:
             self.china_ua_category = ChinaUACategory((ua_classification_byte >> 4) & 0x0F)
             self.china_ua_class = ChinaUAClass(ua_classification_byte & 0x0F)
+        if trace:
+            trace.mark('system.enum')
+
+        # 解析坐标和运行区域信息
+        self.operator_latitude = operator_latitude / 1e7
+        self.operator_longitude = operator_longitude / 1e7
+        self.area_count = area_count
+        self.area_radius = area_radius * 10
+        self.area_ceiling = area_ceiling * 0.5 - 1000
+        self.area_floor = area_floor * 0.5 - 1000
 
         # 解析控制站高度
         self.operator_altitude = operator_altitude * 0.5 - 1000
+        if trace:
+            trace.mark('system.scale')
 
     def _decode_operator_id(self, data: bytes) -> None:
         """解码控制站ID报文，直接更新当前对象的属性值"""
+        trace = _active.trace if _tracer is not None else None
 
         self.operator_id_type = OperatorIDType(data[1])
+        if trace:
+            trace.mark('operator_id.enum')
         self.operator_id = data[2:22].decode('ascii').rstrip('\0')
+        if trace:
+            trace.mark('operator_id.string')
         # reserved = data[22:25]
 
     def decode_message(self, data: bytes) -> None:
         """解码任意类型的报文，直接更新当前对象的属性值"""
+        if _tracer is not None and _active.trace is None and _tracer.sample():
+            return self._traced('decode_message', 'decode', self.decode_message, data)
+        trace = _active.trace if _tracer is not None else None
         if not data:
             raise ValueError("空数据")
 
         message_type, protocol_version = self._parse_header(data[0])
         if protocol_version > PROTOCOL_VERSION:
             raise ValueError(f"协议版本不兼容: {protocol_version}，当前版本: {PROTOCOL_VERSION}")
+        if trace:
+            trace.mark('header')
 
         if message_type == MessageType.PACK:
             length = data[1]
@@ -397,7 +490,11 @@ class UnmannedAircraft:
             if num_messages > 9:
                 raise ValueError("打包中报文数量最多为9个")
             for i in range(num_messages):
+                if trace:
+                    start = trace.last
                 self.decode_message(data[3 + i * 25:3 + (i + 1) * 25])
+                if trace:
+                    trace.span(f'pack[{i}]', start)
             return
 
         if len(data) != 25:
@@ -0,0 +1,256 @@
+import socket
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
+                           QPushButton, QSpinBox, QTableView, QHeaderView)
+from PyQt6.QtCore import (Qt, QAbstractTableModel, QModelIndex, QObject,
+                        QSortFilterProxyModel, QThread, QTimer, pyqtSignal)
+
+from capture import unpack_datagram, format_address
+from store import FleetState, Track
+
+DEFAULT_PORT = 30300  # 实时数据报默认UDP端口
+REFRESH_HZ = 10  # 界面刷新频率
+
+# 表格列：(表头, 取值函数)
+COLUMNS = [
+    ("广播地址", lambda address, track: format_address(address)),
+    ("识别码", lambda address, track: track.aircraft.id),
+    ("无人机类型", lambda address, track: track.aircraft.ua_type.name),
+    ("运行状态", lambda address, track: track.aircraft.operational_status.name),
+    ("纬度", lambda address, track: track.aircraft.latitude),
+    ("经度", lambda address, track: track.aircraft.longitude),
+    ("几何高度(m)", lambda address, track: track.aircraft.geodetic_altitude),
+    ("地速(m/s)", lambda address, track: track.aircraft.horizontal_speed),
+    ("航迹角", lambda address, track: track.aircraft.direction),
+    ("报文数", lambda address, track: track.message_count),
+    ("最近更新", lambda address, track: datetime.fromtimestamp(track.last_seen).strftime("%H:%M:%S")),
+]
+
+
+class LiveTableModel(QAbstractTableModel):
+    """实时航空器表格模型，每架航空器一行，按批次合并更新"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: List[tuple] = []
+        self._index: Dict[bytes, int] = {}  # 广播地址 -> 行号
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and index.isValid():
+            return self._rows[index.row()][index.column()]
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return COLUMNS[section][0]
+        return None
+
+    def apply(self, changes: List[Tuple[bytes, Track]]) -> None:
+        """应用一批状态变化：已有行合并为一次 dataChanged，新航空器合并为一次插入"""
+        new_rows = []
+        first = last = None
+        for address, track in changes:
+            row = tuple(getter(address, track) for _, getter in COLUMNS)
+            i = self._index.get(address)
+            if i is None:
+                new_rows.append((address, row))
+                continue
+            self._rows[i] = row
+            first = i if first is None else min(first, i)
+            last = i if last is None else max(last, i)
+
+        if first is not None:
+            self.dataChanged.emit(self.index(first, 0), self.index(last, len(COLUMNS) - 1),
+                                  [Qt.ItemDataRole.DisplayRole])
+        if new_rows:
+            start = len(self._rows)
+            self.beginInsertRows(QModelIndex(), start, start + len(new_rows) - 1)
+            for address, row in new_rows:
+                self._index[address] = len(self._rows)
+                self._rows.append(row)
+            self.endInsertRows()
+
+    def clear(self) -> None:
+        self.beginResetModel()
+        self._rows.clear()
+        self._index.clear()
+        self.endResetModel()
+
+
+class UDPSource:
+    """从UDP端口接收实时数据报（6字节广播地址 + 报文）"""
+
+    def __init__(self, port: int = DEFAULT_PORT, host: str = "0.0.0.0"):
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+        self._sock.bind((host, port))
+        self._sock.settimeout(0.2)  # 定期醒来检查是否已停止
+        self._stopped = False
+
+    def __iter__(self):
+        while not self._stopped:
+            try:
+                datagram, _ = self._sock.recvfrom(65535)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            try:
+                address, data = unpack_datagram(datagram)
+            except ValueError:
+                continue
+            yield address, data, time.time()
+
+    def stop(self) -> None:
+        self._stopped = True
+
+    def close(self) -> None:
+        self._sock.close()
+
+
+class DecodeWorker(QObject):
+    """后台解码：从数据源读取 (广播地址, 报文, 接收时间) 并写入状态表"""
+    finished = pyqtSignal()
+
+    def __init__(self, store: FleetState, source: Iterable[Tuple[bytes, bytes, float]]):
+        super().__init__()
+        self.store = store
+        self.source = source
+        self.decoded = 0  # 成功解码的报文数
+        self.errors = 0  # 解码失败的报文数
+        self._stopped = False
+
+    def run(self):
+        update = self.store.update
+        try:
+            for address, data, received in self.source:
+                if self._stopped:
+                    break
+                try:
+                    update(address, data, received)
+                    self.decoded += 1
+                except (ValueError, NotImplementedError):
+                    self.errors += 1
+        finally:
+            close = getattr(self.source, 'close', None)
+            if close is not None:
+                close()
+            self.finished.emit()
+
+    def stop(self):
+        self._stopped = True
+        stop = getattr(self.source, 'stop', None)
+        if stop is not None:
+            stop()
+
+
+class LiveMonitorWidget(QWidget):
+    """实时监视：后台线程解码，界面按固定频率批量刷新表格"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.store = FleetState()
+        self.model = LiveTableModel(self)
+        self.worker: Optional[DecodeWorker] = None
+        self.thread: Optional[QThread] = None
+        self._last_decoded = 0
+        self._last_refresh = time.monotonic()
+
+        layout = QVBoxLayout(self)
+
+        # 控制栏
+        control_layout = QHBoxLayout()
+        control_layout.addWidget(QLabel("UDP端口:"))
+        self.port_spin = QSpinBox()
+        self.port_spin.setMinimumHeight(30)
+        self.port_spin.setRange(1, 65535)
+        self.port_spin.setValue(DEFAULT_PORT)
+        control_layout.addWidget(self.port_spin)
+
+        self.start_button = QPushButton("开始")
+        self.start_button.clicked.connect(lambda: self.start())
+        control_layout.addWidget(self.start_button)
+
+        self.stop_button = QPushButton("停止")
+        self.stop_button.setEnabled(False)
+        self.stop_button.clicked.connect(self.stop)
+        control_layout.addWidget(self.stop_button)
+
+        self.status_label = QLabel()
+        control_layout.addWidget(self.status_label, 1)
+        layout.addLayout(control_layout)
+
+        # 航空器表格
+        proxy = QSortFilterProxyModel(self)
+        proxy.setSourceModel(self.model)
+        self.table_view = QTableView()
+        self.table_view.setModel(proxy)
+        self.table_view.setSortingEnabled(True)
+        self.table_view.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        self.table_view.verticalHeader().setDefaultSectionSize(24)
+        layout.addWidget(self.table_view)
+
+        # 刷新定时器
+        self.timer = QTimer(self)
+        self.timer.setInterval(1000 // REFRESH_HZ)
+        self.timer.timeout.connect(self.refresh)
+
+    def start(self, source: Optional[Iterable[Tuple[bytes, bytes, float]]] = None) -> None:
+        """启动后台解码，未指定数据源时监听UDP端口"""
+        if self.thread is not None:
+            return
+        if source is None:
+            source = UDPSource(self.port_spin.value())
+
+        self.worker = DecodeWorker(self.store, source)
+        self.thread = QThread(self)
+        self.worker.moveToThread(self.thread)
+        self.thread.started.connect(self.worker.run)
+        self.worker.finished.connect(self.thread.quit)
+        self.thread.finished.connect(self.on_finished)
+        self.thread.start()
+
+        self._last_decoded = 0
+        self._last_refresh = time.monotonic()
+        self.timer.start()
+        self.start_button.setEnabled(False)
+        self.stop_button.setEnabled(True)
+
+    def stop(self) -> None:
+        """停止后台解码并等待线程退出"""
+        if self.thread is None:
+            return
+        self.worker.stop()
+        self.thread.quit()
+        self.thread.wait()
+
+    def on_finished(self) -> None:
+        self.timer.stop()
+        self.refresh()
+        self.thread = None
+        self.start_button.setEnabled(True)
+        self.stop_button.setEnabled(False)
+
+    def refresh(self) -> None:
+        """取出上次刷新以来的全部变化，一次性更新表格和状态栏"""
+        changes = self.store.drain()
+        if changes:
+            self.model.apply(changes)
+
+        if self.worker is None:
+            return
+        now = time.monotonic()
+        decoded = self.worker.decoded
+        rate = (decoded - self._last_decoded) / max(now - self._last_refresh, 1e-6)
+        self._last_decoded, self._last_refresh = decoded, now
+        self.status_label.setText(
+            f"航空器: {len(self.store)}  报文: {decoded}  错误: {self.worker.errors}  速率: {rate:.0f} 条/秒")
@@ -0,0 +1,396 @@
+"""以 Network Remote ID 风格的 HTTP 接口提供广播接收到的航空器
+
+用法:
+    python -m netrid [--host 地址] [--port 端口] [--udp 端口] [--tile 度] [--ttl 秒]
+
+从 UDP 端口接收实时数据报（6字节广播地址 + 报文），在本地 HTTP 服务上提供：
+    GET /flights?view=纬度1,经度1,纬度2,经度2   区域内的航空器
+    GET /flights/<航班ID>/details                 航空器详情（航班ID为广播地址的十六进制）
+"""
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from enums import *
+from capture import unpack_datagram
+from filters import field, frames_array
+from fleet import FleetStore
+from timestamps import unwrap_timestamp
+from view import LATITUDE_OFFSET, LONGITUDE_OFFSET, FrameView, iter_views
+from vlos import haversine
+
+DEFAULT_PORT = 30380  # HTTP 服务默认端口
+DEFAULT_UDP_PORT = 30300  # 实时数据报默认UDP端口
+DEFAULT_TILE_SIZE = 0.01  # 区域瓦片边长，度（约1.1公里）
+DEFAULT_TTL = 1.0  # 瓦片缓存有效期，秒
+DEFAULT_MAX_AGE = 60.0  # 超过该时间未收到位置向量报文的航空器不再返回，秒
+DEFAULT_MAX_DIAGONAL = 7000.0  # 区域查询允许的最大对角线长度，米
+_STRIDE = 1 << 32  # 瓦片编号：纬向序号 * _STRIDE + 经向序号
+_LOCATION = MessageType.LOCATION.value
+_UAS_ID_KEYS = {
+    IDType.SERIAL_NUMBER: 'serial_number',
+    IDType.CAA_ASSIGNED_REGISTRATION_ID: 'registration_id',
+    IDType.UTM_ASSIGNED_UUID: 'utm_id',
+    IDType.SPECIFIC_SESSION_ID: 'specific_session_id',
+}
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large'}
+
+
+def format_time(timestamp: float) -> str:
+    """Unix 秒转换为 RFC 3339 时间（UTC，毫秒）"""
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+
+def flight_id(address: bytes) -> str:
+    """航班ID：广播地址的十六进制表示"""
+    return address.hex().upper()
+
+
+class FlightIndex:
+    """按区域瓦片索引的机群状态
+
+    原始报文保存在 FleetStore 中；另按最近一次位置把每架航空器登记到一个瓦片（tile_size 度见方）。
+    区域查询只访问与区域相交的瓦片，每个瓦片的航班列表缓存 ttl 秒，瓦片内有航空器的位置向量报文
+    到达（或航空器移入、移出）时立即失效。重建瓦片时只重新生成位置变化了的航班 JSON 文本；
+    其它报文不使缓存失效，最多延迟 ttl 秒可见。
+    不是线程安全的，应在同一线程（如事件循环线程）中更新和查询。
+    """
+
+    def __init__(self, store: Optional[FleetStore] = None, tile_size: float = DEFAULT_TILE_SIZE,
+                 ttl: float = DEFAULT_TTL, max_age: float = DEFAULT_MAX_AGE):
+        if tile_size <= 0:
+            raise ValueError("瓦片边长必须大于0")
+        self.store = store if store is not None else FleetStore()
+        self.tile_size = tile_size
+        self.ttl = ttl
+        self.max_age = max_age
+        self._tiles: Dict[int, Set[int]] = {}  # 瓦片编号 -> 行号集合
+        self._tile_of: Dict[int, int] = {}  # 行号 -> 瓦片编号
+        self._cache: Dict[int, Tuple[float, List[Tuple[float, float, str]]]] = {}  # 瓦片编号 -> (过期时刻, 航班)
+        self._flights: Dict[int, Tuple[float, float, float, float, str]] = {}  # 行号 -> (位置接收时间, 过期时刻, 纬度, 经度, JSON)
+        self.hits = 0
+        self.misses = 0
+
+    def _tile(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return (math.floor((latitude + 90) / self.tile_size),
+                math.floor((longitude + 180) / self.tile_size))
+
+    def _place(self, slot: int, key: int) -> None:
+        old = self._tile_of.get(slot)
+        if old != key:
+            if old is not None:
+                tile = self._tiles[old]
+                tile.discard(slot)
+                if not tile:
+                    del self._tiles[old]
+                self._cache.pop(old, None)
+            self._tiles.setdefault(key, set()).add(slot)
+            self._tile_of[slot] = key
+        self._cache.pop(key, None)
+
+    def update(self, address: bytes, data: bytes, received: Optional[float] = None) -> int:
+        """写入报文（可为打包报文），位置向量报文更新航空器所在瓦片，返回行号"""
+        slot = self.store.update(address, data, received)
+        for view in iter_views(data):
+            if view.message_type == MessageType.LOCATION:
+                y, x = self._tile(view.latitude, view.longitude)
+                self._place(slot, y * _STRIDE + x)
+        return slot
+
+    def update_many(self, addresses: Sequence[bytes], frames, received=None) -> np.ndarray:
+        """批量写入25字节报文，返回各报文的行号"""
+        frames = frames_array(frames)
+        slots = self.store.update_many(addresses, frames, received)
+        rows = np.flatnonzero(frames[:, 0] >> 4 == _LOCATION)
+        locations = frames[rows]
+        y = np.floor((field(locations, LATITUDE_OFFSET, '<i4') / 1e7 + 90) / self.tile_size).astype(np.int64)
+        x = np.floor((field(locations, LONGITUDE_OFFSET, '<i4') / 1e7 + 180) / self.tile_size).astype(np.int64)
+        for slot, key in zip(slots[rows].tolist(), (y * _STRIDE + x).tolist()):
+            self._place(slot, key)
+        return slots
+
+    def _entries(self, key: int, now: float) -> List[Tuple[float, float, str]]:
+        """瓦片内各航班的 (纬度, 经度, JSON 文本)，优先使用缓存"""
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] > now:
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        slots = self._tiles.get(key)
+        entries = self._build(slots, now) if slots else []
+        self._cache[key] = (now + self.ttl, entries)
+        return entries
+
+    def _build(self, slots: Set[int], now: float) -> List[Tuple[float, float, str]]:
+        """瓦片内各航班的条目，单个航班的 JSON 文本按位置向量报文的接收时间缓存，位置未变时复用"""
+        store = self.store
+        location_received = store.received(MessageType.LOCATION)
+        oldest = now - self.max_age
+        entries = []
+        for slot in slots:
+            received = float(location_received[slot])
+            if not received >= oldest:
+                continue
+            cached = self._flights.get(slot)
+            if cached is None or cached[0] != received or cached[1] <= now:
+                try:
+                    cached = self._flights[slot] = (received, now + self.ttl) + self._flight(slot, received)
+                except ValueError:
+                    continue  # 枚举取值无效的报文
+            entries.append(cached[2:])
+        return entries
+
+    def _flight(self, slot: int, received: float) -> Tuple[float, float, str]:
+        """一架航空器的 (纬度, 经度, 航班 JSON 文本)"""
+        store = self.store
+        location = FrameView(memoryview(store.frames(MessageType.LOCATION)[slot]))
+        timestamp = unwrap_timestamp(location.timestamp, received)
+        if timestamp != timestamp:
+            timestamp = received
+        if np.isnan(store.received(MessageType.BASIC_ID)[slot]):
+            aircraft_type = UAType.NOT_DECLARED
+        else:
+            aircraft_type = FrameView(memoryview(store.frames(MessageType.BASIC_ID)[slot])).ua_type
+        latitude, longitude = location.latitude, location.longitude
+        flight = {
+            'id': flight_id(store.addresses[slot]),
+            'aircraft_type': aircraft_type.name,
+            'current_state': {
+                'timestamp': {'value': format_time(timestamp), 'format': 'RFC3339'},
+                'timestamp_accuracy': location.timestamp_accuracy,
+                'operational_status': location.operational_status.name,
+                'position': {
+                    'lat': latitude,
+                    'lng': longitude,
+                    'alt': location.geodetic_altitude,
+                    'accuracy_h': location.horizontal_accuracy.name,
+                    'accuracy_v': location.geodetic_accuracy.name,
+                    'extrapolated': False,
+                    'pressure_altitude': location.pressure_altitude,
+                    'height': {'distance': location.height, 'reference': location.height_type.name},
+                },
+                'track': location.direction,
+                'speed': location.horizontal_speed,
+                'speed_accuracy': location.speed_accuracy.name,
+                'vertical_speed': location.vertical_speed,
+            },
+            'simulated': False,
+        }
+        return latitude, longitude, json.dumps(flight, ensure_ascii=False)
+
+    def flights(self, south: float, west: float, north: float, east: float, now: Optional[float] = None) -> List[str]:
+        """区域内（含边界）近期有位置的航班 JSON 文本"""
+        if south > north or west > east:
+            raise ValueError("区域范围无效")
+        if now is None:
+            now = time.time()
+        y0, x0 = self._tile(south, west)
+        y1, x1 = self._tile(north, east)
+        result = []
+        for y in range(y0, y1 + 1):
+            for x in range(x0, x1 + 1):
+                for latitude, longitude, text in self._entries(y * _STRIDE + x, now):
+                    if south <= latitude <= north and west <= longitude <= east:
+                        result.append(text)
+        return result
+
+    def details(self, address: bytes) -> Optional[dict]:
+        """航班详情：识别码、控制站、运行描述与运行区域，未收到的报文对应的字段不返回"""
+        store = self.store
+        if address not in store:
+            return None
+        slot = store.slot(address)
+        try:
+            ua = store.get(address)
+        except ValueError:
+            return None  # 保存的报文中有无效取值
+        seen = {message_type: not np.isnan(store.received(message_type)[slot])
+                for message_type in (MessageType.BASIC_ID, MessageType.SELF_ID,
+                                     MessageType.SYSTEM, MessageType.OPERATOR_ID)}
+        details = {'id': flight_id(address)}
+        if seen[MessageType.BASIC_ID]:
+            details['ua_type'] = ua.ua_type.name
+            key = _UAS_ID_KEYS.get(ua.id_type)
+            if key is not None:
+                details['uas_id'] = {key: ua.id}
+        if seen[MessageType.OPERATOR_ID]:
+            details['operator_id'] = ua.operator_id
+        if seen[MessageType.SELF_ID]:
+            details['operation_description'] = ua.description
+        if seen[MessageType.SYSTEM]:
+            details['operator_location'] = {
+                'position': {'lat': ua.operator_latitude, 'lng': ua.operator_longitude},
+                'altitude': ua.operator_altitude,
+                'altitude_type': ua.operator_location_source_type.name,
+            }
+            details['area'] = {'count': ua.area_count, 'radius': ua.area_radius,
+                               'ceiling': ua.area_ceiling, 'floor': ua.area_floor}
+            if ua.classification_type == ClassificationType.EUROPEAN_UNION:
+                details['eu_classification'] = {'category': ua.eu_ua_category.name, 'class': ua.eu_ua_class.name}
+            elif ua.classification_type == ClassificationType.CHINA:
+                details['china_classification'] = {'category': ua.china_ua_category.name,
+                                                   'class': ua.china_ua_class.name}
+        return details
+
+
+class NetRIDServer:
+    """基于 asyncio 的 HTTP/1.1 服务（支持长连接），只处理 GET 请求"""
+
+    def __init__(self, index: FlightIndex, host: str = '127.0.0.1', port: int = DEFAULT_PORT,
+                 max_diagonal: float = DEFAULT_MAX_DIAGONAL):
+        self.index = index
+        self.host = host
+        self.port = port
+        self.max_diagonal = max_diagonal
+        self.requests = 0
+        self._server: Optional[asyncio.base_events.Server] = None
+
+    def handle(self, method: str, target: str, now: Optional[float] = None) -> Tuple[int, bytes]:
+        """处理一个请求，返回 (状态码, JSON 响应体)"""
+        if method != 'GET':
+            return 405, _error("只支持 GET 请求")
+        if now is None:
+            now = time.time()
+        url = urlsplit(target)
+        parts = [part for part in url.path.split('/') if part]
+        if parts == ['flights']:
+            try:
+                lat1, lng1, lat2, lng2 = (float(value) for value in parse_qs(url.query)['view'][0].split(','))
+            except (KeyError, ValueError):
+                return 400, _error("view 参数应为 纬度1,经度1,纬度2,经度2")
+            south, north = sorted((lat1, lat2))
+            west, east = sorted((lng1, lng2))
+            if not (-90 <= south and north <= 90 and -180 <= west and east <= 180):
+                return 400, _error("区域超出经纬度范围")
+            if float(haversine(south, west, north, east)) > self.max_diagonal:
+                return 413, _error("查询区域过大")
+            flights = self.index.flights(south, west, north, east, now)
+            timestamp = json.dumps({'value': format_time(now), 'format': 'RFC3339'})
+            return 200, f'{{"timestamp": {timestamp}, "flights": [{", ".join(flights)}]}}'.encode()
+        if len(parts) == 3 and parts[0] == 'flights' and parts[2] == 'details':
+            try:
+                address = bytes.fromhex(parts[1])
+            except ValueError:
+                address = b''
+            details = self.index.details(address) if len(address) == 6 else None
+            if details is None:
+                return 404, _error("航班不存在")
+            return 200, json.dumps({'details': details}, ensure_ascii=False).encode()
+        return 404, _error("路径不存在")
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    method, target, version = line.decode('latin-1').split()
+                except ValueError:
+                    method, target, version = '', '/', 'HTTP/1.0'
+                keep_alive = version == 'HTTP/1.1'
+                length = 0
+                while True:
+                    header = await reader.readline()
+                    if header in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = header.decode('latin-1').partition(':')
+                    name, value = name.strip().lower(), value.strip().lower()
+                    if name == 'content-length':
+                        length = int(value) if value.isdigit() else 0
+                    elif name == 'connection':
+                        keep_alive = value == 'keep-alive' or (keep_alive and value != 'close')
+                if length:
+                    await reader.readexactly(length)
+
+                status, body = self.handle(method, target) if method else (400, _error("请求行无效"))
+                self.requests += 1
+                writer.write(f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                             f"Content-Type: application/json\r\n"
+                             f"Content-Length: {len(body)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self) -> None:
+        """开始监听；port 为 0 时由系统分配端口，启动后 port 为实际端口"""
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+
+def _error(message: str) -> bytes:
+    return json.dumps({'message': message}, ensure_ascii=False).encode()
+
+
+class DatagramReceiver(asyncio.DatagramProtocol):
+    """在事件循环中接收实时数据报并写入 FlightIndex"""
+
+    def __init__(self, index: FlightIndex):
+        self.index = index
+        self.received = 0
+        self.errors = 0
+
+    def datagram_received(self, datagram: bytes, addr) -> None:
+        self.received += 1
+        try:
+            address, data = unpack_datagram(datagram)
+            self.index.update(address, bytes(data), time.time())
+        except ValueError:
+            self.errors += 1
+
+
+async def serve(host: str, port: int, udp_port: int, index: FlightIndex) -> None:
+    """在同一事件循环中接收UDP数据报并提供 HTTP 服务，直到被取消"""
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(lambda: DatagramReceiver(index), local_addr=(host, udp_port))
+    server = NetRIDServer(index, host, port)
+    try:
+        await server.serve_forever()
+    finally:
+        transport.close()
+        await server.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m netrid", description="Network Remote ID 风格的区域查询服务")
+    parser.add_argument('--host', default='127.0.0.1', help="监听地址（默认 127.0.0.1）")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"HTTP 端口（默认 {DEFAULT_PORT}）")
+    parser.add_argument('--udp', type=int, default=DEFAULT_UDP_PORT, help=f"实时数据报UDP端口（默认 {DEFAULT_UDP_PORT}）")
+    parser.add_argument('--tile', type=float, default=DEFAULT_TILE_SIZE, help="瓦片边长，度")
+    parser.add_argument('--ttl', type=float, default=DEFAULT_TTL, help="瓦片缓存有效期，秒")
+    args = parser.parse_args(argv)
+
+    index = FlightIndex(tile_size=args.tile, ttl=args.ttl)
+    try:
+        asyncio.run(serve(args.host, args.port, args.udp, index))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import struct
+import time
+from typing import Dict, List, Optional, Sequence
+
+from main import UnmannedAircraft
+from enums import MessageType
+from view import FRAME_SIZE, SYSTEM_EPOCH, SYSTEM_TIMESTAMP_OFFSET, TIMESTAMP_OFFSET
+
+PACK_HEADER_SIZE = 3  # 打包报文头：报文头、子报文长度、子报文数量
+DEFAULT_MESSAGES = [MessageType.BASIC_ID, MessageType.LOCATION, MessageType.SELF_ID,
+                    MessageType.SYSTEM, MessageType.OPERATOR_ID]
+_pack_u16 = struct.Struct('<H').pack_into
+_pack_u32 = struct.Struct('<I').pack_into
+
+
+class PackBuffer:
+    """一架航空器的持久打包报文缓冲区
+
+    构造时完整编码一次打包报文，并记录位置向量和系统子报文在缓冲区中的偏移。之后每次广播调用 update()，
+    只原地重写位置向量子报文和系统子报文的时间戳，其它子报文不重新编码，打包报文也不重新拼接。
+    识别码、描述、控制站位置等静态字段改变后需调用 rebuild()。
+    """
+
+    def __init__(self, ua: UnmannedAircraft, messages: Sequence[MessageType] = DEFAULT_MESSAGES):
+        self.ua = ua
+        self.messages = list(messages)
+        self.buffer = bytearray()
+        self.offsets: Dict[MessageType, List[int]] = {}  # 各类子报文在缓冲区中的起始偏移
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        """重新编码全部子报文，缓冲区对象不变（长度可能随子报文数量改变）"""
+        self.buffer[:] = self.ua.encode_pack(self.messages)
+        self.offsets = {}
+        for i, message_type in enumerate(self.messages):
+            self.offsets.setdefault(message_type, []).append(PACK_HEADER_SIZE + i * FRAME_SIZE)
+        self._locations = self.offsets.get(MessageType.LOCATION, [])
+        self._system_timestamps = [offset + SYSTEM_TIMESTAMP_OFFSET
+                                   for offset in self.offsets.get(MessageType.SYSTEM, [])]
+
+    def update(self, now: Optional[float] = None) -> bytearray:
+        """用航空器当前的位置向量字段和 now（Unix 秒，默认为当前时间）原地更新缓冲区并返回
+
+        航空器未指定 timestamp 时，位置向量报文的时间戳与系统报文的时间戳一样取自 now。返回的是缓冲区本身，下次 update() 或 rebuild() 会改写其内容，需要保留时应复制。
+        """
+        if now is None:
+            now = time.time()
+        buffer = self.buffer
+        ua = self.ua
+        for offset in self._locations:
+            ua.encode_location_into(buffer, offset)
+            if ua.timestamp is None:
+                _pack_u16(buffer, offset + TIMESTAMP_OFFSET, int(now % 3600 * 10))  # 当前小时内的0.1秒数
+        for offset in self._system_timestamps:
+            _pack_u32(buffer, offset, max(int(now) - SYSTEM_EPOCH, 0))
+        return buffer
+
+
+class PackCache:
+    """按广播地址缓存各航空器的 PackBuffer，首次广播时创建"""
+
+    def __init__(self, messages: Sequence[MessageType] = DEFAULT_MESSAGES):
+        self.messages = list(messages)
+        self._packs: Dict[bytes, PackBuffer] = {}
+
+    def __len__(self) -> int:
+        return len(self._packs)
+
+    def __contains__(self, address: bytes) -> bool:
+        return address in self._packs
+
+    def get(self, address: bytes) -> Optional[PackBuffer]:
+        return self._packs.get(address)
+
+    def pack(self, address: bytes, ua: UnmannedAircraft, now: Optional[float] = None) -> bytearray:
+        """返回航空器本次广播的打包报文（缓冲区本身），航空器对象与缓存的不是同一个时先重新编码"""
+        buffer = self._packs.get(address)
+        if buffer is None:
+            buffer = self._packs[address] = PackBuffer(ua, self.messages)
+        elif buffer.ua is not ua:
+            buffer.ua = ua
+            buffer.rebuild()
+        return buffer.update(now)
+
+    def invalidate(self, address: bytes) -> None:
+        """航空器的静态字段改变后调用，下次广播时重新编码全部子报文"""
+        buffer = self._packs.get(address)
+        if buffer is not None:
+            buffer.rebuild()
+
+    def remove(self, address: bytes) -> None:
+        self._packs.pop(address, None)
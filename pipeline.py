@@ -0,0 +1,255 @@
+import threading
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from capture import Record
+from fleet import FleetStore
+from records import decode_records
+
+
+class OverflowPolicy(Enum):
+    BLOCK = 0x0  # 队列满时阻塞生产者（反压）
+    DROP_OLDEST = 0x1  # 丢弃队列中最早的元素
+    DROP_NEWEST = 0x2  # 丢弃新到的元素
+    SAMPLE = 0x3  # 每 sample_every 个溢出的元素保留1个（替换最早的元素），其余丢弃
+
+
+@dataclass
+class StageMetrics:
+    """单个阶段及其输入队列的统计"""
+    depth: int  # 当前队列长度
+    capacity: int  # 队列容量
+    max_depth: int  # 队列长度峰值
+    accepted: int  # 进入队列的元素数
+    dropped: int  # 因溢出丢弃的元素数
+    processed: int  # 已处理的元素数
+    errors: int  # 处理时抛出异常的元素数
+
+
+class BoundedQueue:
+    """有界队列，满时按溢出策略处理，可批量存取"""
+
+    def __init__(self, capacity: int, policy: OverflowPolicy = OverflowPolicy.BLOCK, sample_every: int = 10):
+        if capacity < 1:
+            raise ValueError("队列容量必须大于0")
+        if sample_every < 1:
+            raise ValueError("采样间隔必须大于0")
+        self.capacity = capacity
+        self.policy = policy
+        self.sample_every = sample_every
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._overflow = 0  # SAMPLE 策略下累计的溢出次数
+        self.max_depth = 0
+        self.accepted = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def put(self, item: Any) -> bool:
+        """放入一个元素，返回是否被接收"""
+        return self.put_many([item]) == 1
+
+    def put_many(self, items: Sequence[Any]) -> int:
+        """放入多个元素，返回被接收的数量；队列已关闭时抛出 ValueError"""
+        accepted = 0
+        with self._cond:
+            for item in items:
+                if self._closed:
+                    raise ValueError("队列已关闭")
+                queue = self._items
+                if len(queue) >= self.capacity:
+                    policy = self.policy
+                    if policy == OverflowPolicy.BLOCK:
+                        self._cond.notify_all()  # 唤醒消费者取走本次已放入的元素
+                        while len(queue) >= self.capacity and not self._closed:
+                            self._cond.wait()
+                        if self._closed:
+                            raise ValueError("队列已关闭")
+                    elif policy == OverflowPolicy.DROP_NEWEST:
+                        self.dropped += 1
+                        continue
+                    elif policy == OverflowPolicy.DROP_OLDEST:
+                        queue.popleft()
+                        self.dropped += 1
+                    else:
+                        self._overflow += 1
+                        self.dropped += 1
+                        if self._overflow % self.sample_every:
+                            continue
+                        queue.popleft()
+                queue.append(item)
+                accepted += 1
+            self.accepted += accepted
+            self.max_depth = max(self.max_depth, len(self._items))
+            self._cond.notify_all()
+        return accepted
+
+    def get_batch(self, max_items: int, timeout: Optional[float] = None) -> List[Any]:
+        """取出最多 max_items 个元素；队列为空时等待，已关闭且取空时返回空列表，超时也返回空列表"""
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait_for(lambda: self._items or self._closed, timeout)
+            queue = self._items
+            batch = [queue.popleft() for _ in range(min(max_items, len(queue)))]
+            if batch:
+                self._cond.notify_all()
+            return batch
+
+    def close(self) -> None:
+        """关闭队列：不再接收新元素，消费者取完剩余元素后得到空列表"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class Stage:
+    """流水线中的一个阶段：从输入队列取元素，用 func 处理后放入下一阶段的输入队列
+
+    func 返回 None 表示该元素不再向下传递。每个工作线程一次最多取 batch_size 个元素，
+    批量存取以减少锁竞争；阶段内多个工作线程时输出顺序不保证与输入一致。
+    """
+
+    def __init__(self, name: str, func: Callable[[Any], Any], workers: int = 1, capacity: int = 1024,
+                 policy: OverflowPolicy = OverflowPolicy.BLOCK, batch_size: int = 64, sample_every: int = 10):
+        if workers < 1:
+            raise ValueError("工作线程数必须大于0")
+        if batch_size < 1:
+            raise ValueError("每批元素数必须大于0")
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.batch_size = batch_size
+        self.queue = BoundedQueue(capacity, policy, sample_every)
+        self.processed = 0
+        self.errors = 0
+        self.last_error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+
+    def metrics(self) -> StageMetrics:
+        queue = self.queue
+        return StageMetrics(len(queue), queue.capacity, queue.max_depth, queue.accepted, queue.dropped,
+                            self.processed, self.errors)
+
+    def _work(self, output: Optional[BoundedQueue]) -> None:
+        func = self.func
+        while True:
+            batch = self.queue.get_batch(self.batch_size)
+            if not batch:
+                return
+            results = []
+            errors = 0
+            for item in batch:
+                try:
+                    result = func(item)
+                except Exception as e:
+                    errors += 1
+                    self.last_error = e
+                    continue
+                if result is not None:
+                    results.append(result)
+            with self._lock:
+                self.processed += len(batch)
+                self.errors += errors
+            if output is not None and results:
+                output.put_many(results)
+
+
+class Pipeline:
+    """由有界队列串联的多阶段流水线
+
+    每个阶段有自己的输入队列、溢出策略和工作线程数。队列都有界，流水线中的元素总数不超过
+    各队列容量之和加上各工作线程正在处理的批次，持续过载时内存不会增长：BLOCK 策略把压力
+    逐级反压到生产者，其它策略在对应队列丢弃元素并计入 dropped。
+    """
+
+    def __init__(self, stages: Sequence[Stage]):
+        if not stages:
+            raise ValueError("流水线至少需要一个阶段")
+        self.stages = list(stages)
+        self._threads: List[List[threading.Thread]] = []
+        self._started = False
+
+    def start(self) -> 'Pipeline':
+        """启动全部工作线程"""
+        if self._started:
+            raise ValueError("流水线已启动")
+        self._started = True
+        for i, stage in enumerate(self.stages):
+            output = self.stages[i + 1].queue if i + 1 < len(self.stages) else None
+            threads = [threading.Thread(target=stage._work, args=(output,), name=f"{stage.name}-{n}", daemon=True)
+                       for n in range(stage.workers)]
+            self._threads.append(threads)
+        for threads in self._threads:
+            for thread in threads:
+                thread.start()
+        return self
+
+    def put(self, item: Any) -> bool:
+        """向第一个阶段放入一个元素，返回是否被接收"""
+        return self.stages[0].queue.put(item)
+
+    def feed(self, source: Iterable[Any], batch_size: int = 64) -> int:
+        """从可迭代对象读取元素批量放入第一个阶段，返回被接收的数量"""
+        queue = self.stages[0].queue
+        accepted = 0
+        batch = []
+        for item in source:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                accepted += queue.put_many(batch)
+                batch = []
+        if batch:
+            accepted += queue.put_many(batch)
+        return accepted
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """不再接收新元素，等待已接收的元素逐级处理完毕后停止工作线程"""
+        for stage, threads in zip(self.stages, self._threads):
+            stage.queue.close()
+            for thread in threads:
+                thread.join(timeout)
+
+    def metrics(self) -> Dict[str, StageMetrics]:
+        """各阶段的队列长度、丢弃数、处理数和错误数"""
+        return {stage.name: stage.metrics() for stage in self.stages}
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def ingest_pipeline(store: FleetStore, sink: Callable[[Any], Any], decode_workers: int = 1,
+                    capacity: int = 4096, sink_policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST) -> Pipeline:
+    """接收 → 解码 → 状态表 → 输出 的流水线，输入为 (接收时间, 广播地址, 报文) 记录
+
+    解码阶段校验并解码报文，无法解码的报文计入该阶段的 errors；状态表阶段将原始报文写入 FleetStore
+    （单线程，FleetStore 不是线程安全的）；输出阶段对每个报文调用 sink((记录, 解码结果))。
+    前两个队列使用 BLOCK 策略反压到接收端，输出队列默认丢弃最早的元素，输出端停顿时不影响状态表更新。
+    """
+    def decode(record: Record):
+        return record, decode_records(record[2])
+
+    def track(item):
+        (received, address, data), _ = item
+        store.update(address, data, received)
+        return item
+
+    def emit(item):
+        sink(item)
+
+    return Pipeline([
+        Stage("decode", decode, workers=decode_workers, capacity=capacity),
+        Stage("track", track, capacity=capacity),
+        Stage("sink", emit, capacity=capacity, policy=sink_policy),
+    ])
@@ -0,0 +1,124 @@
+from dataclasses import fields
+from enum import Enum
+from typing import Any, Dict, List, Tuple, Union, get_args, get_origin
+
+from main import UnmannedAircraft
+from enums import *
+from view import iter_views
+
+# 各类报文对应的 UnmannedAircraft 字段
+MESSAGE_FIELDS: Dict[MessageType, List[str]] = {
+    MessageType.BASIC_ID: ['id_type', 'ua_type', 'id'],
+    MessageType.LOCATION: [
+        'operational_status', 'height_type', 'direction', 'horizontal_speed', 'vertical_speed',
+        'latitude', 'longitude', 'pressure_altitude', 'geodetic_altitude', 'height',
+        'geodetic_accuracy', 'horizontal_accuracy', 'pressure_accuracy', 'speed_accuracy',
+        'timestamp', 'timestamp_accuracy',
+    ],
+    MessageType.SELF_ID: ['description_type', 'description'],
+    MessageType.SYSTEM: [
+        'classification_type', 'operator_location_source_type', 'operator_latitude',
+        'operator_longitude', 'area_count', 'area_radius', 'area_ceiling', 'area_floor',
+        'eu_ua_category', 'eu_ua_class', 'china_ua_category', 'china_ua_class', 'operator_altitude',
+    ],
+    MessageType.OPERATOR_ID: ['operator_id_type', 'operator_id'],
+}
+
+# 全部字段（按报文类型顺序排列，不重复）
+ALL_FIELDS: List[str] = [name for names in MESSAGE_FIELDS.values() for name in names]
+
+
+def _field_type(annotation: Any) -> type:
+    """字段的类型，Optional[X] 取 X"""
+    if get_origin(annotation) is Union:
+        return next(arg for arg in get_args(annotation) if arg is not type(None))
+    return annotation
+
+
+FIELD_TYPES: Dict[str, type] = {f.name: _field_type(f.type) for f in fields(UnmannedAircraft)}
+# 取值可以为 None 的字段（Optional[X]）
+NULLABLE_FIELDS = frozenset(f.name for f in fields(UnmannedAircraft)
+                            if get_origin(f.type) is Union and type(None) in get_args(f.type))
+
+# 各类报文的 (字段名, 是否为枚举) 列表
+_RECORD_FIELDS = {
+    message_type: [(name, issubclass(FIELD_TYPES[name], Enum)) for name in names]
+    for message_type, names in MESSAGE_FIELDS.items()
+}
+
+
+def to_record(ua: UnmannedAircraft, message_type: MessageType) -> Dict[str, Any]:
+    """将航空器中某类报文的字段转换为字典，枚举以名称表示"""
+    record: Dict[str, Any] = {'message_type': message_type.name}
+    for name, is_enum in _RECORD_FIELDS[message_type]:
+        value = getattr(ua, name)
+        record[name] = value.name if is_enum else value
+    return record
+
+
+def decode_records(data: bytes) -> List[Dict[str, Any]]:
+    """解码一个报文，返回每个（子）报文对应的字典，打包报文会展开"""
+    records = []
+    for view in iter_views(data):
+        ua = UnmannedAircraft()
+        ua.decode_message(bytes(view.buffer))
+        records.append(to_record(ua, view.message_type))
+    return records
+
+
+def _parse_value(name: str, value: Any) -> Any:
+    field_type = FIELD_TYPES[name]
+    if issubclass(field_type, Enum):
+        try:
+            return field_type[value] if isinstance(value, str) else field_type(value)
+        except (KeyError, ValueError):
+            raise ValueError(f"无效的{name}: {value}") from None
+    if field_type is int:
+        return int(float(value))
+    if field_type is float:
+        return float(value)
+    return str(value)
+
+
+def from_record(record: Dict[str, Any]) -> Tuple[MessageType, UnmannedAircraft]:
+    """将字典转换为报文类型和航空器对象，空值字段使用默认值
+
+    打包报文的字典需额外提供 messages 字段，列出打包中的报文类型名称。
+    """
+    try:
+        message_type = MessageType[record['message_type']]
+    except KeyError:
+        raise ValueError(f"未知的报文类型: {record.get('message_type')}") from None
+
+    values = {}
+    for name, value in record.items():
+        if name in FIELD_TYPES and value is not None and value != "":
+            values[name] = _parse_value(name, value)
+    return message_type, UnmannedAircraft(**values)
+
+
+def encode_record(record: Dict[str, Any]) -> bytes:
+    """将字典编码为报文"""
+    message_type, ua = from_record(record)
+    if message_type == MessageType.PACK:
+        messages = record.get('messages') or []
+        if isinstance(messages, str):
+            messages = messages.split()
+        try:
+            return ua.encode_pack([MessageType[name] for name in messages])
+        except KeyError as e:
+            raise ValueError(f"未知的报文类型: {e.args[0]}") from None
+    if message_type == MessageType.BASIC_ID:
+        return ua.encode_basic_id()
+    elif message_type == MessageType.LOCATION:
+        return ua.encode_location()
+    elif message_type == MessageType.AUTH:
+        return ua.encode_auth()
+    elif message_type == MessageType.SELF_ID:
+        return ua.encode_self_id()
+    elif message_type == MessageType.SYSTEM:
+        return ua.encode_system()
+    elif message_type == MessageType.OPERATOR_ID:
+        return ua.encode_operator_id()
+    else:
+        raise ValueError(f"未知的报文类型: {message_type}")
@@ -0,0 +1,232 @@
+"""按原始时间间隔回放抓包文件
+
+用法:
+    python -m replay 抓包文件 [-x 倍速 | --fast] [-u 主机:端口 | -o 抓包文件] [--start 秒] [--loop]
+
+未指定输出时将抓包文件写到标准输出。结束时在标准错误输出节奏误差统计。
+"""
+import argparse
+import sys
+import threading
+import time
+from typing import BinaryIO, List, Optional, TextIO
+
+import numpy as np
+
+from capture import Record, iter_records
+from generator import CaptureSink, UDPSink
+
+DEFAULT_BATCH_WINDOW = 0.001  # 计划时刻落在同一窗口内的报文合并为一批发送，秒
+DEFAULT_SPIN = 0.0005  # 距计划时刻不足该值时忙等而不休眠，秒
+FAST_BATCH = 4096  # 尽快发送时每批的报文数，批间检查暂停、跳转和停止
+
+
+class PacingStats:
+    """回放节奏统计：每个报文实际发送时刻与计划时刻之差（正数为晚发）"""
+
+    def __init__(self):
+        self.sent = 0
+        self.batches = 0
+        self.elapsed = 0.0
+        self._errors: List[np.ndarray] = []
+
+    def record(self, errors: np.ndarray) -> None:
+        self.sent += len(errors)
+        self.batches += 1
+        self._errors.append(errors)
+
+    @property
+    def errors(self) -> np.ndarray:
+        """全部报文的节奏误差，秒"""
+        return np.concatenate(self._errors) if self._errors else np.empty(0)
+
+    def summary(self) -> dict:
+        """节奏误差的均值、中位数、99分位、最大绝对值（秒）"""
+        errors = self.errors
+        if not len(errors):
+            return {'mean': 0.0, 'p50': 0.0, 'p99': 0.0, 'max': 0.0}
+        magnitude = np.abs(errors)
+        return {'mean': float(errors.mean()), 'p50': float(np.percentile(magnitude, 50)),
+                'p99': float(np.percentile(magnitude, 99)), 'max': float(magnitude.max())}
+
+    def report(self, stream: TextIO) -> None:
+        summary = self.summary()
+        rate = self.sent / self.elapsed if self.elapsed > 0 else 0.0
+        print(f"发送: {self.sent}  批次: {self.batches}  耗时: {self.elapsed:.3f} 秒  速率: {rate:,.0f} 条/秒  "
+              f"节奏误差 均值: {summary['mean'] * 1e3:.3f} 毫秒  中位数: {summary['p50'] * 1e3:.3f} 毫秒  "
+              f"P99: {summary['p99'] * 1e3:.3f} 毫秒  最大: {summary['max'] * 1e3:.3f} 毫秒", file=stream)
+
+
+class Replayer:
+    """抓包回放器
+
+    记录按接收时间（稳定）排序后载入内存，回放时将抓包时间线按倍速映射到单调时钟上的绝对计划时刻：
+        计划时刻 = 起点时刻 + (接收时间 - 起点接收时间) / 倍速
+    每次醒来把计划时刻已到（或落在 batch_window 内）的报文作为一批发送，然后休眠到下一个报文的计划时刻，
+    最后 spin 秒改为忙等。计划时刻是绝对的，休眠的误差不会累积。speed 为 None 时不等待，尽快发送。
+    暂停、继续和跳转可以在其它线程中调用，会重新确定起点；原始报文流没有接收时间，只能尽快发送。
+    """
+
+    def __init__(self, records: List[Record], speed: Optional[float] = 1.0,
+                 batch_window: float = DEFAULT_BATCH_WINDOW, spin: float = DEFAULT_SPIN):
+        if speed is not None and speed <= 0:
+            raise ValueError("倍速必须大于0")
+        received = np.array([record[0] for record in records], dtype=np.float64)
+        order = np.argsort(received, kind='stable')
+        self._received = received[order]
+        self._records = [records[i] for i in order.tolist()]
+        self.speed = speed
+        self.batch_window = batch_window
+        self.spin = spin
+        self._position = 0  # 下一个待发送记录的序号
+        self._paused = False
+        self._stopped = False
+        self._rebase = True  # 下次发送前重新确定起点
+        self._cond = threading.Condition()
+
+    @classmethod
+    def open(cls, path: str, **kwargs) -> 'Replayer':
+        """载入抓包文件"""
+        with open(path, 'rb') as f:
+            return cls(list(iter_records(f, 1 << 20)), **kwargs)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    @property
+    def duration(self) -> float:
+        """抓包时间跨度（秒）"""
+        return float(self._received[-1] - self._received[0]) if len(self._received) else 0.0
+
+    @property
+    def position(self) -> float:
+        """下一个待发送记录相对第一个记录的抓包时间（秒），已全部发送时为 duration"""
+        with self._cond:
+            if self._position >= len(self._received):
+                return self.duration
+            return float(self._received[self._position] - self._received[0])
+
+    def pause(self) -> None:
+        with self._cond:
+            self._paused = True
+            self._cond.notify_all()
+
+    def resume(self) -> None:
+        with self._cond:
+            self._paused = False
+            self._rebase = True
+            self._cond.notify_all()
+
+    def seek(self, offset: float) -> None:
+        """跳转到相对第一个记录的抓包时间 offset 秒处，从该时刻及之后的第一个记录继续回放"""
+        with self._cond:
+            start = self._received[0] if len(self._received) else 0.0
+            self._position = int(np.searchsorted(self._received, start + offset, side='left'))
+            self._rebase = True
+            self._cond.notify_all()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def run(self, sink, loop: bool = False) -> PacingStats:
+        """回放到结束（或被 stop），返回节奏统计；loop 为 True 时结束后从头重新回放"""
+        stats = PacingStats()
+        started = time.monotonic()
+        received = self._received
+        base_time = base_received = 0.0
+        with self._cond:
+            self._stopped = False
+            self._rebase = True
+
+        while True:
+            with self._cond:
+                while self._paused and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    break
+                if self._position >= len(received):
+                    if not loop or not len(received):
+                        break
+                    self._position = 0
+                    self._rebase = True
+                position = self._position
+                if self._rebase:
+                    base_time, base_received = time.monotonic(), received[position]
+                    self._rebase = False
+
+                if self.speed is None:
+                    end = min(position + FAST_BATCH, len(received))
+                    due = None
+                else:
+                    now = time.monotonic()
+                    horizon = base_received + (now - base_time + self.batch_window) * self.speed
+                    end = int(np.searchsorted(received, horizon, side='right'))
+                    if end == position:
+                        # 休眠到下一个报文的计划时刻，暂停、跳转或停止会提前唤醒
+                        delay = base_time + (received[position] - base_received) / self.speed - now
+                        if delay > self.spin:
+                            self._cond.wait(delay - self.spin)
+                            continue
+                        end = position + 1
+                    due = base_time + (received[position:end] - base_received) / self.speed
+                self._position = end
+
+            if due is None:
+                sink.send(self._records[position:end])
+                stats.record(np.zeros(end - position))
+                continue
+            while time.monotonic() < due[0]:
+                pass
+            sink.send(self._records[position:end])
+            stats.record(time.monotonic() - due)
+
+        stats.elapsed = time.monotonic() - started
+        return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m replay", description="Remote ID 抓包回放")
+    parser.add_argument('capture', help="抓包文件")
+    speed = parser.add_mutually_exclusive_group()
+    speed.add_argument('-x', '--speed', type=float, default=1.0, help="回放倍速（默认 1）")
+    speed.add_argument('--fast', action='store_true', help="不等待，尽快发送")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument('-o', '--output', help="抓包文件，默认写到标准输出")
+    output.add_argument('-u', '--udp', metavar='HOST:PORT', help="发送到UDP端口")
+    parser.add_argument('--start', type=float, default=0.0, help="从抓包开始后第几秒开始回放")
+    parser.add_argument('--loop', action='store_true', help="循环回放，直到被中断")
+    parser.add_argument('-q', '--quiet', action='store_true', help="不输出节奏统计")
+    args = parser.parse_args(argv)
+
+    replayer = Replayer.open(args.capture, speed=None if args.fast else args.speed)
+    if args.start:
+        replayer.seek(args.start)
+    stream: Optional[BinaryIO] = None
+    if args.udp:
+        host, _, port = args.udp.rpartition(':')
+        sink = UDPSink(host or '127.0.0.1', int(port))
+    else:
+        stream = open(args.output, 'wb') if args.output else sys.stdout.buffer
+        sink = CaptureSink(stream)
+
+    stats = None
+    try:
+        stats = replayer.run(sink, loop=args.loop)
+    except (BrokenPipeError, KeyboardInterrupt):
+        pass
+    finally:
+        if isinstance(sink, UDPSink):
+            sink.close()
+        elif args.output:
+            stream.close()
+        else:
+            stream.flush()
+    if stats is not None and not args.quiet:
+        stats.report(sys.stderr)
+    return 0 if stats is not None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional, Sequence, Tuple
+
+from enums import *
+from history import SCHEMA
+
+DEFAULT_CHUNK = 600.0  # 每次压缩处理的时间段长度，秒
+
+
+@dataclass(frozen=True)
+class Tier:
+    """降采样层级：早于 age 秒的记录，每架航空器每 interval 秒最多保留一条"""
+    age: float
+    interval: float
+
+
+# 最近1小时保留全部记录，1小时到1天之间每10秒一条（0.1 Hz），1天以前每分钟一条
+DEFAULT_TIERS = (Tier(3600.0, 10.0), Tier(86400.0, 60.0))
+DEFAULT_KEEP = (OperationalStatus.EMERGENCY, OperationalStatus.REMOTE_ID_SYSTEM_FAILURE)
+
+RETENTION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS retention (
+    interval REAL PRIMARY KEY,
+    compacted REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_time ON messages (time);
+"""
+
+# 时间段内按航空器和时间桶编号，桶内第一条、运行状态变化点和需要保留的状态以外的记录删除。
+# 时间段边界与桶边界对齐，桶内第一条不受相邻时间段影响；已降采样的记录中各状态区间的第一条都还在，
+# 再次降采样时状态变化点不会丢失。
+_COMPACT_LOCATIONS = """
+DELETE FROM locations WHERE rowid IN (
+    SELECT rowid FROM (
+        SELECT rowid, status,
+               ROW_NUMBER() OVER (PARTITION BY aircraft, CAST(time / :interval AS INTEGER) ORDER BY time) AS number,
+               LAG(status) OVER (PARTITION BY aircraft ORDER BY time) AS previous
+        FROM locations WHERE time >= :start AND time < :end)
+    WHERE number > 1 AND status = previous AND status NOT IN ({keep}))
+"""
+# 其它报文按同样的时间桶保留，内容变化的报文都保留；系统报文第20~23字节是时间戳，每条都不同，比较内容时去掉
+_COMPACT_MESSAGES = """
+DELETE FROM messages WHERE rowid IN (
+    SELECT rowid FROM (
+        SELECT rowid, content,
+               ROW_NUMBER() OVER (PARTITION BY aircraft, message_type, CAST(time / :interval AS INTEGER)
+                                  ORDER BY time) AS number,
+               LAG(content) OVER (PARTITION BY aircraft, message_type ORDER BY time) AS previous
+        FROM (SELECT rowid, aircraft, message_type, time,
+                     CASE message_type WHEN {system} THEN substr(data, 1, 20) || substr(data, 25) ELSE data END
+                         AS content
+              FROM messages WHERE time >= :start AND time < :end))
+    WHERE number > 1 AND content = previous)
+""".format(system=MessageType.SYSTEM.value)
+
+
+class Retention:
+    """历史库（见 history 模块）的分层保留与降采样
+
+    最近 tiers[0].age 秒内的记录保持原始分辨率，更早的记录按各层级的间隔降采样：每架航空器每个时间桶保留第一条，
+    另外始终保留运行状态变化点和 keep 中的状态（默认紧急状态和远程识别系统故障）的全部记录；其它报文在每个时间桶
+    保留第一条和内容变化的报文。数据不会被整体删除，只会逐层变稀疏。
+
+    压缩按 chunk 秒的时间段增量进行（messages 表另建时间索引，每段只读取该时间段的行），每段一个事务，各层级已压缩到的时间记录在 retention 表中，中断后从断点继续。
+    start() 在后台线程中持续压缩，可与 HistorySink 同时使用（WAL 模式下写入方只在每段的事务期间等待）。
+    删除释放的页由 SQLite 重用于新写入，文件大小不再增长，但不会缩小。
+    """
+
+    def __init__(self, path: str, tiers: Sequence[Tier] = DEFAULT_TIERS,
+                 keep: Sequence[OperationalStatus] = DEFAULT_KEEP, chunk: float = DEFAULT_CHUNK):
+        tiers = tuple(sorted(tiers, key=lambda tier: tier.age))
+        if not tiers:
+            raise ValueError("至少需要一个降采样层级")
+        for tier in tiers:
+            if tier.age < 0 or tier.interval <= 0:
+                raise ValueError("降采样层级不符合要求")
+            if chunk % tier.interval:
+                raise ValueError("压缩时间段长度必须是各层级间隔的整数倍")
+        if any(a.interval > b.interval for a, b in zip(tiers, tiers[1:])):
+            raise ValueError("更早的层级间隔不能更短")
+        self.tiers = tiers
+        self.chunk = chunk
+        self.connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(SCHEMA + RETENTION_SCHEMA)
+        self._compact_locations = _COMPACT_LOCATIONS.format(
+            keep=', '.join(str(status.value) for status in keep) or 'NULL')
+        self._first: Optional[float] = None
+        self._compacted = dict(self.connection.execute("SELECT interval, compacted FROM retention"))
+        self.deleted = 0  # 已删除的行数
+        self.chunks = 0  # 已处理的时间段数
+        self._lock = threading.Lock()  # 同一时间只有一次压缩使用连接
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _origin(self) -> Optional[float]:
+        """最早一条记录所在时间段的起点"""
+        if self._first is None:
+            times = [self.connection.execute(f"SELECT MIN(time) FROM {table}").fetchone()[0]
+                     for table in ('locations', 'messages')]
+            first = min((t for t in times if t is not None), default=None)
+            if first is not None:
+                self._first = first // self.chunk * self.chunk
+        return self._first
+
+    def _pending(self, now: float) -> Optional[Tuple[Tier, float]]:
+        """下一个待压缩的 (层级, 时间段起点)；从最早的层级开始，已被更粗层级处理过的时间段跳过"""
+        done = None
+        for tier in reversed(self.tiers):
+            start = self._compacted.get(tier.interval)
+            if done is not None:
+                start = done if start is None else max(start, done)
+            if start is None:
+                start = self._origin()
+                if start is None:
+                    return None
+            if start + self.chunk <= now - tier.age:
+                return tier, start
+            done = start
+        return None
+
+    def step(self, now: Optional[float] = None) -> bool:
+        """压缩一个时间段，没有待处理的时间段时返回 False"""
+        if now is None:
+            now = time.time()
+        with self._lock:
+            pending = self._pending(now)
+            if pending is None:
+                return False
+            tier, start = pending
+            parameters = {'interval': tier.interval, 'start': start, 'end': start + self.chunk}
+            connection = self.connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                deleted = connection.execute(self._compact_locations, parameters).rowcount
+                deleted += connection.execute(_COMPACT_MESSAGES, parameters).rowcount
+                connection.execute("INSERT OR REPLACE INTO retention VALUES (?, ?)",
+                                   (tier.interval, start + self.chunk))
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            self._compacted[tier.interval] = start + self.chunk
+            self.deleted += deleted
+            self.chunks += 1
+            return True
+
+    def compact(self, now: Optional[float] = None, max_chunks: Optional[int] = None) -> int:
+        """压缩直到没有待处理的时间段（或处理了 max_chunks 段），返回处理的段数"""
+        if now is None:
+            now = time.time()
+        count = 0
+        while (max_chunks is None or count < max_chunks) and self.step(now):
+            count += 1
+        return count
+
+    def start(self, pause: float = 0.01, idle: float = 60.0) -> None:
+        """启动后台压缩线程：每段之间暂停 pause 秒让出写锁，没有待处理的时间段时每 idle 秒检查一次"""
+        if self._thread is not None:
+            raise ValueError("后台压缩已启动")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(pause, idle), name="retention", daemon=True)
+        self._thread.start()
+
+    def _run(self, pause: float, idle: float) -> None:
+        while not self._stop.is_set():
+            try:
+                pending = self.step()
+            except sqlite3.OperationalError:
+                pending = True  # 写入方长时间持有锁，稍后重试
+            self._stop.wait(pause if pending else idle)
+
+    def stop(self) -> None:
+        """停止后台压缩线程，等待当前时间段完成"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def close(self) -> None:
+        self.stop()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
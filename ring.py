@@ -0,0 +1,303 @@
+import multiprocessing
+import platform
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+from typing import Iterator, Optional
+
+import numpy as np
+
+from view import FRAME_SIZE
+
+DEFAULT_CAPACITY = 1 << 16  # 默认槽位数
+MAX_PACK_SIZE = 3 + 9 * FRAME_SIZE  # 打包报文的最大长度（9个子报文）
+_HEADER = 40  # 头部的 int64 个数，每个计数各占一个64字节缓存行
+_CLAIMED, _PUBLISHED, _ACQUIRED, _RELEASED, _CLOSED = 0, 8, 16, 24, 32
+_SPINS = 64  # 等待时先让出 CPU 的次数，之后逐步休眠
+_MAX_SLEEP = 0.001  # 等待时单次休眠的上限，秒
+_X86 = ('x86_64', 'amd64', 'i386', 'i686', 'x86')  # 写入按程序顺序对其它核可见的处理器架构
+
+
+@dataclass
+class RingBatch:
+    """一次申请到的连续槽位，frames 是共享内存上的 (n, slot_size) 视图，不复制数据"""
+    start: int  # 第一个槽位的序号（单调递增，不回绕）
+    frames: np.ndarray
+    lengths: Optional[np.ndarray] = None  # 变长槽位中各报文的实际长度
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def messages(self) -> Iterator[memoryview]:
+        """逐个返回报文的 memoryview（变长槽位按实际长度截取），仅在 release() 之前有效"""
+        if self.lengths is None:
+            for row in self.frames:
+                yield row.data
+        else:
+            for row, length in zip(self.frames, self.lengths.tolist()):
+                yield row.data[:length]
+
+
+class FrameRing:
+    """基于 multiprocessing.shared_memory 的定长槽位环形缓冲区，用于跨进程传递报文
+
+    共享内存头部有四个单调递增的计数：生产者已申请、已提交，消费者已申请、已归还的槽位数。一次申请一段
+    连续槽位，在共享内存上直接写入或读取后再提交或归还，数据不经过序列化。每个计数只由单次8字节写入更新，
+    不批量写入控制字，避免 memcpy 重复写入同一地址时覆盖其它进程的更新。
+
+    单生产者、单消费者时不使用任何锁。multi_producer / multi_consumer 为 True 时，同一端的进程之间只在
+    推进申请计数时持有一把 multiprocessing.Lock；提交和归还按申请顺序进行，先申请的一批尚未提交时，
+    后申请的一批在 commit() / release() 中等待。同一进程内同时持有多批时，应按申请顺序提交或归还。
+    各端通过共享内存中的计数同步，依赖处理器按程序顺序使写入对其它核可见（x86 满足），在其它架构上创建或连接时
+    抛出 NotImplementedError。
+
+    对象可以作为 multiprocessing.Process 的参数传给子进程，子进程中自动连接同一块共享内存。
+    创建者负责在所有进程用完后调用 unlink()。
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, slot_size: int = FRAME_SIZE, variable: bool = False,
+                 multi_producer: bool = False, multi_consumer: bool = False):
+        _check_platform()
+        if capacity < 1:
+            raise ValueError("槽位数必须大于0")
+        if slot_size < 1 or (variable and slot_size > 0xFFFF):
+            raise ValueError("槽位大小不符合要求")
+        self.capacity = capacity
+        self.slot_size = slot_size
+        self.variable = variable
+        self._producer_lock = multiprocessing.Lock() if multi_producer else None
+        self._consumer_lock = multiprocessing.Lock() if multi_consumer else None
+        self._memory = SharedMemory(create=True, size=self._size())
+        self._owner = True
+        self._map()
+        self._header[:] = 0
+
+    def _size(self) -> int:
+        return 8 * _HEADER + (2 * self.capacity if self.variable else 0) + self.capacity * self.slot_size
+
+    def _map(self) -> None:
+        buffer = self._memory.buf
+        capacity = self.capacity
+        offset = 8 * _HEADER
+        self._header = np.ndarray(_HEADER, dtype=np.int64, buffer=buffer)
+        self._lengths = None
+        if self.variable:
+            self._lengths = np.ndarray(capacity, dtype=np.uint16, buffer=buffer, offset=offset)
+            offset += 2 * capacity
+        self._slots = np.ndarray((capacity, self.slot_size), dtype=np.uint8, buffer=buffer, offset=offset)
+
+    def __getstate__(self):
+        return {'name': self._memory.name, 'capacity': self.capacity, 'slot_size': self.slot_size,
+                'variable': self.variable, 'producer_lock': self._producer_lock,
+                'consumer_lock': self._consumer_lock}
+
+    def __setstate__(self, state):
+        _check_platform()
+        self.capacity = state['capacity']
+        self.slot_size = state['slot_size']
+        self.variable = state['variable']
+        self._producer_lock = state['producer_lock']
+        self._consumer_lock = state['consumer_lock']
+        self._memory = SharedMemory(state['name'])
+        self._owner = False
+        self._map()
+
+    @property
+    def name(self) -> str:
+        """共享内存的名称"""
+        return self._memory.name
+
+    @property
+    def closed(self) -> bool:
+        return bool(self._header[_CLOSED])
+
+    def __len__(self) -> int:
+        """已提交、尚未被申请读取的槽位数（近似值）"""
+        return int(self._header[_PUBLISHED] - self._header[_ACQUIRED])
+
+    def _batch(self, position: int, count: int) -> RingBatch:
+        index = position % self.capacity
+        lengths = None if self._lengths is None else self._lengths[index:index + count]
+        return RingBatch(position, self._slots[index:index + count], lengths)
+
+    def _contiguous(self, position: int, count: int) -> int:
+        """count 个槽位中从 position 起不跨越缓冲区末尾的数量"""
+        return min(count, self.capacity - position % self.capacity)
+
+    def claim(self, count: int = 1, timeout: Optional[float] = None) -> Optional[RingBatch]:
+        """申请最多 count 个空闲槽位用于写入，至少得到1个；缓冲区满时等待，超时返回 None
+
+        写入 batch.frames（变长槽位还需写入 batch.lengths）后调用 commit()，写入失败时也必须提交。
+        缓冲区已关闭（包括等待期间被关闭）时抛出 ValueError。
+        """
+        header = self._header
+        with self._producer_lock or nullcontext():
+            if header[_CLOSED]:
+                raise ValueError("环形缓冲区已关闭")
+            position = int(header[_CLAIMED])
+            free = self.capacity - (position - int(header[_RELEASED]))
+            if not free:
+                deadline = None if timeout is None else time.monotonic() + timeout
+                waits = 0
+                while not free:
+                    if header[_CLOSED]:
+                        raise ValueError("环形缓冲区已关闭")
+                    if not _backoff(waits, deadline):
+                        return None
+                    waits += 1
+                    free = self.capacity - (position - int(header[_RELEASED]))
+            claimed = self._contiguous(position, min(count, free))
+            header[_CLAIMED] = position + claimed
+        return self._batch(position, claimed)
+
+    def commit(self, batch: RingBatch) -> None:
+        """提交已写入的槽位，消费者随后可以读取；前面的批次尚未提交时等待"""
+        _advance(self._header, _PUBLISHED, batch.start, len(batch))
+
+    def acquire(self, count: int = 1, timeout: Optional[float] = None) -> Optional[RingBatch]:
+        """申请最多 count 个已提交的槽位用于读取，至少得到1个；缓冲区为空时等待
+
+        超时，或缓冲区已关闭且已读完时返回 None。读取完 batch.frames 后调用 release()，之后视图不再有效。
+        """
+        header = self._header
+        with self._consumer_lock or nullcontext():
+            position = int(header[_ACQUIRED])
+            ready = int(header[_PUBLISHED]) - position
+            if not ready:
+                deadline = None if timeout is None else time.monotonic() + timeout
+                waits = 0
+                while not ready:
+                    closed = header[_CLOSED]  # 先读关闭标志再检查计数，关闭前提交的报文不会漏读
+                    ready = int(header[_PUBLISHED]) - position
+                    if ready:
+                        break
+                    if closed or not _backoff(waits, deadline):
+                        return None
+                    waits += 1
+            ready = self._contiguous(position, min(count, ready))
+            header[_ACQUIRED] = position + ready
+        return self._batch(position, ready)
+
+    def release(self, batch: RingBatch) -> None:
+        """归还已读取的槽位，生产者随后可以重新写入；前面的批次尚未归还时等待"""
+        _advance(self._header, _RELEASED, batch.start, len(batch))
+
+    def put(self, data, timeout: Optional[float] = None) -> bool:
+        """写入一个报文，返回是否在超时前写入"""
+        data = self._check(data)  # 申请槽位前检查，申请后出错会使之后的提交一直等待
+        batch = self.claim(1, timeout)
+        if batch is None:
+            return False
+        try:
+            self._write(batch, 0, data)
+        finally:
+            self.commit(batch)
+        return True
+
+    def put_many(self, messages, timeout: Optional[float] = None) -> int:
+        """写入多个报文，返回在超时前写入的数量
+
+        定长槽位时 messages 可以是 (n, slot_size) 的 uint8 数组，按批整体复制；否则逐个写入。
+        """
+        if isinstance(messages, np.ndarray) and messages.ndim == 2 and not self.variable:
+            if messages.shape[1] != self.slot_size:
+                raise ValueError("数据长度不符合要求")
+            written = 0
+            while written < len(messages):
+                batch = self.claim(len(messages) - written, timeout)
+                if batch is None:
+                    break
+                try:
+                    batch.frames[:] = messages[written:written + len(batch)]
+                finally:
+                    self.commit(batch)
+                written += len(batch)
+            return written
+
+        messages = [self._check(data) for data in messages]
+        written = 0
+        while written < len(messages):
+            batch = self.claim(len(messages) - written, timeout)
+            if batch is None:
+                break
+            try:
+                for i in range(len(batch)):
+                    self._write(batch, i, messages[written + i])
+            finally:
+                self.commit(batch)
+            written += len(batch)
+        return written
+
+    def _check(self, data) -> np.ndarray:
+        data = np.frombuffer(data, dtype=np.uint8)
+        if len(data) > self.slot_size or (not self.variable and len(data) != self.slot_size):
+            raise ValueError("数据长度不符合要求")
+        return data
+
+    def _write(self, batch: RingBatch, row: int, data: np.ndarray) -> None:
+        batch.frames[row, :len(data)] = data
+        if self.variable:
+            batch.lengths[row] = len(data)
+
+    def batches(self, count: int, timeout: Optional[float] = None) -> Iterator[RingBatch]:
+        """持续读取，每次最多 count 个槽位；下一次迭代时自动归还上一批，缓冲区关闭并读完或超时后结束"""
+        while True:
+            batch = self.acquire(count, timeout)
+            if batch is None:
+                return
+            try:
+                yield batch
+            finally:
+                self.release(batch)
+
+    def close(self) -> None:
+        """关闭缓冲区：不再接受写入，消费者读完剩余报文后得到 None"""
+        self._header[_CLOSED] = 1
+
+    def detach(self) -> None:
+        """断开本进程与共享内存的连接，之前取得的视图必须已经释放"""
+        self._header = self._lengths = self._slots = None
+        self._memory.close()
+
+    def unlink(self) -> None:
+        """销毁共享内存，只应由创建者在所有进程断开后调用"""
+        self._memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.detach()
+        if self._owner:
+            self.unlink()
+
+
+class PackRing(FrameRing):
+    """变长槽位的环形缓冲区，每个槽位可容纳一个打包报文或一个25字节报文"""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, multi_producer: bool = False, multi_consumer: bool = False):
+        super().__init__(capacity, MAX_PACK_SIZE, True, multi_producer, multi_consumer)
+
+
+def _check_platform() -> None:
+    machine = platform.machine().lower()
+    if machine not in _X86:
+        raise NotImplementedError(f"环形缓冲区依赖 x86 的内存顺序，不支持当前平台: {machine}")
+
+
+def _advance(header: np.ndarray, counter: int, start: int, count: int) -> None:
+    """等待计数到达 start 后推进到 start + count（同一端的批次按申请顺序生效）"""
+    waits = 0
+    while header[counter] != start:
+        _backoff(waits, None)
+        waits += 1
+    header[counter] = start + count
+
+
+def _backoff(waits: int, deadline: Optional[float]) -> bool:
+    """等待一次：先让出 CPU，之后休眠时间逐步加倍；已超过 deadline 时返回 False"""
+    if deadline is not None and time.monotonic() >= deadline:
+        return False
+    time.sleep(0 if waits < _SPINS else min(_MAX_SLEEP, 1e-5 * 2 ** min(waits - _SPINS, 10)))
+    return True
@@ -0,0 +1,276 @@
+from enum import Enum
+from json.encoder import encode_basestring
+from operator import attrgetter, itemgetter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from main import PROTOCOL_VERSION, UnmannedAircraft
+from enums import *
+from capture import format_address
+from columns import location_columns, system_columns
+from filters import frames_array
+from records import ALL_FIELDS, FIELD_TYPES, MESSAGE_FIELDS, NULLABLE_FIELDS
+from view import iter_views
+
+CSV_FIELDS = ['received', 'address', 'message_type'] + ALL_FIELDS + ['messages']
+SOURCE_FIELDS = ['received', 'address']
+DEFAULT_CHUNK_SIZE = 1 << 16  # ChunkWriter 每次写出的字节数
+_CSV_SPECIAL = frozenset(',"\r\n')
+
+
+def _csv_string(value: str) -> str:
+    """按 csv 模块 QUOTE_MINIMAL 的规则输出字符串"""
+    if _CSV_SPECIAL.isdisjoint(value):
+        return value
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _json_number(value) -> str:
+    return 'null' if value is None else repr(value)
+
+
+def _csv_number(value) -> str:
+    return '' if value is None else repr(value)
+
+
+def _enum_names(enum_type: type, output_format: str) -> Dict[Enum, str]:
+    """枚举成员到输出文本的缓存表"""
+    if output_format == 'jsonl':
+        return {member: encode_basestring(member.name) for member in enum_type}
+    return {member: member.name for member in enum_type}
+
+
+class Template:
+    """一类报文的预编译输出模板
+
+    字段名、报文类型和分隔符在构造时拼成 % 格式串，数值字段用 %r（与 json.dumps 和 csv 模块的输出一致），
+    枚举和字符串字段先查表或转义，可以为 None 的数值字段在 JSON 中输出 null、在 CSV 中输出空单元格。
+    输出与 json.dumps(record, ensure_ascii=False) 和 csv.DictWriter 写出 records.to_record 的结果逐字节相同。
+    """
+
+    def __init__(self, message_type: MessageType, output_format: str = 'jsonl', source: bool = False):
+        if output_format not in ('jsonl', 'csv'):
+            raise ValueError(f"未知的输出格式: {output_format}")
+        self.message_type = message_type
+        self.output_format = output_format
+        self.source = source
+        self.names = MESSAGE_FIELDS[message_type]
+        self.keys = tuple((SOURCE_FIELDS if source else []) + ['message_type'] + self.names)
+        self._attrs = attrgetter(*self.names)
+        self._items = itemgetter(*self.names)
+        string = encode_basestring if output_format == 'jsonl' else _csv_string
+
+        # 各字段的 (序号, 从航空器取值时的转换, 从字典取值时的转换)，数值字段不需要转换
+        self._converters = []
+        for i, name in enumerate(self.names):
+            field_type = FIELD_TYPES[name]
+            if issubclass(field_type, Enum):
+                self._converters.append((i, _enum_names(field_type, output_format).__getitem__, string))
+            elif field_type is str:
+                self._converters.append((i, string, string))
+            elif name in NULLABLE_FIELDS:
+                number = _json_number if output_format == 'jsonl' else _csv_number
+                self._converters.append((i, number, number))
+        self._enum_tables = {}  # 枚举取值到输出文本的查找表，无效取值为 None
+        for name in self.names:
+            if issubclass(FIELD_TYPES[name], Enum):
+                table = self._enum_tables[name] = np.full(256, None, dtype=object)
+                for member, text in _enum_names(FIELD_TYPES[name], output_format).items():
+                    table[member.value] = text
+
+        placeholders = {name: '%s' if any(i == n for n, _, _ in self._converters) else '%r'
+                        for i, name in enumerate(self.names)}
+        if output_format == 'jsonl':
+            parts = [f'"{name}": %r' if name == 'received' else f'"{name}": %s' for name in SOURCE_FIELDS if source]
+            parts.append(f'"message_type": "{message_type.name}"')
+            parts += [f'"{name}": {placeholders[name]}' for name in self.names]
+            self.pattern = '{' + ', '.join(parts) + '}\n'
+        else:
+            cells = []
+            for name in CSV_FIELDS:
+                if name == 'message_type':
+                    cells.append(message_type.name)
+                elif name in placeholders:
+                    cells.append(placeholders[name])
+                elif source and name in SOURCE_FIELDS:
+                    cells.append('%r' if name == 'received' else '%s')
+                else:
+                    cells.append('')
+            self.pattern = ','.join(cells) + '\n'
+        self._address = string
+
+    def _source(self, received, address: str) -> tuple:
+        return (received, self._address(address)) if self.source else ()
+
+    def aircraft(self, ua: UnmannedAircraft, received: Optional[float] = None, address: Optional[str] = None) -> str:
+        """输出航空器中本类报文的字段"""
+        values = list(self._attrs(ua))
+        for i, convert, _ in self._converters:
+            values[i] = convert(values[i])
+        return self.pattern % (self._source(received, address) + tuple(values))
+
+    def record(self, record: Dict[str, Any]) -> str:
+        """输出 records.to_record 格式的字典（可带 received 和 address）"""
+        values = list(self._items(record))
+        for i, _, convert in self._converters:
+            values[i] = convert(values[i])
+        return self.pattern % (self._source(record.get('received'), record.get('address')) + tuple(values))
+
+    def columns(self, columns: Dict[str, np.ndarray], received=None, addresses: Optional[Sequence[str]] = None) -> List[str]:
+        """批量输出向量化解码的字段（枚举以取值表示），返回每行文本；枚举取值无效时抛出 ValueError"""
+        cells = []
+        for name in self.names:
+            column = np.asarray(columns[name])
+            table = self._enum_tables.get(name)
+            if table is not None:
+                column = table[column]
+                if any(value is None for value in column.tolist()):
+                    raise ValueError(f"无效的{name}")
+            cells.append(column.tolist())
+        count = len(cells[0]) if cells else 0
+        if self.source:
+            received = np.broadcast_to(np.asarray(received, dtype=np.float64), (count,)).tolist()
+            cells = [received, [self._address(address) for address in addresses]] + cells
+        pattern = self.pattern
+        return [pattern % row for row in zip(*cells)]
+
+
+class Serializer:
+    """解码结果的 JSON Lines / CSV 输出
+
+    每类报文的模板首次使用时编译并缓存。received 和 address 均未给出（或 address 为 None）时不输出来源字段，
+    CSV 的对应列为空。
+    """
+
+    def __init__(self, output_format: str = 'jsonl'):
+        if output_format not in ('jsonl', 'csv'):
+            raise ValueError(f"未知的输出格式: {output_format}")
+        self.output_format = output_format
+        self._templates: Dict[Tuple[MessageType, bool], Template] = {}
+
+    def template(self, message_type: MessageType, source: bool = False) -> Template:
+        template = self._templates.get((message_type, source))
+        if template is None:
+            template = self._templates[(message_type, source)] = Template(message_type, self.output_format, source)
+        return template
+
+    def header(self) -> str:
+        """CSV 表头行，JSON Lines 为空字符串"""
+        return ','.join(CSV_FIELDS) + '\n' if self.output_format == 'csv' else ''
+
+    def format_aircraft(self, ua: UnmannedAircraft, message_type: MessageType,
+                        received: Optional[float] = None, address: Optional[str] = None) -> str:
+        return self.template(message_type, address is not None).aircraft(ua, received, address)
+
+    def message_lines(self, data: bytes, received: Optional[float] = None, address: Optional[str] = None) -> List[str]:
+        """解码一个报文，返回每个（子）报文的输出行，打包报文会展开；无法解码时抛出 ValueError 或 NotImplementedError"""
+        lines = []
+        for view in iter_views(data):
+            ua = UnmannedAircraft()
+            ua.decode_message(bytes(view.buffer))
+            lines.append(self.format_aircraft(ua, view.message_type, received, address))
+        return lines
+
+    def format_message(self, data: bytes, received: Optional[float] = None, address: Optional[str] = None) -> str:
+        """解码一个报文并输出，打包报文每个子报文一行"""
+        return ''.join(self.message_lines(data, received, address))
+
+    def format_records(self, records: Sequence[Dict[str, Any]]) -> str:
+        """输出 records.decode_records 格式的字典"""
+        lines = []
+        for record in records:
+            template = self.template(MessageType[record['message_type']], 'address' in record)
+            if tuple(record) != template.keys:
+                raise ValueError(f"字段与{record['message_type']}报文不一致")
+            lines.append(template.record(record))
+        return ''.join(lines)
+
+    def format_frames(self, frames, received=None, addresses: Optional[Sequence[bytes]] = None) -> Tuple[str, int]:
+        """批量输出25字节报文（不含打包报文），返回 (文本, 无法解码的报文数)，输出顺序与输入一致
+
+        位置向量和系统报文向量化解码，其它报文逐个解码。addresses 为广播地址（字节），给出时输出来源字段。
+        """
+        frames = frames_array(frames)
+        count = len(frames)
+        source = addresses is not None
+        if source and len(addresses) != count:
+            raise ValueError("广播地址数量与报文数量不一致")
+        received = np.broadcast_to(np.asarray(0.0 if received is None else received, dtype=np.float64), (count,))
+        names = [format_address(address) for address in addresses] if source else None
+        lines: List[Optional[str]] = [None] * count
+        # 版本不兼容的标记为 -1，逐个解码并报错（先转为有符号类型，uint8 中 -1 会变为 255）
+        types = np.where((frames[:, 0] & 0x0F) <= PROTOCOL_VERSION, (frames[:, 0] >> 4).astype(np.int16), -1)
+        handled = np.zeros(count, dtype=bool)
+
+        for message_type, columns_of in ((MessageType.LOCATION, location_columns), (MessageType.SYSTEM, _system_fields)):
+            rows = np.flatnonzero(types == message_type.value)
+            if not len(rows):
+                continue
+            try:
+                texts = self.template(message_type, source).columns(
+                    columns_of(frames[rows]), received[rows], [names[i] for i in rows.tolist()] if source else None)
+            except ValueError:
+                continue  # 含无效取值时逐个解码，只跳过无效的报文
+            for row, text in zip(rows.tolist(), texts):
+                lines[row] = text
+            handled[rows] = True
+
+        errors = 0
+        for row in np.flatnonzero(~handled).tolist():
+            try:
+                lines[row] = self.format_message(frames[row].tobytes(), float(received[row]),
+                                                 names[row] if source else None)
+            except (ValueError, NotImplementedError):
+                errors += 1
+        return ''.join(line for line in lines if line is not None), errors
+
+
+def _system_fields(frames: np.ndarray) -> Dict[str, np.ndarray]:
+    """系统报文的全部记录字段（分类字段按等级分类归属地区拆分，与 UnmannedAircraft._decode_system 一致）"""
+    columns = system_columns(frames)
+    classification = columns['ua_classification']
+    default = UnmannedAircraft()
+    eu = columns['classification_type'] == ClassificationType.EUROPEAN_UNION.value
+    china = columns['classification_type'] == ClassificationType.CHINA.value
+    columns['eu_ua_category'] = np.where(eu, classification >> 4, default.eu_ua_category.value)
+    columns['eu_ua_class'] = np.where(eu, classification & 0x0F, default.eu_ua_class.value)
+    columns['china_ua_category'] = np.where(china, classification >> 4, default.china_ua_category.value)
+    columns['china_ua_class'] = np.where(china, classification & 0x0F, default.china_ua_class.value)
+    return columns
+
+
+class ChunkWriter:
+    """将文本编码后按块写入二进制文件或套接字，减少系统调用次数"""
+
+    def __init__(self, target, chunk_size: int = DEFAULT_CHUNK_SIZE, encoding: str = 'utf-8'):
+        self.target = target
+        self.chunk_size = chunk_size
+        self.encoding = encoding
+        self.written = 0  # 已写出的字节数
+        self._write = target.sendall if hasattr(target, 'sendall') else target.write
+        self._pending: List[bytes] = []
+        self._size = 0
+
+    def write(self, text: str) -> None:
+        data = text.encode(self.encoding)
+        self._pending.append(data)
+        self._size += len(data)
+        if self._size >= self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._pending:
+            data = b''.join(self._pending)
+            self._write(data)
+            self.written += len(data)
+            self._pending = []
+            self._size = 0
+        if hasattr(self.target, 'flush'):
+            self.target.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
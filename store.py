@@ -0,0 +1,101 @@
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Tuple
+
+from ids import IdTable
+from main import UnmannedAircraft
+
+
+@dataclass
+class Track:
+    """单架航空器的最新状态"""
+    aircraft: UnmannedAircraft = field(default_factory=UnmannedAircraft)
+    last_seen: float = 0.0  # 最近一次收到报文的时间（Unix时间戳）
+    message_count: int = 0  # 已收到的报文数量
+    id_handle: int = -1  # 识别码在识别码字典中的句柄，未启用识别码字典或尚未收到基本ID报文时为 -1
+
+
+class FleetState:
+    """多架航空器的最新状态，按广播地址区分航空器
+
+    同一架航空器的各类报文分别到达，按发送方广播地址合并到同一个 UnmannedAircraft。
+    所有方法都是线程安全的，解码线程写入、界面线程通过 drain 批量读取变化。
+    传入识别码字典 ids 时维护 Track.id_handle，并可用 find() 按识别码查找航空器。
+    """
+
+    def __init__(self, ids: Optional[IdTable] = None):
+        self.ids = ids
+        self._lock = threading.Lock()
+        self._tracks: Dict[bytes, Track] = {}
+        self._dirty: Dict[bytes, None] = {}  # 按首次变化顺序记录的已变化地址
+        self._addresses: Dict[int, bytes] = {}  # 识别码句柄 -> 广播地址
+        self._indexed: Dict[bytes, str] = {}  # 广播地址 -> 上次取句柄时的识别码（字典已满未得到句柄时也记录）
+
+    def update(self, address: bytes, data: bytes, received: Optional[float] = None) -> UnmannedAircraft:
+        """解码一个报文并合并到对应航空器的状态"""
+        if received is None:
+            received = time.time()
+        with self._lock:
+            track = self._tracks.get(address)
+            if track is None:
+                track = Track()
+                track.aircraft.decode_message(data)
+                self._tracks[address] = track  # 解码成功后才加入，格式错误的报文不会留下空的航空器
+            else:
+                track.aircraft.decode_message(data)
+            aircraft = track.aircraft
+            ids = self.ids
+            if ids is not None and aircraft.id and self._indexed.get(address) != aircraft.id:
+                self._index(address, track)
+            track.last_seen = received
+            track.message_count += 1
+            self._dirty[address] = None
+            return track.aircraft
+
+    def _index(self, address: bytes, track: Track) -> None:
+        if self._addresses.get(track.id_handle) == address:
+            del self._addresses[track.id_handle]
+        self._indexed[address] = track.aircraft.id
+        track.id_handle = self.ids.intern_text(track.aircraft.id)
+        if track.id_handle >= 0:
+            self._addresses[track.id_handle] = address
+
+    def find(self, uas_id: str) -> Optional[Tuple[bytes, Track]]:
+        """按识别码查找航空器，返回广播地址和状态副本；多个地址使用同一识别码时返回最近更新识别码的一个"""
+        if self.ids is None:
+            raise ValueError("未启用识别码字典")
+        handle = self.ids.find(uas_id)
+        with self._lock:
+            address = self._addresses.get(handle)
+            if address is None:
+                return None
+            track = self._tracks[address]
+            return address, replace(track, aircraft=replace(track.aircraft))
+
+    def get(self, address: bytes) -> Optional[Track]:
+        """返回航空器状态的副本"""
+        with self._lock:
+            track = self._tracks.get(address)
+            return None if track is None else replace(track, aircraft=replace(track.aircraft))
+
+    def drain(self) -> List[Tuple[bytes, Track]]:
+        """取出自上次调用以来发生变化的航空器状态副本"""
+        with self._lock:
+            changed = []
+            for address in self._dirty:
+                track = self._tracks[address]
+                changed.append((address, replace(track, aircraft=replace(track.aircraft))))
+            self._dirty.clear()
+        return changed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tracks.clear()
+            self._dirty.clear()
+            self._addresses.clear()
+            self._indexed.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._tracks)
@@ -1,6 +1,59 @@
+import asyncio
+import io
+import json
+import os
+import queue
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
+import unittest.mock
+from dataclasses import fields
+from datetime import datetime, timezone
+
+import numpy as np
+
+import main
 from main import UnmannedAircraft
 from enums import *
+from view import METERS_PER_DEGREE, SYSTEM_EPOCH, FrameView, iter_views
+import filters
+from store import FleetState
+from capture import CaptureWriter, iter_records
+from records import decode_records, encode_record
+import records
+import cli
+from daemon import DecodeClient, DecodeDaemon
+from batch import BatchDecoder, decode_batch
+from fleet import FleetStore
+from geofence import GeofenceEventType, GeofenceIndex, GeofenceMonitor, Zone
+from vlos import VLOSMonitor, Violation, haversine
+from conflict import ConflictDetector
+import generator
+from replay import Replayer
+from timestamps import TimestampUnwrapper, unwrap_timestamp, unwrap_timestamps
+from pack import DEFAULT_MESSAGES, PackBuffer, PackCache
+from serialize import CSV_FIELDS, ChunkWriter, Serializer
+from netrid import FlightIndex, NetRIDServer, flight_id
+from pipeline import BoundedQueue, OverflowPolicy, Pipeline, Stage, ingest_pipeline
+from history import History, HistorySink
+from ring import FrameRing, PackRing
+import tracing
+from ids import IdTable
+from changefeed import ChangeFeed
+from retention import Retention, Tier
+from heatmap import Heatmap
+
+try:
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtWidgets import QApplication
+    HAS_QT = True
+except ImportError:
+    HAS_QT = False
 
 class TestUnmannedAircraft(unittest.TestCase):
     """Unit tests for the UnmannedAircraft class"""
@@ -138,5 +191,1570 @@ class TestUnmannedAircraft(unittest.TestCase):
 
         self.assertEqual(ua, decoded_ua)
 
+def sample_aircraft() -> UnmannedAircraft:
+    """构造各字段均为非默认值的航空器"""
+    return UnmannedAircraft(
+        id="DRONE001",
+        id_type=IDType.SERIAL_NUMBER,
+        ua_type=UAType.MULTIROTOR,
+        operational_status=OperationalStatus.AIRBORNE,
+        height_type=HeightType.AGL,
+        direction=200,
+        horizontal_speed=15.0,
+        vertical_speed=-2.0,
+        latitude=39.9042,
+        longitude=116.4074,
+        pressure_altitude=100.0,
+        geodetic_altitude=101.5,
+        height=50.0,
+        geodetic_accuracy=VerticalAccuracy.WITHIN_3m,
+        horizontal_accuracy=HorizontalAccuracy.WITHIN_10m,
+        pressure_accuracy=VerticalAccuracy.WITHIN_10m,
+        speed_accuracy=SpeedAccuracy.WITHIN_1mps,
+        timestamp_accuracy=0.3,
+        description_type=DescriptionType.EMERGENCY_DESCRIPTION,
+        description="Test Drone",
+        classification_type=ClassificationType.CHINA,
+        operator_location_source_type=OperatorLocationSourceType.DYNAMIC,
+        operator_latitude=39.9,
+        operator_longitude=116.4,
+        area_count=5,
+        area_radius=100.0,
+        area_ceiling=120.0,
+        area_floor=10.0,
+        china_ua_category=ChinaUACategory.SPECIFIC,
+        china_ua_class=ChinaUAClass.LIGHT,
+        operator_altitude=20.0,
+        operator_id="+86 12345678900",
+    )
+
+class TestFrameView(unittest.TestCase):
+    """Unit tests for the lazy frame view"""
+
+    def test_fields_match_decoder(self):
+        """Test every field read through the view equals the decoded value"""
+        ua = sample_aircraft()
+        names = {f.name for f in fields(UnmannedAircraft)}
+        for message in (ua.encode_basic_id(), ua.encode_location(), ua.encode_self_id(),
+                        ua.encode_system(), ua.encode_operator_id()):
+            decoded_ua = UnmannedAircraft()
+            decoded_ua.decode_message(message)
+            expected = UnmannedAircraft()
+            view = FrameView(message)
+            for name in names:
+                try:
+                    value = getattr(view, name)
+                except ValueError:
+                    continue
+                setattr(expected, name, value)
+            self.assertEqual(expected, decoded_ua)
+
+    def test_wrong_message_type(self):
+        """Test reading a field of another message type raises"""
+        view = FrameView(sample_aircraft().encode_basic_id())
+        self.assertEqual(view.message_type, MessageType.BASIC_ID)
+        with self.assertRaises(ValueError):
+            view.latitude
+
+    def test_no_copy(self):
+        """Test the view reads through to the underlying buffer"""
+        ua = sample_aircraft()
+        buffer = bytearray(ua.encode_location() + ua.encode_location())
+        view = FrameView(buffer, 25)
+        self.assertAlmostEqual(view.latitude, 39.9042)
+        buffer[25 + 5:25 + 9] = (0).to_bytes(4, 'little')
+        self.assertEqual(view.latitude, 0.0)
+
+    def test_pack(self):
+        """Test iterating the views of a Pack message"""
+        ua = sample_aircraft()
+        pack_msg = ua.encode_pack([MessageType.BASIC_ID, MessageType.LOCATION])
+        views = list(iter_views(pack_msg))
+        self.assertEqual([v.message_type for v in views], [MessageType.BASIC_ID, MessageType.LOCATION])
+        self.assertEqual(views[0].id, "DRONE001")
+        self.assertAlmostEqual(views[1].longitude, 116.4074)
+
+class TestFilters(unittest.TestCase):
+    """Unit tests for the byte-level frame filters"""
+
+    def setUp(self):
+        self.frames = []
+        for i, (latitude, longitude) in enumerate([(39.9, 116.4), (31.2, 121.5), (39.95, 116.3)]):
+            ua = sample_aircraft()
+            ua.id = f"BJ{i:03d}" if latitude > 35 else f"SH{i:03d}"
+            ua.latitude, ua.longitude = latitude, longitude
+            self.frames.extend([ua.encode_basic_id(), ua.encode_location(), ua.encode_system()])
+
+    def test_message_type(self):
+        """Test filtering by message type nibble"""
+        mask = filters.message_type(MessageType.LOCATION).mask(self.frames)
+        self.assertEqual(mask.tolist(), [False, True, False] * 3)
+        mask = filters.message_type(MessageType.BASIC_ID, MessageType.SYSTEM).mask(self.frames)
+        self.assertEqual(mask.tolist(), [True, False, True] * 3)
+
+    def test_id_prefix(self):
+        """Test filtering Basic ID frames by ID prefix"""
+        selected = filters.id_prefix("BJ").select(self.frames)
+        self.assertEqual([FrameView(f).id for f in selected], ["BJ000", "BJ002"])
+
+    def test_bounding_box(self):
+        """Test filtering Location frames by bounding box"""
+        predicate = filters.bounding_box(39.8, 116.0, 40.0, 116.5) & ~filters.altitude_range(-1000, 0)
+        selected = predicate.select(b''.join(self.frames))
+        self.assertEqual([(FrameView(f).latitude, FrameView(f).longitude) for f in selected],
+                         [(39.9, 116.4), (39.95, 116.3)])
+        self.assertFalse(filters.bounding_box(39.8, 170.0, 40.0, -170.0).mask(self.frames).any())
+
+    def test_pack(self):
+        """Test Pack messages are expanded before filtering"""
+        pack_msg = sample_aircraft().encode_pack([MessageType.BASIC_ID, MessageType.LOCATION])
+        mask = filters.operational_status(OperationalStatus.AIRBORNE).mask([pack_msg])
+        self.assertEqual(mask.tolist(), [False, True])
+
+class TestCapture(unittest.TestCase):
+    """Unit tests for capture file reading and writing"""
+
+    def test_records(self):
+        """Test records round-trip with their receive time and address"""
+        ua = sample_aircraft()
+        stream = io.BytesIO()
+        writer = CaptureWriter(stream)
+        writer.write(ua.encode_basic_id(), b"\x02\x00\x00\x00\x00\x01", 1700000000.5)
+        writer.write(ua.encode_pack([MessageType.LOCATION, MessageType.SYSTEM]), b"\x02\x00\x00\x00\x00\x02", 1700000001.0)
+        stream.seek(0)
+        records = list(iter_records(stream, chunk_size=7))
+        self.assertEqual([(t, address[-1], len(data)) for t, address, data in records],
+                         [(1700000000.5, 1, 25), (1700000001.0, 2, 53)])
+
+    def test_raw_frames(self):
+        """Test raw concatenated frames are split using the Pack length"""
+        ua = sample_aircraft()
+        messages = [ua.encode_location(), ua.encode_pack([MessageType.BASIC_ID]), ua.encode_self_id()]
+        records = list(iter_records(io.BytesIO(b"".join(messages)), chunk_size=10))
+        self.assertEqual([data for _, _, data in records], messages)
+        with self.assertRaises(ValueError):
+            list(iter_records(io.BytesIO(b"".join(messages)[:-1])))
+
+class TestCli(unittest.TestCase):
+    """Unit tests for the streaming command-line tool"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_round_trip(self):
+        """Test raw frames decode to JSON lines / CSV and encode back to the same frames"""
+        # 固定编码时使用的时钟，系统报文的时间戳不会在两次编码之间跨过整秒
+        clock = unittest.mock.patch("main.datetime", wraps=datetime)
+        clock.start().now.return_value = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.addCleanup(clock.stop)
+        ua = sample_aircraft()
+        messages = [ua.encode_basic_id(), ua.encode_location(), ua.encode_self_id(),
+                    ua.encode_system(), ua.encode_operator_id(), b"\x6f" + bytes(24)] * 3
+        with open(self.path("in.bin"), "wb") as f:
+            f.write(b"".join(messages))
+
+        for output_format in ("jsonl", "csv"):
+            decoded = self.path(f"out.{output_format}")
+            self.assertEqual(cli.main(["decode", "-q", "-i", self.path("in.bin"), "-t", output_format, "-o", decoded]), 0)
+            self.assertEqual(cli.main(["encode", "-q", "-f", output_format, "-t", "raw", "-i", decoded, "-o", self.path("back.bin")]), 0)
+            with open(self.path("back.bin"), "rb") as f:
+                self.assertEqual(f.read(), b"".join(m for m in messages if m[0] != 0x6f))
+
+    def test_workers(self):
+        """Test parallel decoding keeps the input order"""
+        ua = sample_aircraft()
+        lines = []
+        for i in range(3 * cli.BATCH_SIZE // 2):
+            ua.latitude = i / 1e4
+            lines.append(ua.encode_location().hex() + "\n")
+        with open(self.path("in.hex"), "w") as f:
+            f.writelines(lines)
+
+        outputs = []
+        for workers in ("1", "2"):
+            output = self.path(f"out{workers}.jsonl")
+            cli.main(["decode", "-q", "-f", "hex", "-w", workers, "-i", self.path("in.hex"), "-o", output])
+            with open(output) as f:
+                outputs.append(f.read())
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertEqual(outputs[0].count("\n"), len(lines))
+
+    def test_bad_records_are_counted(self):
+        """Test unparsable lines and broken framing are counted as errors while good records still stream"""
+        with open(self.path("in.jsonl"), "w") as f:
+            f.write('{"message_type": "LOCATION", "latitude": 1}\nnot json\n')
+        stats = cli.Stats()
+        with open(self.path("in.jsonl"), "rb") as source, open(self.path("out.bin"), "wb") as target:
+            cli.encode(source, target, "jsonl", "raw", 1, stats)
+        self.assertEqual((stats.inputs, stats.outputs, stats.errors), (2, 1, 1))
+
+        good = sample_aircraft().encode_location()
+        with open(self.path("in.bin"), "wb") as f:
+            f.write(b"\xf2\x00\x00" + bytes(22) + good + b"\x12\x00\x00")
+        stats = cli.Stats()
+        with open(self.path("in.bin"), "rb") as source, open(self.path("out.jsonl"), "wb") as target:
+            cli.decode(source, target, "raw", "jsonl", 1, stats)
+        self.assertEqual((stats.inputs, stats.outputs, stats.errors), (3, 1, 2))
+        with open(self.path("out.jsonl")) as f:
+            self.assertEqual(json.loads(f.read())["message_type"], "LOCATION")
+
+@unittest.skipUnless(hasattr(os, "fork"), "requires fork")
+class TestDaemon(unittest.TestCase):
+    """Unit tests for the pre-forked decode daemon"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "decoder.sock")
+        self.process = subprocess.Popen([sys.executable, "-m", "daemon", "-s", self.path, "-w", "2"],
+                                        cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.addCleanup(self.process.wait)
+        self.addCleanup(self.process.terminate)
+        client = DecodeClient(self.path, timeout=10)
+        for _ in range(500):
+            if os.path.exists(self.path):
+                break
+            self.process.poll()
+            self.assertIsNone(self.process.returncode)
+            time.sleep(0.01)
+        self.client = client
+        self.addCleanup(client.close)
+
+    def test_decode(self):
+        """Test single-frame and batched requests over one reused connection"""
+        ua = sample_aircraft()
+        record = self.client.decode(ua.encode_basic_id())
+        self.assertEqual(record, [{"message_type": "BASIC_ID", "id_type": "SERIAL_NUMBER", "ua_type": "HELICOPTER", "id": "DRONE001"}])
+        connection = self.client._sock
+
+        results = self.client.decode_many([ua.encode_pack([MessageType.LOCATION, MessageType.SYSTEM]),
+                                           b"\x6f" + bytes(24), ua.encode_self_id()])
+        self.assertEqual([len(r) for r in results], [2, 1, 1])
+        self.assertIn("error", results[1])
+        self.assertEqual(results[2][0]["description"], "Test Drone")
+        self.assertIs(self.client._sock, connection)
+
+        with self.assertRaises(ValueError):
+            self.client.decode(b"\x6f" + bytes(24))
+
+    def test_timeout_resets_connection(self):
+        """Test a timed-out request drops its connection so no stale response is read later"""
+        path = self.path + ".silent"
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(server.close)
+        server.bind(path)
+        server.listen(1)
+        client = DecodeClient(path, timeout=0.05)
+        with self.assertRaises(socket.timeout):
+            client.decode(sample_aircraft().encode_basic_id())
+        self.assertIsNone(client._sock)
+
+    def test_refuses_to_remove_other_files(self):
+        """Test the daemon only replaces an existing socket, never a regular file"""
+        path = self.path + ".txt"
+        with open(path, "w") as f:
+            f.write("keep")
+        with self.assertRaises(ValueError):
+            DecodeDaemon(path).serve_forever()
+        with open(path) as f:
+            self.assertEqual(f.read(), "keep")
+
+class TestBatch(unittest.TestCase):
+    """Unit tests for the thread-pool batch decoder"""
+
+    def test_matches_sequential(self):
+        """Test concurrent decoding gives each frame its own, correctly ordered result"""
+        ua = sample_aircraft()
+        messages = []
+        for i in range(2000):
+            ua.latitude = i / 1e3
+            ua.id = f"DRONE{i}"
+            messages.append(ua.encode_location() if i % 2 else ua.encode_basic_id())
+        with BatchDecoder(workers=8, chunk_size=64) as decoder:
+            results = decoder.decode(messages)
+        for i, (message, result) in enumerate(zip(messages, results)):
+            expected = UnmannedAircraft()
+            expected.decode_message(message)
+            self.assertEqual(result, expected)
+
+    def test_errors(self):
+        """Test invalid frames raise or become None"""
+        messages = [sample_aircraft().encode_self_id(), b"\x6f" + bytes(24)]
+        with self.assertRaises(ValueError):
+            decode_batch(messages)
+        results = decode_batch(iter(messages), workers=2, skip_errors=True)
+        self.assertEqual(results[0].description, "Test Drone")
+        self.assertIsNone(results[1])
+
+class TestFleetStore(unittest.TestCase):
+    """Unit tests for the struct-of-arrays fleet store"""
+
+    def test_state_skips_bad_first_frame(self):
+        """Test a malformed first frame from a new address leaves no aircraft in FleetState"""
+        state = FleetState()
+        with self.assertRaises(ValueError):
+            state.update(b"A", b"\x6f" + bytes(24))
+        self.assertEqual((len(state), state.get(b"A"), state.drain()), (0, None, []))
+        state.update(b"A", sample_aircraft().encode_basic_id())
+        self.assertEqual(len(state), 1)
+
+    def test_update(self):
+        """Test per-frame updates land in the aircraft's row and materialise back"""
+        ua = sample_aircraft()
+        store = FleetStore(capacity=1)
+        for i in range(5):
+            store.update(bytes([2, 0, 0, 0, 0, i]), ua.encode_basic_id(), 100.0 + i)
+        slot = store.update(bytes([2, 0, 0, 0, 0, 3]), ua.encode_pack([MessageType.LOCATION, MessageType.SYSTEM]), 0.0)
+        self.assertEqual(slot, 3)
+        self.assertEqual(len(store), 5)
+        self.assertGreaterEqual(store.capacity, 5)
+
+        expected = UnmannedAircraft()
+        for message in (ua.encode_basic_id(), ua.encode_location(), ua.encode_system()):
+            expected.decode_message(message)
+        self.assertEqual(store.get(bytes([2, 0, 0, 0, 0, 3])), expected)
+
+        location = store.location()
+        self.assertAlmostEqual(location["latitude"][3], 39.9042)
+        self.assertEqual(location["received"][3], 0.0)
+        self.assertTrue(np.isnan(location["received"][0]))
+        self.assertEqual(store.ids()[4], b"DRONE001")
+        with self.assertRaises(ValueError):
+            store.update(bytes(6), b"\x6f" + bytes(24))
+
+    def test_update_many(self):
+        """Test vectorized updates keep the last frame per aircraft"""
+        ua = sample_aircraft()
+        addresses, frames = [], []
+        for i in range(300):
+            ua.latitude = i / 10
+            addresses.append(bytes([2, 0, 0, 0, 0, i % 100]))
+            frames.append(ua.encode_location())
+        store = FleetStore()
+        slots = store.update_many(addresses, frames, np.arange(300.0))
+        self.assertEqual(len(store), 100)
+        self.assertEqual(slots[250], 50)
+        location = store.location()
+        self.assertAlmostEqual(location["latitude"][50], 25.0)
+        self.assertEqual(location["received"][50], 250.0)
+
+class TestGeofence(unittest.TestCase):
+    """Unit tests for the geofence engine"""
+
+    def setUp(self):
+        # 凹多边形（L形）与一个带高度区间的矩形，均跨越多个网格单元
+        self.zones = [
+            Zone("L", [(0.0, 0.0), (0.0, 0.3), (0.1, 0.3), (0.1, 0.1), (0.3, 0.1), (0.3, 0.0)]),
+            Zone("box", [(0.05, 0.05), (0.05, 0.2), (0.2, 0.2), (0.2, 0.05)], floor=0.0, ceiling=120.0),
+        ]
+        self.index = GeofenceIndex(self.zones, cell_size=0.07)
+
+    def test_zones_at(self):
+        """Test point-in-polygon and altitude bands"""
+        self.assertEqual(self.index.zones_at(0.05, 0.25), [0])
+        self.assertEqual(self.index.zones_at(0.15, 0.15, 50.0), [1])
+        self.assertEqual(self.index.zones_at(0.08, 0.08, 50.0), [0, 1])
+        self.assertEqual(self.index.zones_at(0.08, 0.08, 500.0), [0])
+        self.assertEqual(self.index.zones_at(0.25, 0.25), [])
+
+    def test_contains_matches_scalar(self):
+        """Test the batch query agrees with per-point queries"""
+        rng = np.random.default_rng(0)
+        latitude = rng.uniform(-0.05, 0.35, 2000)
+        longitude = rng.uniform(-0.05, 0.35, 2000)
+        altitude = rng.choice([-1000.0, 50.0, 500.0], 2000)
+        points, zones = self.index.contains(latitude, longitude, altitude)
+        expected = [(i, z) for i in range(2000) for z in self.index.zones_at(latitude[i], longitude[i], altitude[i])]
+        self.assertEqual(list(zip(points.tolist(), zones.tolist())), expected)
+
+    def test_events(self):
+        """Test enter and exit events per aircraft"""
+        monitor = GeofenceMonitor(self.index)
+        ua = sample_aircraft()
+        ua.latitude, ua.longitude, ua.geodetic_altitude = 0.08, 0.08, 50.0
+        events = monitor.update_frame(b"A" * 6, ua.encode_pack([MessageType.BASIC_ID, MessageType.LOCATION]), 1.0)
+        self.assertEqual([(e.zone.name, e.event_type) for e in events],
+                         [("L", GeofenceEventType.ENTER), ("box", GeofenceEventType.ENTER)])
+        self.assertEqual(monitor.update(b"A" * 6, 0.08, 0.08, 50.0, 2.0), [])
+
+        ua.geodetic_altitude = 500.0
+        frames = [ua.encode_location(), ua.encode_basic_id(), ua.encode_location()]
+        events = monitor.update_frames([b"A" * 6, b"A" * 6, b"B" * 6], frames, 3.0)
+        self.assertEqual([(e.address, e.zone.name, e.event_type) for e in events],
+                         [(b"A" * 6, "box", GeofenceEventType.EXIT), (b"B" * 6, "L", GeofenceEventType.ENTER)])
+        self.assertEqual([z.name for z in monitor.inside(b"A" * 6)], ["L"])
+
+class TestVLOS(unittest.TestCase):
+    """Unit tests for the operator distance and VLOS monitor"""
+
+    def setUp(self):
+        self.ua = sample_aircraft()
+        self.ua.latitude, self.ua.longitude, self.ua.geodetic_altitude = 39.9042, 116.4074, 150.0
+        self.ua.operator_latitude, self.ua.operator_longitude, self.ua.operator_altitude = 39.9, 116.4074, 50.0
+        self.ua.area_radius, self.ua.area_ceiling, self.ua.area_floor = 1000.0, 200.0, 0.0
+
+    def test_haversine(self):
+        """Test great-circle distance against known values"""
+        np.testing.assert_allclose(haversine([0.0, 39.9], [0.0, 116.4074], [1.0, 39.9042], [0.0, 116.4074]),
+                                   [111195.08, 467.02], rtol=1e-5)
+
+    def test_join_and_flags(self):
+        """Test distance needs both messages and flags follow the declared area"""
+        monitor = VLOSMonitor(vlos_range=400.0)
+        monitor.update(b"A" * 6, self.ua.encode_location(), 1.0)
+        self.assertEqual(monitor.tick().tolist(), [])
+        self.assertTrue(np.isnan(monitor.get(b"A" * 6).distance))
+
+        monitor.update(b"A" * 6, self.ua.encode_system(), 1.0)
+        self.assertEqual(monitor.tick().tolist(), [0])
+        separation = monitor.get(b"A" * 6)
+        self.assertEqual(separation.violations, Violation.BEYOND_VLOS)
+        self.assertAlmostEqual(separation.horizontal, 467.02, places=1)
+        self.assertAlmostEqual(separation.distance, np.hypot(separation.horizontal, 100.0), places=6)
+
+        self.ua.area_radius, self.ua.area_ceiling = 300.0, 120.0
+        monitor.update(b"A" * 6, self.ua.encode_system(), 2.0)
+        monitor.tick()
+        self.assertEqual(monitor.get(b"A" * 6).violations,
+                         Violation.BEYOND_VLOS | Violation.OUTSIDE_AREA | Violation.ABOVE_CEILING)
+        monitor.vlos_range = 1000.0
+        self.assertEqual(monitor.refresh().tolist(), [0])
+        self.assertEqual(monitor.violating(Violation.BEYOND_VLOS), [])
+        self.assertEqual(monitor.violating(), [b"A" * 6])
+
+    def test_update_many_returns_changed(self):
+        """Test a tick only reports aircraft whose flags changed"""
+        monitor = VLOSMonitor()
+        addresses = [bytes([i]) * 6 for i in range(3)]
+        system = self.ua.encode_system()
+        near = self.ua.encode_location()
+        self.ua.latitude = 39.95
+        far = self.ua.encode_location()
+        monitor.update_many(addresses * 2, [system] * 3 + [near, far, far], 1.0)
+        self.assertEqual(monitor.tick().tolist(), [1, 2])
+        monitor.update_many(addresses[:2], [far, near], 2.0)
+        monitor.update(addresses[2], far, 2.0)
+        self.assertEqual(monitor.tick().tolist(), [0, 1])
+        self.assertEqual(monitor.tick().tolist(), [])
+        np.testing.assert_array_equal(monitor.violations() > 0, [True, False, True])
+
+class TestConflict(unittest.TestCase):
+    """Unit tests for dead reckoning and conflict detection"""
+
+    def setUp(self):
+        self.ua = sample_aircraft()
+        self.ua.latitude, self.ua.longitude, self.ua.geodetic_altitude = 40.0, 116.0, 100.0
+        self.ua.direction, self.ua.horizontal_speed, self.ua.vertical_speed = 90, 10.0, 0.0
+        self.east_600m = 600 / (METERS_PER_DEGREE * np.cos(np.radians(40.0)))
+
+    def test_positions(self):
+        """Test positions are extrapolated from direction and speeds"""
+        detector = ConflictDetector()
+        self.ua.vertical_speed = 2.0
+        detector.update(b"A" * 6, self.ua.encode_location(), 100.0)
+        positions = detector.positions(110.0)
+        self.assertAlmostEqual(positions["latitude"][0], 40.0, places=6)
+        self.assertAlmostEqual(positions["longitude"][0], 116.0 + self.east_600m / 6, places=6)
+        self.assertAlmostEqual(positions["altitude"][0], 120.0)
+
+    def test_head_on_conflict(self):
+        """Test a head-on pair conflicts, and vertical separation clears it"""
+        detector = ConflictDetector(horizontal_separation=150.0, vertical_separation=30.0, look_ahead=30.0)
+        detector.update(b"A" * 6, self.ua.encode_location(), 0.0)
+        self.ua.longitude, self.ua.direction = 116.0 + self.east_600m, 270
+        detector.update(b"B" * 6, self.ua.encode_location(), 0.0)
+
+        conflicts = detector.tick(1.0)
+        self.assertEqual([(c.first, c.second) for c in conflicts], [(b"A" * 6, b"B" * 6)])
+        self.assertAlmostEqual(conflicts[0].start, 22.5, places=2)
+        self.assertAlmostEqual(conflicts[0].end, 37.5, places=2)
+        self.assertEqual(len(detector.tick(2.0)), 1)
+        self.assertEqual(detector.pairs_tested, 0)
+
+        self.ua.geodetic_altitude = 200.0
+        detector.update(b"B" * 6, self.ua.encode_location(), 3.0)
+        self.assertEqual(detector.tick(3.0), [])
+        self.assertEqual(detector.pairs_tested, 1)
+
+    def test_matches_brute_force(self):
+        """Test the spatial hash finds the same pairs as checking every pair"""
+        rng = np.random.default_rng(1)
+        frames = []
+        for _ in range(300):
+            self.ua.latitude, self.ua.longitude = 40 + rng.uniform(0, 0.05), 116 + rng.uniform(0, 0.05)
+            self.ua.geodetic_altitude = float(rng.choice([-1000.0, 100.0, 120.0]))
+            self.ua.direction, self.ua.horizontal_speed = int(rng.integers(0, 360)), float(rng.uniform(0, 30))
+            frames.append(self.ua.encode_location())
+        addresses = [i.to_bytes(6, "big") for i in range(300)]
+        received = rng.uniform(0, 3, 300)
+
+        detector = ConflictDetector(look_ahead=20.0, max_age=5.0)
+        detector.update_many(addresses, frames, received)
+        brute = ConflictDetector(look_ahead=20.0, max_age=5.0, cell_size=1e7)
+        brute.update_many(addresses, frames, received)
+        expected = [(c.first, c.second) for c in brute.tick(4.0)]
+        self.assertEqual([(c.first, c.second) for c in detector.tick(4.0)], expected)
+        self.assertGreater(len(expected), 0)
+        self.assertLess(detector.pairs_tested, brute.pairs_tested // 4)
+
+class TestGenerator(unittest.TestCase):
+    """Unit tests for the synthetic fleet load generator"""
+
+    def test_encode_locations_matches_encoder(self):
+        """Test the batch location encoder produces the same bytes as encode_location"""
+        ua = sample_aircraft()
+        for direction, speed, vertical_speed in [(0, 0.0, 0.0), (200, 63.75, -4.5), (359, 100.0, 12.0), (90, 254.25, 62.0)]:
+            ua.direction, ua.horizontal_speed, ua.vertical_speed = direction, speed, vertical_speed
+            expected = ua.encode_location()
+            columns = {name: np.array([getattr(ua, name).value if hasattr(getattr(ua, name), "value") else getattr(ua, name)])
+                       for name in ["operational_status", "height_type", "direction", "horizontal_speed",
+                                    "vertical_speed", "latitude", "longitude", "pressure_altitude",
+                                    "geodetic_altitude", "height", "geodetic_accuracy", "horizontal_accuracy",
+                                    "pressure_accuracy", "speed_accuracy", "timestamp_accuracy"]}
+            timestamp = np.frombuffer(expected[21:23], dtype="<u2")
+            self.assertEqual(generator.encode_locations(columns, timestamp).tobytes(), expected)
+
+    def test_batch_mix(self):
+        """Test batches cover every message type and count malformed frames"""
+        simulator = generator.FleetSimulator(50, seed=1, start=1.7e9)
+        load = generator.LoadGenerator(simulator, malformed=0.05, seed=2)
+        records, bad = load.batch(1000, 1.7e9 + 1)
+        self.assertEqual(len(records), 1000)
+        self.assertGreater(bad, 0)
+        types, errors = set(), 0
+        for _, address, data in records:
+            self.assertIn(address, simulator.addresses)
+            try:
+                types.update(record["message_type"] for record in decode_records(data))
+            except (ValueError, NotImplementedError):
+                errors += 1
+        self.assertEqual(types, {"BASIC_ID", "LOCATION", "SELF_ID", "SYSTEM", "OPERATOR_ID"})
+        self.assertLessEqual(errors, bad)
+        self.assertTrue(any(data[0] >> 4 == MessageType.PACK.value for _, _, data in records))
+
+    def test_rate_and_capture_output(self):
+        """Test the generator paces to the target rate and writes a readable capture"""
+        sink = generator.QueueSink(queue.Queue())
+        load = generator.LoadGenerator(generator.FleetSimulator(20, seed=1), rate=2000.0)
+        stats = load.run(sink, duration=0.3)
+        self.assertEqual(sink.queue.qsize(), stats.sent)
+        self.assertGreater(stats.sent, 0)
+        self.assertLessEqual(stats.achieved, 2300.0)  # 限速只保证不超过目标速率，负载较高时可能更慢
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "load.ridcap")
+            self.assertEqual(generator.main(["-n", "10", "-c", "300", "-o", path, "-q", "-s", "1"]), 0)
+            with open(path, "rb") as f:
+                self.assertEqual(len(list(iter_records(f))), 300)
+
+class TestReplay(unittest.TestCase):
+    """Unit tests for timed capture replay"""
+
+    def setUp(self):
+        frame = sample_aircraft().encode_location()
+        # 乱序写入，回放时应按接收时间排序
+        self.records = [(1000.0 + i * 0.01, bytes([i]) * 6, frame) for i in range(50)]
+        self.records.reverse()
+
+    def test_pacing_and_speed(self):
+        """Test replay keeps the original gaps, scaled by the speed factor, and never sends early"""
+        for speed, duration in [(1.0, 0.49), (10.0, 0.049)]:
+            sink = generator.QueueSink(queue.Queue())
+            replayer = Replayer(self.records, speed=speed)
+            start = time.monotonic()
+            stats = replayer.run(sink)
+            # 只检查下限：负载较高时可能晚发，但不会早于计划时刻（同一批内最多提前 batch_window）
+            self.assertGreaterEqual(time.monotonic() - start, duration - replayer.batch_window)
+            self.assertGreaterEqual(stats.errors.min(), -replayer.batch_window)
+            self.assertEqual(stats.sent, 50)
+        self.assertEqual([sink.queue.get()[1] for _ in range(50)], [bytes([i]) * 6 for i in range(50)])
+
+        stats = Replayer(self.records, speed=None).run(generator.QueueSink(queue.Queue()))
+        self.assertEqual((stats.sent, stats.batches), (50, 1))
+
+    def test_seek_and_pause(self):
+        """Test seeking skips earlier frames and pausing stretches the replay"""
+        replayer = Replayer(self.records)
+        replayer.seek(0.3)
+        self.assertAlmostEqual(replayer.position, 0.3)
+        sink = generator.QueueSink(queue.Queue())
+        self.assertEqual(replayer.run(sink).sent, 20)
+        self.assertEqual(sink.queue.get()[1], bytes([30]) * 6)
+
+        replayer = Replayer(self.records)
+        replayer.pause()
+        sink = generator.QueueSink(queue.Queue())
+        results = []
+        runner = threading.Thread(target=lambda: results.append(replayer.run(sink)))
+        runner.start()
+        time.sleep(0.05)
+        self.assertTrue(sink.queue.empty())  # 暂停期间不发送
+        replayer.resume()
+        runner.join(10)
+        self.assertEqual(results[0].sent, 50)
+        self.assertGreaterEqual(results[0].errors.min(), -replayer.batch_window)
+
+class TestPipeline(unittest.TestCase):
+    """Unit tests for the bounded staged pipeline"""
+
+    def test_overflow_policies(self):
+        """Test each overflow policy keeps the queue bounded and counts drops"""
+        expected = {
+            OverflowPolicy.DROP_OLDEST: (8, [5, 6, 7]),
+            OverflowPolicy.DROP_NEWEST: (3, [0, 1, 2]),
+            OverflowPolicy.SAMPLE: (5, [2, 4, 6]),
+        }
+        for policy, (accepted, items) in expected.items():
+            q = BoundedQueue(3, policy, sample_every=2)
+            self.assertEqual(q.put_many(range(8)), accepted)
+            self.assertEqual((q.get_batch(10), q.dropped, q.max_depth), (items, 5, 3))
+
+        q = BoundedQueue(2)
+        events = []
+        threading.Timer(0.05, lambda: (events.append("get"), q.get_batch(1))).start()
+        self.assertEqual(q.put_many(range(3)), 3)
+        events.append("put")
+        self.assertEqual(events, ["get", "put"])  # 队列满时阻塞到消费者取走数据
+        q.close()
+        self.assertEqual(q.get_batch(10), [1, 2])
+        self.assertEqual(q.get_batch(10), [])
+        self.assertRaises(ValueError, q.put, 3)
+
+    def test_backpressure(self):
+        """Test a blocking pipeline delivers every item and counts errors"""
+        out = []
+
+        def slow(x):
+            time.sleep(0.0001)
+            out.append(x)
+
+        def half(x):
+            if x % 10 == 9:
+                raise ValueError(x)
+            return x // 2
+
+        with Pipeline([Stage("half", half, workers=2, capacity=8, batch_size=4),
+                       Stage("out", slow, capacity=8, batch_size=4)]) as p:
+            self.assertEqual(p.feed(range(300), 16), 300)
+        metrics = p.metrics()
+        self.assertEqual(sorted(out), sorted(x // 2 for x in range(300) if x % 10 != 9))
+        self.assertEqual((metrics["half"].processed, metrics["half"].errors), (300, 30))
+        self.assertLessEqual(max(m.max_depth for m in metrics.values()), 8)
+        self.assertEqual(sum(m.dropped for m in metrics.values()), 0)
+
+    def test_ingest(self):
+        """Test the ingest pipeline updates the store while a stalled sink drops"""
+        store = FleetStore()
+        gate = threading.Event()
+        simulator = generator.FleetSimulator(20, seed=1, start=1.7e9)
+        records, bad = generator.LoadGenerator(simulator, malformed=0.05, seed=1).batch(2000, 1.7e9)
+        with ingest_pipeline(store, lambda item: gate.wait(), capacity=64) as p:
+            self.assertEqual(p.feed(records), 2000)
+            # 输出端停顿时状态表照常更新
+            deadline = time.monotonic() + 30
+            try:
+                while p.metrics()["track"].processed < 2000 - p.metrics()["decode"].errors:
+                    self.assertLess(time.monotonic(), deadline)
+                    time.sleep(0.01)
+            finally:
+                gate.set()
+        metrics = p.metrics()
+        self.assertEqual(len(store), 20)
+        # 损坏的报文仍可能恰好可以解码
+        self.assertTrue(0 < metrics["decode"].errors <= bad)
+        self.assertLessEqual(metrics["sink"].max_depth, 64)
+        self.assertEqual(metrics["sink"].processed + metrics["sink"].dropped,
+                         metrics["track"].processed - metrics["track"].errors)
+        self.assertGreater(metrics["sink"].dropped, 0)
+
+class TestTimestamps(unittest.TestCase):
+    """Unit tests for Location timestamp round trip and hour-wrap unwrapping"""
+
+    HOUR = 1700002800.0  # 整点
+
+    def test_round_trip(self):
+        """Test the encoder writes an explicit timestamp and the decoder keeps it"""
+        ua = sample_aircraft()
+        ua.timestamp = 12345
+        decoded = UnmannedAircraft()
+        decoded.decode_message(ua.encode_location())
+        self.assertEqual(decoded.timestamp, 12345)
+        self.assertEqual(decode_records(ua.encode_location())[0]["timestamp"], 12345)
+        self.assertEqual(encode_record(decode_records(ua.encode_location())[0]), ua.encode_location())
+        ua.timestamp = 36000
+        self.assertRaises(ValueError, ua.encode_location)
+
+    def test_unwrap_across_hour(self):
+        """Test timestamps on both sides of the hour unwrap to continuous absolute times"""
+        timestamps = [35990, 35995, 0, 5, 10]
+        received = [self.HOUR + offset for offset in (-0.7, -0.2, 0.3, 0.8, 1.3)]
+        expected = [self.HOUR + offset for offset in (-1.0, -0.5, 0.0, 0.5, 1.0)]
+        self.assertEqual([unwrap_timestamp(ts, r) for ts, r in zip(timestamps, received)], expected)
+        np.testing.assert_array_equal(unwrap_timestamps(timestamps, received), expected)
+        self.assertTrue(np.isnan(unwrap_timestamps([36000], self.HOUR)[0]))
+
+    def test_stream_state(self):
+        """Test per-aircraft state keeps a skewed clock from flipping hours under jitter"""
+        rng = np.random.default_rng(0)
+        address = b"\x02" + bytes(5)
+        # 航空器时钟比接收端快29分55秒，接收时间抖动±10秒
+        actual = self.HOUR + np.arange(0, 600, 0.5)
+        timestamps = np.round((actual % 3600) * 10).astype(np.int64) % 36000
+        received = actual - 1795 + rng.uniform(-10, 10, len(actual))
+        received[0] = actual[0] - 1795
+
+        stateless = unwrap_timestamps(timestamps, received)
+        self.assertGreater(np.abs(stateless - actual).max(), 3000)
+
+        unwrapper = TimestampUnwrapper()
+        np.testing.assert_allclose([unwrapper.update(address, int(ts), r) for ts, r in zip(timestamps, received)], actual)
+
+        unwrapper = TimestampUnwrapper()
+        unwrapper.update(address, int(timestamps[0]), received[0])
+        np.testing.assert_allclose(unwrapper.update_many([address] * 100, timestamps[:100], received[:100]),
+                                   actual[:100])
+        ua = sample_aircraft()
+        frames = []
+        for ts in timestamps[100:200].tolist():
+            ua.timestamp = ts
+            frames.append(ua.encode_location())
+        frames[0] = ua.encode_basic_id()
+        result = unwrapper.update_frames([address] * 100, frames, received[100:200])
+        self.assertTrue(np.isnan(result[0]))
+        np.testing.assert_allclose(result[1:], actual[101:200])
+
+class TestPack(unittest.TestCase):
+    """Unit tests for persistent in-place Message Pack buffers"""
+
+    def expected(self, ua, now):
+        """encode_pack output with the System timestamp set to `now`"""
+        data = bytearray(ua.encode_pack(DEFAULT_MESSAGES))
+        struct.pack_into("<I", data, 3 + 3 * 25 + 20, int(now) - SYSTEM_EPOCH)
+        return bytes(data)
+
+    def test_update_in_place(self):
+        """Test updates patch Location and System timestamp without reallocating"""
+        ua = sample_aircraft()
+        ua.timestamp = 600
+        pack = PackBuffer(ua)
+        buffer = pack.buffer
+        self.assertEqual(pack.offsets[MessageType.LOCATION], [28])
+        for i in range(3):
+            ua.latitude, ua.timestamp, now = 30 + i / 1000, 600 + i, 1.7e9 + i
+            self.assertIs(pack.update(now), buffer)
+            self.assertEqual(bytes(buffer), self.expected(ua, now))
+
+        decoded = UnmannedAircraft()
+        decoded.decode_message(bytes(buffer))
+        self.assertEqual((decoded.latitude, decoded.timestamp, decoded.id), (30.002, 602, ua.id))
+
+    def test_timestamps_follow_now(self):
+        """Test Location and System timestamps both come from `now` when the aircraft has none"""
+        ua = sample_aircraft()
+        ua.timestamp = None
+        pack = PackBuffer(ua)
+        now = 1699999200.0 + 12 * 60 + 34.56  # 整点后12分34.56秒
+        decoded = UnmannedAircraft()
+        decoded.decode_message(bytes(pack.update(now)))
+        self.assertEqual(decoded.timestamp, 7545)
+        self.assertEqual(struct.unpack_from("<I", pack.buffer, 3 + 3 * 25 + 20)[0], int(now) - SYSTEM_EPOCH)
+
+    def test_cache(self):
+        """Test the cache creates buffers per address and rebuilds static fields on demand"""
+        cache = PackCache()
+        ua = sample_aircraft()
+        ua.timestamp = 0
+        address = b"\x02" + bytes(5)
+        first = cache.pack(address, ua, 1.7e9)
+        ua.id = "RENAMED"
+        self.assertEqual(bytes(cache.pack(address, ua, 1.7e9)), bytes(first))
+        cache.invalidate(address)
+        self.assertIs(cache.pack(address, ua, 1.7e9), first)
+        self.assertEqual(bytes(first), self.expected(ua, 1.7e9))
+        self.assertEqual(len(cache), 1)
+
+class TestSerialize(unittest.TestCase):
+    """Unit tests for the template-based NDJSON/CSV serializer"""
+
+    def messages(self):
+        ua = sample_aircraft()
+        ua.description = 'say "hi", then\nleave'
+        return [ua.encode_basic_id(), ua.encode_location(), ua.encode_self_id(), ua.encode_system(),
+                ua.encode_operator_id(), ua.encode_pack([MessageType.BASIC_ID, MessageType.LOCATION])]
+
+    def test_matches_json_and_csv(self):
+        """Test output is byte-identical to json.dumps and csv.DictWriter"""
+        import csv
+        for data in self.messages():
+            for source in ({}, {"received": 1700000000.25, "address": "02:00:00:00:00:01"}):
+                records = [{**source, **record} for record in decode_records(data)]
+                expected = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+                self.assertEqual(Serializer("jsonl").format_records(records), expected)
+                self.assertEqual(Serializer("jsonl").format_message(data, source.get("received"), source.get("address")),
+                                 expected)
+                buffer = io.StringIO()
+                csv.DictWriter(buffer, fieldnames=CSV_FIELDS, lineterminator="\n").writerows(records)
+                self.assertEqual(Serializer("csv").format_records(records), buffer.getvalue())
+
+    def test_none_fields_round_trip(self):
+        """Test fields that are None are written as JSON null and empty CSV cells"""
+        import csv
+        ua = UnmannedAircraft(latitude=1.5)
+        record = records.to_record(ua, MessageType.LOCATION)
+        self.assertIsNone(record["timestamp"])
+        line = Serializer("jsonl").format_aircraft(ua, MessageType.LOCATION)
+        self.assertEqual(line, json.dumps(record, ensure_ascii=False) + "\n")
+        self.assertEqual(json.loads(line), record)
+        text = Serializer("csv").header() + Serializer("csv").format_aircraft(ua, MessageType.LOCATION)
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDS, lineterminator="\n")
+        writer.writeheader()
+        writer.writerow(record)
+        self.assertEqual(text, buffer.getvalue())
+        row = next(csv.DictReader(io.StringIO(text)))
+        self.assertEqual((row["timestamp"], row["latitude"]), ("", "1.5"))
+
+    def test_frames_and_writer(self):
+        """Test batch frame output keeps input order, skips bad frames and writes in chunks"""
+        serializer = Serializer("jsonl")
+        frames = [data for data in self.messages() if data[0] >> 4 != 0xF] + [b"\x1f" + bytes(24)]
+        addresses = [bytes([2, 0, 0, 0, 0, i]) for i in range(len(frames))]
+        text, errors = serializer.format_frames(frames, 1700000000.0, addresses)
+        self.assertEqual(errors, 1)
+        self.assertEqual(text, "".join(serializer.format_message(data, 1700000000.0, "02:00:00:00:00:%02X" % i)
+                                       for i, data in enumerate(frames[:-1])))
+
+        stream = io.BytesIO()
+        with ChunkWriter(stream, chunk_size=1000) as writer:
+            for _ in range(10):
+                writer.write(text)
+                self.assertLess(writer._size, 1000)
+        self.assertEqual(stream.getvalue(), text.encode() * 10)
+
+class TestNetRID(unittest.TestCase):
+    """Unit tests for the Network Remote ID style HTTP bridge"""
+
+    def setUp(self):
+        self.index = FlightIndex(tile_size=0.01, ttl=10.0)
+        self.now = 1700000000.0
+        for i in range(4):
+            ua = sample_aircraft()
+            ua.id, ua.operator_id = f"DRONE{i}", "OPERATOR001"
+            ua.latitude, ua.longitude = 30.0 + i * 0.004, 120.0
+            self.index.update(bytes([2, 0, 0, 0, 0, i]), ua.encode_pack(
+                [MessageType.BASIC_ID, MessageType.LOCATION, MessageType.SYSTEM, MessageType.OPERATOR_ID]), self.now)
+
+    def test_area_query_and_cache(self):
+        """Test area queries use per-tile caches that Location frames invalidate"""
+        flights = [json.loads(text) for text in self.index.flights(29.999, 119.999, 30.005, 120.001, self.now)]
+        self.assertEqual([flight["id"] for flight in sorted(flights, key=lambda f: f["id"])],
+                         ["020000000000", "020000000001"])
+        self.assertEqual(flights[0]["current_state"]["position"]["lng"], 120.0)
+        misses = self.index.misses
+        self.index.flights(29.999, 119.999, 30.005, 120.001, self.now + 1)
+        self.assertEqual((self.index.misses, self.index.hits), (misses, misses))
+
+        ua = sample_aircraft()
+        ua.latitude, ua.longitude = 31.0, 121.0
+        self.index.update(bytes([2, 0, 0, 0, 0, 0]), ua.encode_location(), self.now + 2)
+        self.assertEqual(len(self.index.flights(29.999, 119.999, 30.005, 120.001, self.now + 2)), 1)
+        self.assertEqual(len(self.index.flights(30.99, 120.99, 31.01, 121.01, self.now + 2)), 1)
+        self.assertEqual(len(self.index.flights(29.999, 119.999, 30.02, 120.001, self.now + 100)), 0)
+
+    def test_http(self):
+        """Test the asyncio server answers area, details and error requests over keep-alive"""
+        server = NetRIDServer(self.index, port=0)
+
+        async def request(reader, writer, target):
+            writer.write(f"GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            while (line := await reader.readline()) != b"\r\n":
+                name, _, value = line.decode().partition(":")
+                if name.lower() == "content-length":
+                    length = int(value)
+            return status, json.loads(await reader.readexactly(length))
+
+        async def run():
+            await server.start()
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            results = [await request(reader, writer, target) for target in (
+                "/flights?view=30.005,120.001,29.999,119.999",
+                f"/flights/{flight_id(bytes([2, 0, 0, 0, 0, 3]))}/details",
+                "/flights/020000000009/details",
+                "/flights?view=29,119,31,121",
+                "/flights?view=oops")]
+            writer.close()
+            await writer.wait_closed()
+            await server.close()
+            return results
+
+        with unittest.mock.patch("time.time", return_value=self.now):
+            results = asyncio.run(run())
+        self.assertEqual([status for status, _ in results], [200, 200, 404, 413, 400])
+        self.assertEqual(len(results[0][1]["flights"]), 2)
+        details = results[1][1]["details"]
+        self.assertEqual((details["uas_id"], details["operator_id"]), ({"serial_number": "DRONE3"}, "OPERATOR001"))
+        self.assertEqual(server.requests, 5)
+
+class TestHistory(unittest.TestCase):
+    """Unit tests for the batched SQLite history sink"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "history.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_write_and_query(self):
+        """Test single and packed writes are batched, unwrapped and queryable"""
+        address = bytes([2, 0, 0, 0, 0, 1])
+        received = 1700000000.0  # 整点后 800 秒
+        with HistorySink(self.path, batch_size=5, flush_interval=3600) as sink:
+            for i in range(3):
+                ua = sample_aircraft()
+                ua.latitude, ua.timestamp = 30.0 + i / 1000, 8000 + i * 10
+                sink.write(address, ua.encode_location(), received + i)
+            self.assertEqual((sink.commits, len(sink)), (0, 4))
+            sink.write(address, sample_aircraft().encode_pack([MessageType.BASIC_ID, MessageType.SYSTEM]), received)
+            self.assertEqual((sink.commits, len(sink)), (1, 1))
+            with self.assertRaises(ValueError):
+                sink.write(address, b"\x1f" + bytes(24))
+        self.assertEqual((sink.commits, sink.rows), (2, 7))  # 含 aircraft 表的插入和更新
+
+        with History(self.path) as history:
+            self.assertEqual(history.find(sample_aircraft().id), [address])
+            track = history.track(address, received, received + 1.5)
+            self.assertEqual([row[:2] for row in track], [(received, 30.0), (received + 1, 30.001)])
+            self.assertEqual(history.latest(address)[:5], (1, received + 2, received + 2, 2, 30.002))
+            self.assertEqual(history.active(received - 10, received + 10), [address])
+            self.assertEqual(history.messages(address, MessageType.SYSTEM),
+                             [(received, sample_aircraft().encode_system())])
+
+    def test_write_many(self):
+        """Test batch writes match per-frame writes"""
+        simulator = generator.FleetSimulator(50, seed=1, start=1.7e9)
+        rows = np.arange(50)
+        frames = np.concatenate([simulator.location_frames(rows),
+                                 filters.frames_array([sample_aircraft().encode_basic_id()] * 50)])
+        addresses = simulator.addresses * 2
+        batch_path = os.path.join(self.directory.name, "batch.db")
+        with HistorySink(batch_path) as sink:
+            sink.write_many(addresses, frames, 1.7e9)
+        with HistorySink(self.path) as sink:
+            for address, data in zip(addresses, frames):
+                sink.write(address, data.tobytes(), 1.7e9)
+        with History(batch_path) as batch, History(self.path) as single:
+            for query in ("SELECT * FROM locations ORDER BY aircraft", "SELECT * FROM messages ORDER BY aircraft",
+                          "SELECT * FROM aircraft"):
+                self.assertEqual(batch.connection.execute(query).fetchall(),
+                                 single.connection.execute(query).fetchall())
+            self.assertEqual(len(batch.active(1.7e9 - 3600, 1.7e9 + 3600)), 50)
+
+    def test_write_many_rejects_like_write(self):
+        """Test batch writes reject the frame types and versions that single writes reject"""
+        address = bytes([2, 0, 0, 0, 0, 1])
+        good = sample_aircraft().encode_basic_id()
+        with HistorySink(self.path) as sink:
+            for bad in (b"\x22" + bytes(24), b"\x73" + bytes(24), b"\xf2" + bytes(24), b"\x13" + good[1:]):
+                with self.assertRaises(ValueError):
+                    sink.write_many([address, address], [good, bad])
+            self.assertEqual(len(sink), 0)  # 整批不写入，也不分配航空器编号
+
+def ring_producer(ring: FrameRing, frames: np.ndarray) -> None:
+    """子进程：分批写入报文"""
+    for i in range(0, len(frames), 100):
+        ring.put_many(frames[i:i + 100])
+
+
+def ring_consumer(ring: FrameRing, results) -> None:
+    """子进程：零复制解码位置向量报文，返回 (报文数, 纬度之和)"""
+    from columns import location_columns
+    count, total = 0, 0.0
+    for batch in ring.batches(64):
+        count += len(batch)
+        total += float(location_columns(batch.frames)["latitude"].sum())
+    results.put((count, total))
+
+
+class TestRing(unittest.TestCase):
+    """Unit tests for the shared-memory frame ring buffer"""
+
+    def test_bad_length_does_not_wedge(self):
+        """Test a rejected frame claims no slot, so later writes still commit"""
+        with FrameRing(4) as ring:
+            with self.assertRaises(ValueError):
+                ring.put(b"short")
+            with self.assertRaises(ValueError):
+                ring.put_many([bytes(25), b"short"])
+            self.assertTrue(ring.put(bytes(25), timeout=1))
+            self.assertEqual(len(ring), 1)
+
+    def test_close_wakes_full_claim(self):
+        """Test a producer waiting on a full ring gives up when the ring is closed"""
+        with FrameRing(1) as ring:
+            ring.put(bytes(25))
+            timer = threading.Timer(0.05, ring.close)
+            timer.start()
+            self.addCleanup(timer.join)
+            with self.assertRaises(ValueError):
+                ring.claim(1, timeout=10)
+
+    def test_refuses_other_platforms(self):
+        """Test the ring refuses architectures without x86 store ordering"""
+        with unittest.mock.patch("platform.machine", return_value="aarch64"):
+            with self.assertRaises(NotImplementedError):
+                FrameRing(4)
+
+    def test_claim_commit_order(self):
+        """Test batches stay contiguous, wrap around and are published in claim order"""
+        with FrameRing(8) as ring:
+            frames = np.arange(8 * 25, dtype=np.uint8).reshape(8, 25)
+            self.assertEqual(ring.put_many(frames[:5]), 5)
+            batch = ring.acquire(3)
+            np.testing.assert_array_equal(batch.frames, frames[:3])
+            ring.release(batch)
+
+            first, second = ring.claim(10), ring.claim(10)
+            self.assertEqual((first.start, len(first), second.start, len(second)), (5, 3, 8, 3))
+            self.assertIsNone(ring.claim(1, timeout=0.01))
+            second.frames[:] = frames[5:]
+            committer = threading.Thread(target=ring.commit, args=(second,), daemon=True)
+            committer.start()  # 第一批提交之前，第二批的提交一直等待
+            batch = ring.acquire(10)
+            self.assertEqual((batch.start, len(batch)), (3, 2))
+            ring.release(batch)
+            self.assertIsNone(ring.acquire(10, timeout=0.01))
+            first.frames[:] = frames[:3]
+            ring.commit(first)
+            committer.join(5)
+            self.assertFalse(committer.is_alive())
+            batch = ring.acquire(10)
+            self.assertEqual((batch.start, len(batch)), (5, 3))
+            np.testing.assert_array_equal(batch.frames, frames[:3])
+            ring.release(batch)
+            batch = ring.acquire(10)
+            np.testing.assert_array_equal(batch.frames, frames[5:])
+            ring.release(batch)
+
+            self.assertIsNone(ring.acquire(1, timeout=0.01))
+            ring.close()
+            self.assertIsNone(ring.acquire(1))
+            with self.assertRaises(ValueError):
+                ring.put(bytes(25))
+
+    def test_pack_ring(self):
+        """Test variable slots carry Packs and single frames as zero-copy memoryviews"""
+        ua = sample_aircraft()
+        messages = [ua.encode_pack(DEFAULT_MESSAGES), ua.encode_location(), ua.encode_pack([MessageType.SYSTEM])]
+        with PackRing(4) as ring:
+            self.assertEqual(ring.put_many(messages), 3)
+            batch = ring.acquire(4)
+            views = list(batch.messages())
+            self.assertTrue(all(isinstance(view, memoryview) for view in views))
+            self.assertEqual([bytes(view) for view in views], messages)
+            decoded = UnmannedAircraft()
+            decoded.decode_message(bytes(views[0]))
+            self.assertEqual(decoded, ua)
+            ring.release(batch)
+            with self.assertRaises(ValueError):
+                ring.put(bytes(300))
+
+    def test_processes(self):
+        """Test two producer and two consumer processes hand off every frame exactly once"""
+        simulator = generator.FleetSimulator(100, seed=2, start=1.7e9)
+        frames = simulator.location_frames(np.arange(100).repeat(50))
+        halves = frames[:2500], frames[2500:]
+        from columns import location_columns
+        expected_total = float(location_columns(frames)["latitude"].sum())
+
+        import multiprocessing
+        with FrameRing(256, multi_producer=True, multi_consumer=True) as ring:
+            results = multiprocessing.Queue()
+            producers = [multiprocessing.Process(target=ring_producer, args=(ring, half)) for half in halves]
+            consumers = [multiprocessing.Process(target=ring_consumer, args=(ring, results)) for _ in range(2)]
+            for process in producers + consumers:
+                process.start()
+            for process in producers:
+                process.join()
+            ring.close()
+            counts = [results.get(timeout=30) for _ in consumers]
+            for process in consumers:
+                process.join()
+        self.assertEqual(sum(count for count, _ in counts), 5000)
+        self.assertAlmostEqual(sum(total for _, total in counts), expected_total, places=3)
+
+class TestTracing(unittest.TestCase):
+    """Unit tests for sampled encode/decode tracing"""
+
+    def tearDown(self):
+        tracing.disable()
+
+    def test_spans_and_export(self):
+        """Test stage spans nest inside their call and export as Chrome trace events"""
+        ua = sample_aircraft()
+        ua.timestamp = 100
+        tracer = tracing.enable(sample_every=1)
+        pack = ua.encode_pack([MessageType.BASIC_ID, MessageType.LOCATION, MessageType.SYSTEM])
+        decoded = UnmannedAircraft()
+        decoded.decode_message(pack)
+        with tracing.span("downstream"):
+            pass
+        tracing.disable()
+        self.assertEqual(decoded.id, ua.id)
+        self.assertIsNone(main._active.trace)
+
+        names = {name for name, *_ in tracer.spans}
+        for name in ("encode_pack", "pack.location", "location.validate", "location.pack", "decode_message",
+                     "header", "pack[1]", "location.unpack", "location.enum", "location.scale", "system.enum",
+                     "basic_id.string", "downstream"):
+            self.assertIn(name, names)
+        self.assertEqual((tracer.calls, tracer.sampled), (3, 3))
+
+        stream = io.StringIO()
+        tracer.export(stream)
+        events = json.loads(stream.getvalue())["traceEvents"]
+        self.assertTrue(all(event["ph"] == "X" and event["dur"] >= 0 for event in events))
+        root = next(event for event in events if event["name"] == "decode_message")
+        for event in events:
+            if event["cat"] == "decode":
+                self.assertGreaterEqual(event["ts"], root["ts"])
+                self.assertLessEqual(event["ts"] + event["dur"], root["ts"] + root["dur"] + 1e-3)
+
+    def test_sampling_and_capacity(self):
+        """Test only every n-th call is traced, the ring keeps the newest spans and disabling stops tracing"""
+        frame = sample_aircraft().encode_location()
+        tracer = tracing.enable(sample_every=10, capacity=40)
+        ua = UnmannedAircraft()
+        for _ in range(100):
+            ua.decode_message(frame)
+        self.assertEqual((tracer.calls, tracer.sampled), (100, 10))
+        self.assertEqual(len(tracer.spans), 40)  # 每次 5 条记录，共 50 条，只保留最后 8 次的 40 条
+        self.assertEqual(tracer.summary()["decode_message"][0], 8)
+
+        self.assertIs(tracing.disable(), tracer)
+        ua.decode_message(frame)
+        self.assertEqual(tracer.calls, 100)
+        from contextlib import nullcontext
+        self.assertIsInstance(tracing.span("idle"), nullcontext)
+        with self.assertRaises(ValueError):
+            tracing.Tracer(sample_every=0)
+
+    def test_threads(self):
+        """Test concurrent decoding counts every call and keeps each trace on its own thread"""
+        frame = sample_aircraft().encode_location()
+        tracer = tracing.enable(sample_every=3, capacity=1 << 16)
+
+        def decode():
+            ua = UnmannedAircraft()
+            for _ in range(3000):
+                ua.decode_message(frame)
+
+        threads = [threading.Thread(target=decode) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((tracer.calls, tracer.sampled), (12000, 4000))
+        roots = [span for span in tracer.spans if span[0] == "decode_message"]
+        self.assertEqual(len(roots), 4000)
+        self.assertEqual(len({span[4] for span in roots}), 4)
+        self.assertEqual(sum(span[0] == "location.unpack" for span in tracer.spans), 4000)
+        self.assertIsNone(main._active.trace)
+
+class TestIds(unittest.TestCase):
+    """Unit tests for the interned aircraft ID table"""
+
+    def test_intern_and_reverse_lookup(self):
+        """Test raw ID fields map to stable handles that resolve back to bytes and text"""
+        table = IdTable()
+        raw = b"DRONE001".ljust(20, b"\0")
+        handle = table.intern(raw)
+        self.assertEqual(table.intern(bytearray(raw)), handle)
+        self.assertEqual(table.intern_text("DRONE001"), handle)
+        self.assertEqual((table.raw[handle], table.text(handle)), (raw, "DRONE001"))
+        self.assertEqual(table.intern(b"DRONE002".ljust(20, b"\0")), handle + 1)
+        self.assertIsNone(table.find("DRONE003"))
+        with self.assertRaises(ValueError):
+            table.intern(b"\xff" * 20)
+        self.assertEqual(len(table), 2)
+
+        fields = np.frombuffer(b"".join([raw, b"X" * 20, raw, b"\0" * 20]), dtype=np.uint8).reshape(4, 20)
+        handles = table.intern_many(fields)
+        self.assertEqual(handles[0], handle)
+        self.assertEqual(handles[0], handles[2])
+        self.assertEqual([table.text(h) for h in handles], ["DRONE001", "X" * 20, "DRONE001", ""])
+
+    def test_capacity(self):
+        """Test a bounded table stops allocating handles once full"""
+        table = IdTable(capacity=1)
+        handle = table.intern_text("DRONE001")
+        self.assertEqual(table.intern_text("DRONE002"), -1)
+        self.assertEqual(table.intern_text("DRONE001"), handle)
+        self.assertEqual(len(table), 1)
+        self.assertIsNone(table.find("DRONE002"))
+        with self.assertRaises(ValueError):
+            table.text(-1)
+
+    def test_decoders_do_not_intern(self):
+        """Test decoding IDs leaves no shared state behind"""
+        table = IdTable()
+        ua = UnmannedAircraft()
+        ua.decode_message(sample_aircraft().encode_basic_id())
+        self.assertEqual(ua.id, "DRONE001")
+        self.assertEqual(FrameView(sample_aircraft().encode_basic_id()).id, "DRONE001")
+        self.assertEqual(len(table), 0)
+        self.assertFalse(hasattr(ua, "id_handle"))
+
+    def test_store_handles(self):
+        """Test both state stores carry handles and FleetState finds aircraft by ID"""
+        ua = sample_aircraft()
+        table = IdTable()
+        store = FleetStore()
+        store.update(b"A", ua.encode_location())
+        store.update(b"B", ua.encode_basic_id())
+        self.assertEqual(store.id_handles(table).tolist(), [-1, table.find("DRONE001")])
+        with self.assertRaises(ValueError):
+            store.id_handles(table, MessageType.LOCATION)
+
+        state = FleetState(ids=table)
+        state.update(b"A", ua.encode_basic_id())
+        address, track = state.find("DRONE001")
+        self.assertEqual((address, track.id_handle), (b"A", table.find("DRONE001")))
+        ua.id = "DRONE002"
+        state.update(b"A", ua.encode_basic_id())
+        self.assertIsNone(state.find("DRONE001"))
+        self.assertEqual(state.find("DRONE002")[0], b"A")
+
+        full = FleetState(ids=IdTable(capacity=0))
+        full.update(b"A", ua.encode_basic_id())
+        with unittest.mock.patch.object(IdTable, "intern_text") as intern_text:
+            full.update(b"A", ua.encode_basic_id())
+        intern_text.assert_not_called()  # 字典已满时同一识别码不再反复查表
+        self.assertEqual(full.get(b"A").id_handle, -1)
+
+        plain = FleetState()
+        plain.update(b"A", ua.encode_basic_id())
+        self.assertEqual(plain.get(b"A").id_handle, -1)
+        with self.assertRaises(ValueError):
+            plain.find("DRONE002")
+
+
+class TestChangeFeed(unittest.TestCase):
+    """Unit tests for the versioned aircraft change feed"""
+
+    def test_field_diffs_and_merge(self):
+        """Test only changed fields are recorded and repeated frames produce no version"""
+        feed = ChangeFeed()
+        ua = sample_aircraft()
+        ua.timestamp = 100
+        self.assertEqual(feed.update(b"A", ua.encode_pack([MessageType.BASIC_ID, MessageType.LOCATION])), 1)
+        self.assertEqual(feed.update(b"A", ua.encode_basic_id()), 0)
+        ua.latitude += 0.001
+        ua.timestamp = 110
+        self.assertEqual(feed.update(b"A", ua.encode_location()), 2)
+        ua.latitude += 0.001
+        self.assertEqual(feed.update(b"A", ua.encode_location()), 3)
+        feed.update(b"B", ua.encode_basic_id())
+
+        changes = feed.changes_since(1)
+        self.assertEqual((changes.version, changes.resync), (4, False))
+        first, second = changes.changes
+        self.assertEqual((first.address, first.version, first.message_types), (b"A", 3, [MessageType.LOCATION]))
+        self.assertEqual(set(first.fields), {"latitude", "timestamp"})
+        self.assertAlmostEqual(first.fields["latitude"], ua.latitude, places=6)
+        self.assertEqual(second.fields, {"id_type": ua.id_type, "ua_type": ua.ua_type, "id": ua.id})
+        self.assertEqual(feed.changes_since(4).changes, [])
+        self.assertEqual(feed.get(b"A").id, ua.id)
+
+        feed.remove(b"B")
+        removed = feed.changes_since(4).changes
+        self.assertEqual((removed[0].address, removed[0].removed), (b"B", True))
+
+    def test_failed_decode_leaves_state(self):
+        """Test a frame that fails to decode midway leaves the stored aircraft untouched"""
+        feed = ChangeFeed()
+        ua = sample_aircraft()
+        ua.operational_status = OperationalStatus.GROUND
+        version = feed.update(b"A", ua.encode_location(), received=1.0)
+        ua.operational_status = OperationalStatus.AIRBORNE
+        frame = bytearray(ua.encode_location())
+        frame[19] = 0xF0 | frame[19] & 0x0F  # 无效的垂直精度
+        with self.assertRaises(ValueError):
+            feed.update(b"A", bytes(frame), received=2.0)
+        self.assertEqual(feed.get(b"A").operational_status, OperationalStatus.GROUND)
+        self.assertEqual(feed.version, version)
+        self.assertEqual(feed.changes_since(version).changes, [])
+
+    def test_resync_and_subscription(self):
+        """Test lagging subscribers receive a full resync and subscriptions track their version"""
+        feed = ChangeFeed(history=3)
+        ua = sample_aircraft()
+        subscription = feed.subscribe()
+        for i in range(5):
+            feed.update(bytes([i]), ua.encode_basic_id(), received=float(i))
+        self.assertTrue(feed.changes_since(1).resync)
+        self.assertFalse(feed.changes_since(2).resync)
+
+        first = subscription.poll()
+        self.assertTrue(first.resync)
+        self.assertEqual(len(first.changes), 5)
+        self.assertEqual(subscription.poll(timeout=0.01).changes, [])
+        threading.Timer(0.05, feed.update, (b"\x09", ua.encode_system())).start()
+        changes = subscription.poll(timeout=5)
+        self.assertEqual([change.address for change in changes.changes], [b"\x09"])
+        self.assertEqual(feed.expire(2.0), [b"\x00", b"\x01"])
+        self.assertEqual(len(feed), 4)
+
+
+class TestRetention(unittest.TestCase):
+    """Unit tests for tiered history downsampling"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "history.db")
+        self.base = 1699999200.0  # 整点
+        address = bytes([2, 0, 0, 0, 0, 1])
+        with HistorySink(self.path) as sink:
+            ua = sample_aircraft()
+            for i in range(7200):
+                ua.operational_status = (OperationalStatus.EMERGENCY if 1000 <= i < 1020
+                                         else OperationalStatus.AIRBORNE)
+                ua.timestamp = i % 3600 * 10
+                sink.write_aircraft(address, ua, MessageType.LOCATION, self.base + i)
+                sink.write_aircraft(address, ua, MessageType.BASIC_ID, self.base + i)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def count(self, start: float, end: float, table: str = "locations") -> int:
+        with History(self.path) as history:
+            return history.connection.execute(
+                f"SELECT COUNT(*) FROM {table} WHERE time >= ? AND time < ?", (start, end)).fetchone()[0]
+
+    def test_tiers_keep_status_changes(self):
+        """Test each age range is thinned to its tier interval while emergency points survive"""
+        now = self.base + 7200
+        with Retention(self.path, tiers=[Tier(600, 10), Tier(3600, 60)], chunk=600) as retention:
+            self.assertEqual(retention.compact(now), 6 + 5)
+            self.assertEqual(retention.compact(now), 0)
+        base = self.base
+        self.assertEqual(self.count(base + 6600, now), 600)
+        self.assertEqual(self.count(base + 3600, base + 6600), 300)
+        self.assertEqual(self.count(base, base + 3600), 60 + 20)
+        self.assertEqual(self.count(base + 1000, base + 1021), 21)
+        self.assertEqual(self.count(base, now, "messages"), 60 + 300 + 600)
+        with History(self.path) as history:
+            statuses = [row[0] for row in history.connection.execute(
+                "SELECT status FROM locations WHERE time BETWEEN ? AND ? ORDER BY time", (base + 960, base + 1080))]
+        emergency = OperationalStatus.EMERGENCY.value
+        self.assertEqual(statuses.count(emergency), 20)
+        self.assertEqual(statuses[-2:], [OperationalStatus.AIRBORNE.value] * 2)
+
+    def test_incremental_background_compaction(self):
+        """Test compaction resumes from its watermark and runs in a background thread"""
+        now = self.base + 7200
+        with Retention(self.path, tiers=[Tier(600, 10), Tier(3600, 60)], chunk=600) as retention:
+            self.assertEqual(retention.compact(now, max_chunks=2), 2)
+        with self.assertRaises(ValueError):
+            Retention(self.path, tiers=[Tier(600, 7)], chunk=600)
+        with unittest.mock.patch("time.time", return_value=now):
+            with Retention(self.path, tiers=[Tier(600, 10), Tier(3600, 60)], chunk=600) as retention:
+                retention.start(pause=0)
+                deadline = time.monotonic() + 10
+                while retention.chunks < 9 and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                retention.stop()
+                self.assertEqual(retention.chunks, 9)
+        self.assertEqual(self.count(self.base, now), 80 + 300 + 600)
+
+    def test_chunks_use_time_index(self):
+        """Test compacting one chunk searches messages by time instead of scanning the table"""
+        with Retention(self.path) as retention:
+            plan = " ".join(row[3] for row in retention.connection.execute(
+                "EXPLAIN QUERY PLAN SELECT rowid FROM messages WHERE time >= ? AND time < ?", (0, 600)))
+        self.assertIn("INDEX messages_time", plan)
+
+    def test_system_timestamps_ignored(self):
+        """Test system frames differing only in their advancing timestamp are thinned like other repeats"""
+        address = bytes([2, 0, 0, 0, 0, 2])
+        start = self.base + 7200
+        ua = sample_aircraft()
+        with HistorySink(self.path) as sink:
+            for i in range(600):
+                ua.operator_altitude = 50.0 if i < 330 else 60.0
+                frame = bytearray(ua.encode_system())
+                struct.pack_into('<I', frame, 20, 500000000 + i)  # 每条报文的时间戳都不同
+                sink.write(address, bytes(frame), start + i)
+        with Retention(self.path, tiers=[Tier(0, 60)], chunk=600) as retention:
+            retention.compact(start + 600)
+        with History(self.path) as history:
+            kept = history.messages(address, MessageType.SYSTEM)
+        # 每分钟第一条，另加控制站高度变化的一条
+        self.assertEqual([time - start for time, _ in kept], sorted([60.0 * i for i in range(10)] + [330.0]))
+
+
+class TestHeatmap(unittest.TestCase):
+    """Unit tests for streaming traffic-density aggregation"""
+
+    def frame(self, latitude: float, status: OperationalStatus = OperationalStatus.AIRBORNE) -> bytes:
+        return UnmannedAircraft(latitude=latitude, longitude=120.05, operational_status=status).encode_location()
+
+    def test_live_counts_follow_aircraft(self):
+        """Test live counts move between cells, pick up the UA type and expire stale aircraft"""
+        heatmap = Heatmap((30.0, 120.0, 31.0, 121.0), cell_sizes=(0.5, 0.1), timeout=30)
+        multirotor = UAType.MULTIROTOR.value
+        airborne, emergency = OperationalStatus.AIRBORNE.value, OperationalStatus.EMERGENCY.value
+        heatmap.update(b"A", self.frame(30.05), received=1000.0)
+        heatmap.update(b"A", sample_aircraft().encode_basic_id(), received=1001.0)
+        self.assertEqual(heatmap.live(1)[0, 0, multirotor, airborne], 1)
+        heatmap.update(b"A", self.frame(30.75, OperationalStatus.EMERGENCY), received=1002.0)
+        heatmap.update(b"B", self.frame(35.0), received=1002.0)  # 范围外
+        fine, coarse = heatmap.live(1), heatmap.live(0)
+        self.assertEqual((fine.shape, coarse.shape), ((10, 10, 16, 6), (2, 2, 16, 6)))
+        self.assertEqual(fine.sum(), 1)
+        self.assertEqual(fine[7, 0, multirotor, emergency], 1)
+        self.assertEqual(coarse[1, 0, multirotor, emergency], 1)
+        self.assertEqual(heatmap.cell(30.75, 120.05, 1), (7, 0))
+        heatmap.advance(1040.0)
+        self.assertEqual((len(heatmap), heatmap.live(1).sum()), (0, 0))
+
+    def test_window_and_rollups(self):
+        """Test sliding-window counts expire by bucket and finished hours become rollups"""
+        heatmap = Heatmap((30.0, 120.0, 31.0, 121.0), cell_sizes=(0.1,), window=60, bucket=10, timeout=3600)
+        start = 3600.0 * 100
+        for i in range(60):
+            heatmap.update(bytes([i % 3]), self.frame(30.05), received=start + i)
+        self.assertEqual(heatmap.window().sum(), 60)
+        heatmap.advance(start + 75)
+        self.assertEqual(heatmap.window().sum(), 40)
+        heatmap.advance(start + 1000)
+        self.assertEqual(heatmap.window().sum(), 0)
+        heatmap.update(b"A", self.frame(30.15), received=start + 3700)
+        (hour, counts), = heatmap.rollups()
+        self.assertEqual((hour, counts.sum(), counts[0, 0].sum()), (start, 60, 60))
+        self.assertEqual(heatmap.current_hour()[1][1, 0].sum(), 1)
+        self.assertEqual(heatmap.window()[1, 0].sum(), 1)
+
+
+@unittest.skipUnless(HAS_QT, "PyQt6 is not installed")
+class TestLiveMonitor(unittest.TestCase):
+    """Headless tests for the live traffic monitor"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def records(self, count):
+        """Generate Basic ID and Location records for `count` aircraft"""
+        records = []
+        for i in range(count):
+            ua = sample_aircraft()
+            ua.id = f"DRONE{i:03d}"
+            ua.latitude = 30 + i / 100
+            address = bytes([2, 0, 0, 0, 0, i])
+            records.append((address, ua.encode_basic_id(), 1700000000.0))
+            records.append((address, ua.encode_location(), 1700000001.0))
+        records.append((bytes(6), b"\xff" * 25, 1700000002.0))
+        return records
+
+    def test_worker_and_model(self):
+        """Test the worker decodes in the background and the model shows one row per aircraft"""
+        from monitor import LiveMonitorWidget
+
+        widget = LiveMonitorWidget()
+        widget.start(self.records(50))
+        thread = widget.thread
+        while not thread.wait(10):
+            self.app.processEvents()
+        self.app.processEvents()
+
+        self.assertEqual(widget.model.rowCount(), 50)
+        self.assertEqual(widget.worker.decoded, 100)
+        self.assertEqual(widget.worker.errors, 1)
+        self.assertEqual(widget.model.index(3, 1).data(), "DRONE003")
+        self.assertAlmostEqual(widget.model.index(3, 4).data(), 30.03)
+        self.assertEqual(widget.model.index(3, 9).data(), 2)
+
+    def test_coalesced_updates(self):
+        """Test a batch of updates emits a single change notification"""
+        from monitor import LiveTableModel
+
+        store = FleetState()
+        model = LiveTableModel()
+        for address, data, received in self.records(20)[:-1]:
+            store.update(address, data, received)
+        model.apply(store.drain())
+
+        notifications = []
+        model.dataChanged.connect(lambda *args: notifications.append(args))
+        for address, data, received in self.records(20)[1:-1:2]:
+            store.update(address, data, received)
+        model.apply(store.drain())
+        self.assertEqual(len(notifications), 1)
+        self.assertEqual(model.rowCount(), 20)
+
+@unittest.skipUnless(HAS_QT, "PyQt6 is not installed")
+class TestCaptureViewer(unittest.TestCase):
+    """Headless tests for the capture file viewer"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+
+    def test_load_sort_filter(self):
+        """Test loading a capture in the background, then sorting and filtering its columns"""
+        from capture_viewer import CaptureViewerWidget
+
+        with tempfile.NamedTemporaryFile(suffix=".ridcap", delete=False) as f:
+            writer = CaptureWriter(f)
+            for i in range(100):
+                ua = sample_aircraft()
+                ua.id = f"DRONE{i:03d}"
+                ua.latitude = 30 - i / 10
+                writer.write(ua.encode_pack([MessageType.BASIC_ID, MessageType.LOCATION]), bytes([2, 0, 0, 0, 0, i]), 1700000000.0 + i)
+        self.addCleanup(os.remove, f.name)
+
+        widget = CaptureViewerWidget()
+        widget.load(f.name)
+        while widget.thread is not None:
+            self.app.processEvents()
+        model = widget.model
+        self.assertEqual(model.rowCount(), 200)
+        self.assertEqual(model.index(2, 4).data(), "DRONE001")
+
+        model.sort(6)
+        self.assertAlmostEqual(model.index(0, 6).data(), 20.1)
+        self.assertEqual(model.index(199, 6).data(), "")
+
+        widget.type_combo.setCurrentText("BASIC_ID")
+        widget.prefix_edit.setText("DRONE05")
+        widget.apply_filter()
+        self.assertEqual(model.rowCount(), 10)
+        self.assertEqual(model.index(0, 3).data(), "BASIC_ID")
+
+    def test_skips_bad_records(self):
+        """Test empty and malformed Pack records are skipped, and non-Location rows sort first by status"""
+        from capture_viewer import CaptureLoader
+
+        ua = sample_aircraft()
+        with tempfile.NamedTemporaryFile(suffix=".ridcap", delete=False) as f:
+            writer = CaptureWriter(f)
+            writer.write(ua.encode_location(), received=1.0)
+            writer.write(b"", received=2.0)
+            writer.write(b"\xf2\x19\x0a" + bytes(250), received=3.0)  # 子报文数量超过9个
+            writer.write(ua.encode_basic_id(), received=4.0)
+        self.addCleanup(os.remove, f.name)
+
+        loader = CaptureLoader(f.name)
+        table = loader._load()
+        self.assertEqual((len(table), loader.skipped), (2, 2))
+        self.assertEqual(table.sort_key(5).tolist(), [ua.operational_status.value, -1])
+
 if __name__ == "__main__":
     unittest.main()
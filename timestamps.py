@@ -0,0 +1,129 @@
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+from enums import MessageType
+from filters import field, frames_array
+from view import TIMESTAMP_OFFSET, iter_views
+
+HOUR = 3600.0  # 位置向量报文时间戳的回绕周期，秒
+TIMESTAMP_MODULUS = 36000  # 时间戳的取值个数（一小时内的0.1秒数），不小于该值的时间戳无效
+DEFAULT_MAX_GAP = 600.0  # 同一航空器两次报文间隔超过该值时不再沿用上次的时钟偏差，秒
+_LOCATION = MessageType.LOCATION.value
+
+
+def unwrap_timestamp(timestamp: int, reference: float) -> float:
+    """将位置向量报文的时间戳（UTC整点后的0.1秒数）展开为绝对 UTC 时间（Unix 秒）
+
+    在 reference 所在小时及前后各一小时的候选时刻中取距 reference 最近的一个，
+    reference 与实际时刻相差不超过半小时即可得到正确结果。时间戳无效时返回 NaN。
+    """
+    if timestamp < 0 or timestamp >= TIMESTAMP_MODULUS:
+        return float('nan')
+    candidate = (reference // HOUR) * HOUR + timestamp / 10
+    if candidate - reference > HOUR / 2:
+        candidate -= HOUR
+    elif reference - candidate > HOUR / 2:
+        candidate += HOUR
+    return candidate
+
+
+def unwrap_timestamps(timestamps, reference) -> np.ndarray:
+    """unwrap_timestamp 的向量化版本，reference 可为标量或与 timestamps 等长的数组"""
+    timestamps = np.asarray(timestamps)
+    reference = np.broadcast_to(np.asarray(reference, dtype=np.float64), timestamps.shape)
+    candidate = np.floor(reference / HOUR) * HOUR + timestamps / 10
+    candidate -= HOUR * (candidate - reference > HOUR / 2)
+    candidate += HOUR * (reference - candidate > HOUR / 2)
+    candidate[(timestamps < 0) | (timestamps >= TIMESTAMP_MODULUS)] = np.nan
+    return candidate
+
+
+class TimestampUnwrapper:
+    """按航空器将位置向量报文时间戳展开为绝对 UTC 时间
+
+    每架航空器记录上次报文的接收时间和展开结果与接收时间之差（航空器时钟相对接收端的偏差）。
+    新报文以 接收时间 + 偏差 为参考选取小时，因此航空器时钟与接收端相差接近半小时、接收时间抖动时，
+    同一航空器的时间仍连续跨越整点，不会在相邻小时之间跳动。距上次报文超过 max_gap 秒时直接以接收时间为参考。
+    """
+
+    def __init__(self, max_gap: float = DEFAULT_MAX_GAP):
+        self.max_gap = max_gap
+        self._state: Dict[bytes, Tuple[float, float]] = {}  # 广播地址 -> (上次接收时间, 时钟偏差)
+
+    def __len__(self) -> int:
+        return len(self._state)
+
+    def _reference(self, address: bytes, received: float) -> float:
+        state = self._state.get(address)
+        if state is None or abs(received - state[0]) > self.max_gap:
+            return received
+        return received + state[1]
+
+    def update(self, address: bytes, timestamp: int, received: Optional[float] = None) -> float:
+        """展开一个时间戳，返回绝对 UTC 时间（Unix 秒），时间戳无效时返回 NaN"""
+        if received is None:
+            received = time.time()
+        absolute = unwrap_timestamp(timestamp, self._reference(address, received))
+        if absolute == absolute:
+            self._state[address] = (received, absolute - received)
+        return absolute
+
+    def update_frame(self, address: bytes, data: bytes, received: Optional[float] = None) -> Optional[float]:
+        """展开报文（包括打包报文中的）位置向量时间戳，没有位置向量报文时返回 None"""
+        absolute = None
+        for view in iter_views(data):
+            if view.message_type == MessageType.LOCATION:
+                absolute = self.update(address, view.timestamp, received)
+        return absolute
+
+    def update_many(self, addresses: Sequence[bytes], timestamps, received=None) -> np.ndarray:
+        """批量展开时间戳，返回绝对 UTC 时间数组（无效为 NaN）
+
+        同一批中的参考时刻都基于批次开始前的状态计算；批次结束后每架航空器的状态取其接收时间最晚的有效报文。
+        """
+        timestamps = np.asarray(timestamps)
+        if len(addresses) != len(timestamps):
+            raise ValueError("广播地址数量与时间戳数量不一致")
+        if received is None:
+            received = time.time()
+        received = np.broadcast_to(np.asarray(received, dtype=np.float64), timestamps.shape)
+        if not len(timestamps):
+            return np.empty(0)
+
+        _, first, inverse = np.unique(np.asarray(addresses, dtype='S6'), return_index=True, return_inverse=True)
+        keys = [addresses[i] for i in first.tolist()]  # S6 数组会去掉末尾的0字节，取原始地址
+        last = np.full(len(keys), np.nan)
+        bias = np.zeros(len(keys))
+        for i, key in enumerate(keys):
+            state = self._state.get(key)
+            if state is not None:
+                last[i], bias[i] = state
+        stale = ~(np.abs(received - last[inverse]) <= self.max_gap)
+        reference = received + np.where(stale, 0.0, bias[inverse])
+        absolute = unwrap_timestamps(timestamps, reference)
+
+        # 每架航空器接收时间最晚的有效报文（同一时间取输入中靠后的）
+        valid = np.flatnonzero(absolute == absolute)
+        order = valid[np.lexsort((valid, received[valid], inverse[valid]))]
+        groups = inverse[order]
+        newest = order[np.append(groups[1:] != groups[:-1], True)] if len(order) else order
+        for row in newest.tolist():
+            self._state[keys[inverse[row]]] = (float(received[row]), float(absolute[row] - received[row]))
+        return absolute
+
+    def update_frames(self, addresses: Sequence[bytes], frames, received=None) -> np.ndarray:
+        """批量展开25字节报文的时间戳，非位置向量报文对应 NaN"""
+        frames = frames_array(frames)
+        if len(addresses) != len(frames):
+            raise ValueError("广播地址数量与报文数量不一致")
+        if received is None:
+            received = time.time()
+        received = np.broadcast_to(np.asarray(received, dtype=np.float64), (len(frames),))
+        absolute = np.full(len(frames), np.nan)
+        selected = np.flatnonzero(frames[:, 0] >> 4 == _LOCATION)
+        timestamps = field(frames[selected], TIMESTAMP_OFFSET, '<u2')
+        absolute[selected] = self.update_many([addresses[i] for i in selected.tolist()], timestamps,
+                                              received[selected])
+        return absolute
@@ -0,0 +1,148 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, List, Optional, Tuple
+
+import main
+
+DEFAULT_SAMPLE_EVERY = 100  # 每多少次编解码调用记录一次
+DEFAULT_CAPACITY = 1 << 16  # 环形缓冲区保留的阶段记录数
+
+Span = Tuple[str, str, int, int, int]  # (名称, 类别, 开始时间, 持续时间, 线程)，时间为纳秒
+
+
+class Trace:
+    """一次被抽中的编解码调用：依次记录各阶段的耗时，结束时整体放入追踪器的环形缓冲区"""
+
+    __slots__ = ('_tracer', '_spans', 'name', 'category', 'start', '_last', 'thread')
+
+    def __init__(self, tracer: 'Tracer', name: str, category: str):
+        self._tracer = tracer
+        self._spans: List[Span] = []
+        self.name = name
+        self.category = category
+        self.thread = threading.get_ident()
+        self.start = self._last = time.perf_counter_ns()
+
+    @property
+    def last(self) -> int:
+        """上一个阶段结束的时间"""
+        return self._last
+
+    def mark(self, name: str) -> None:
+        """结束一个阶段：记录从上一个阶段结束到现在的耗时"""
+        now = time.perf_counter_ns()
+        self._spans.append((name, self.category, self._last, now - self._last, self.thread))
+        self._last = now
+
+    def span(self, name: str, start: int) -> None:
+        """记录从 start（之前取得的 last）到现在的嵌套阶段，例如打包报文中的一个子报文"""
+        now = time.perf_counter_ns()
+        self._spans.append((name, self.category, start, now - start, self.thread))
+        self._last = now
+
+    def end(self) -> None:
+        now = time.perf_counter_ns()
+        spans = self._tracer.spans
+        spans.append((self.name, self.category, self.start, now - self.start, self.thread))
+        spans.extend(self._spans)
+
+
+class Tracer:
+    """采样的编解码追踪器
+
+    每 sample_every 次编解码调用抽取一次（未抽中的打包报文中的子报文也各计一次调用），记录报文头解析、
+    struct 解包、枚举构造、数值换算、打包报文遍历等阶段的耗时。记录放在容量为 capacity 的环形缓冲区（deque）中，满时丢弃最早的记录，可导出为
+    Chrome / Perfetto 的 trace JSON。未启用时编解码函数只多一次全局变量判断，启用后未抽中的调用
+    只多一次加锁计数。被抽中调用的追踪记录按线程保存，可在多个线程中同时编解码。
+    """
+
+    def __init__(self, sample_every: int = DEFAULT_SAMPLE_EVERY, capacity: int = DEFAULT_CAPACITY):
+        if sample_every < 1:
+            raise ValueError("采样间隔必须大于0")
+        if capacity < 1:
+            raise ValueError("缓冲区容量必须大于0")
+        self.sample_every = sample_every
+        self.spans: deque = deque(maxlen=capacity)
+        self.calls = 0  # 经过追踪器的调用次数
+        self.sampled = 0  # 被抽中的调用次数
+        self._origin = time.perf_counter_ns()
+        self._lock = threading.Lock()  # 保护两个计数，多个线程同时编解码时不丢失计数
+
+    def sample(self) -> bool:
+        """计数一次调用，返回是否抽中"""
+        with self._lock:
+            self.calls += 1
+            return not self.calls % self.sample_every
+
+    def begin(self, name: str, category: str) -> Trace:
+        """开始记录一次被抽中的调用"""
+        with self._lock:
+            self.sampled += 1
+        return Trace(self, name, category)
+
+    @contextmanager
+    def _span(self, trace: Trace):
+        try:
+            yield trace
+        finally:
+            trace.end()
+
+    def span(self, name: str, category: str = 'user'):
+        """按同样的采样间隔记录调用方自己的代码段：with tracer.span('track'): ..."""
+        if not self.sample():
+            return nullcontext()
+        return self._span(self.begin(name, category))
+
+    def clear(self) -> None:
+        self.spans.clear()
+
+    def events(self) -> List[Dict[str, Any]]:
+        """Chrome trace 格式的完整事件（ph 为 X，时间为相对追踪器创建时刻的微秒）"""
+        pid = os.getpid()
+        origin = self._origin
+        return [{'name': name, 'cat': category, 'ph': 'X', 'ts': (start - origin) / 1000, 'dur': duration / 1000,
+                 'pid': pid, 'tid': thread}
+                for name, category, start, duration, thread in list(self.spans)]
+
+    def export(self, target) -> None:
+        """导出为 Chrome / Perfetto 可以打开的 trace JSON，target 为文件路径或文本文件对象"""
+        document = {'traceEvents': self.events(), 'displayTimeUnit': 'ns'}
+        if hasattr(target, 'write'):
+            json.dump(document, target)
+        else:
+            with open(target, 'w') as f:
+                json.dump(document, f)
+
+    def summary(self) -> Dict[str, Tuple[int, float]]:
+        """各阶段的 (记录次数, 平均耗时纳秒)，按总耗时从大到小排列"""
+        totals: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+        for name, _, _, duration, _ in list(self.spans):
+            total = totals[name]
+            total[0] += 1
+            total[1] += duration
+        return {name: (count, total / count)
+                for name, (count, total) in sorted(totals.items(), key=lambda item: -item[1][1])}
+
+
+def enable(sample_every: int = DEFAULT_SAMPLE_EVERY, capacity: int = DEFAULT_CAPACITY) -> Tracer:
+    """创建追踪器并对 UnmannedAircraft 的编解码启用追踪"""
+    tracer = Tracer(sample_every, capacity)
+    main.set_tracer(tracer)
+    return tracer
+
+
+def disable() -> Optional[Tracer]:
+    """关闭追踪，返回之前的追踪器"""
+    tracer = main.get_tracer()
+    main.set_tracer(None)
+    return tracer
+
+
+def span(name: str, category: str = 'user'):
+    """在当前追踪器中记录调用方的代码段，未启用追踪时不做任何事"""
+    tracer = main.get_tracer()
+    return nullcontext() if tracer is None else tracer.span(name, category)
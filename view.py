@@ -0,0 +1,329 @@
+import math
+import struct
+from typing import Iterator
+
+from enums import *
+
+FRAME_SIZE = 25  # 单个报文长度（字节）
+
+# 报文字段在25字节报文中的固定偏移
+ID_OFFSET = 2  # 基本ID/控制站ID报文中的识别码
+ID_LENGTH = 20
+LATITUDE_OFFSET = 5  # 位置向量报文中的纬度（int32，小端）
+LONGITUDE_OFFSET = 9  # 位置向量报文中的经度（int32，小端）
+GEODETIC_ALTITUDE_OFFSET = 15  # 位置向量报文中的几何高度（uint16，小端）
+TIMESTAMP_OFFSET = 21  # 位置向量报文中的时间戳（uint16，小端）
+SYSTEM_TIMESTAMP_OFFSET = 20  # 系统报文中的时间戳（uint32，小端）
+
+INVALID_ALTITUDE = -1000.0  # 报文中表示高度无效的取值
+SYSTEM_EPOCH = 1546300800  # 系统报文时间戳的起点（2019-01-01 00:00:00 UTC）
+EARTH_RADIUS = 6371008.8  # 地球平均半径，米
+METERS_PER_DEGREE = EARTH_RADIUS * math.pi / 180  # 每度纬度对应的距离，米
+
+# 热路径上避免重复访问Enum属性
+_BASIC_ID = MessageType.BASIC_ID.value
+_LOCATION = MessageType.LOCATION.value
+_SELF_ID = MessageType.SELF_ID.value
+_SYSTEM = MessageType.SYSTEM.value
+_OPERATOR_ID = MessageType.OPERATOR_ID.value
+_EUROPEAN_UNION = ClassificationType.EUROPEAN_UNION.value
+_CHINA = ClassificationType.CHINA.value
+
+_unpack_i32 = struct.Struct('<i').unpack_from
+_unpack_u16 = struct.Struct('<H').unpack_from
+_unpack_u32 = struct.Struct('<I').unpack_from
+
+
+def _members(enum_class) -> dict:
+    """按取值建立枚举成员查找表，避免每次访问都经过Enum构造"""
+    return {member.value: member for member in enum_class}
+
+
+def _lookup(table: dict, enum_class, value: int):
+    try:
+        return table[value]
+    except KeyError:
+        raise ValueError(f"{value!r} is not a valid {enum_class.__name__}") from None
+
+
+_MESSAGE_TYPES = _members(MessageType)
+_ID_TYPES = _members(IDType)
+_UA_TYPES = _members(UAType)
+_OPERATIONAL_STATUSES = _members(OperationalStatus)
+_HEIGHT_TYPES = _members(HeightType)
+_HORIZONTAL_ACCURACIES = _members(HorizontalAccuracy)
+_VERTICAL_ACCURACIES = _members(VerticalAccuracy)
+_SPEED_ACCURACIES = _members(SpeedAccuracy)
+_DESCRIPTION_TYPES = _members(DescriptionType)
+_LOCATION_SOURCE_TYPES = _members(OperatorLocationSourceType)
+_CLASSIFICATION_TYPES = _members(ClassificationType)
+_EU_UA_CATEGORIES = _members(EUUACategory)
+_EU_UA_CLASSES = _members(EUUAClass)
+_CHINA_UA_CATEGORIES = _members(ChinaUACategory)
+_CHINA_UA_CLASSES = _members(ChinaUAClass)
+_OPERATOR_ID_TYPES = _members(OperatorIDType)
+
+
+class FrameView:
+    """报文惰性视图：仅在访问字段时按固定偏移读取所需字节，不复制底层缓冲区
+
+    属性名与 UnmannedAircraft 的字段一致，取值与 decode_message 的结果相同。
+    访问不属于当前报文类型的字段会抛出 ValueError。
+    """
+
+    __slots__ = ('_buf', '_type')
+
+    def __init__(self, buffer, offset: int = 0):
+        buf = memoryview(buffer)
+        if buf.ndim != 1 or buf.itemsize != 1:
+            buf = buf.cast('B')
+        if offset or len(buf) != FRAME_SIZE:
+            buf = buf[offset:offset + FRAME_SIZE]
+        if len(buf) != FRAME_SIZE:
+            raise ValueError("数据长度不符合要求")
+        self._buf = buf
+        self._type = buf[0] >> 4
+
+    def _require(self, message_type: int) -> memoryview:
+        if self._type != message_type:
+            raise ValueError(f"报文类型不匹配: {self.message_type}，需要: {MessageType(message_type)}")
+        return self._buf
+
+    @property
+    def buffer(self) -> memoryview:
+        """底层25字节缓冲区"""
+        return self._buf
+
+    # 报文头
+    @property
+    def message_type(self) -> MessageType:
+        return _lookup(_MESSAGE_TYPES, MessageType, self._type)
+
+    @property
+    def protocol_version(self) -> int:
+        return self._buf[0] & 0x0F
+
+    # 基本ID信息 (Message Type 0x0)
+    @property
+    def id_type(self) -> IDType:
+        buf = self._require(_BASIC_ID)
+        return _lookup(_ID_TYPES, IDType, (buf[1] >> 4) & 0x0F)
+
+    @property
+    def ua_type(self) -> UAType:
+        buf = self._require(_BASIC_ID)
+        return _lookup(_UA_TYPES, UAType, buf[1] & 0x0F)
+
+    @property
+    def id(self) -> str:
+        buf = self._require(_BASIC_ID)
+        return bytes(buf[ID_OFFSET:ID_OFFSET + ID_LENGTH]).decode('ascii').rstrip('\0')
+
+    # 位置向量信息 (Message Type 0x1)
+    @property
+    def operational_status(self) -> OperationalStatus:
+        buf = self._require(_LOCATION)
+        return _lookup(_OPERATIONAL_STATUSES, OperationalStatus, (buf[1] >> 4) & 0x0F)
+
+    @property
+    def height_type(self) -> HeightType:
+        buf = self._require(_LOCATION)
+        return _lookup(_HEIGHT_TYPES, HeightType, (buf[1] >> 2) & 0x01)
+
+    @property
+    def direction(self) -> int:
+        buf = self._require(_LOCATION)
+        if not (buf[1] >> 1) & 0x01:  # EWDirectionSegment.BELOW_180
+            return buf[2]
+        return buf[2] + 180
+
+    @property
+    def horizontal_speed(self) -> float:
+        buf = self._require(_LOCATION)
+        if not buf[1] & 0x01:  # SpeedMultiplier.MULTIPLIER_0p25
+            return buf[3] * 0.25
+        return 255 * 0.25 + buf[3] * 0.75
+
+    @property
+    def vertical_speed(self) -> float:
+        buf = self._require(_LOCATION)
+        value = buf[4]
+        if value >= 0x80:
+            value -= 0x100
+        return value * 0.5
+
+    @property
+    def latitude(self) -> float:
+        buf = self._require(_LOCATION)
+        return _unpack_i32(buf, LATITUDE_OFFSET)[0] / 1e7
+
+    @property
+    def longitude(self) -> float:
+        buf = self._require(_LOCATION)
+        return _unpack_i32(buf, LONGITUDE_OFFSET)[0] / 1e7
+
+    @property
+    def pressure_altitude(self) -> float:
+        buf = self._require(_LOCATION)
+        return _unpack_u16(buf, 13)[0] * 0.5 - 1000
+
+    @property
+    def geodetic_altitude(self) -> float:
+        buf = self._require(_LOCATION)
+        return _unpack_u16(buf, GEODETIC_ALTITUDE_OFFSET)[0] * 0.5 - 1000
+
+    @property
+    def height(self) -> float:
+        buf = self._require(_LOCATION)
+        return _unpack_u16(buf, 17)[0] * 0.5 - 1000
+
+    @property
+    def geodetic_accuracy(self) -> VerticalAccuracy:
+        buf = self._require(_LOCATION)
+        return _lookup(_VERTICAL_ACCURACIES, VerticalAccuracy, (buf[19] >> 4) & 0x0F)
+
+    @property
+    def horizontal_accuracy(self) -> HorizontalAccuracy:
+        buf = self._require(_LOCATION)
+        return _lookup(_HORIZONTAL_ACCURACIES, HorizontalAccuracy, buf[19] & 0x0F)
+
+    @property
+    def pressure_accuracy(self) -> VerticalAccuracy:
+        buf = self._require(_LOCATION)
+        return _lookup(_VERTICAL_ACCURACIES, VerticalAccuracy, (buf[20] >> 4) & 0x0F)
+
+    @property
+    def speed_accuracy(self) -> SpeedAccuracy:
+        buf = self._require(_LOCATION)
+        return _lookup(_SPEED_ACCURACIES, SpeedAccuracy, buf[20] & 0x0F)
+
+    @property
+    def timestamp(self) -> int:
+        """整点后的十分之一秒数"""
+        buf = self._require(_LOCATION)
+        return _unpack_u16(buf, TIMESTAMP_OFFSET)[0]
+
+    @property
+    def timestamp_accuracy(self) -> float:
+        buf = self._require(_LOCATION)
+        return (buf[23] & 0x0F) / 10
+
+    # 运行描述信息 (Message Type 0x3)
+    @property
+    def description_type(self) -> DescriptionType:
+        buf = self._require(_SELF_ID)
+        return _lookup(_DESCRIPTION_TYPES, DescriptionType, buf[1])
+
+    @property
+    def description(self) -> str:
+        buf = self._require(_SELF_ID)
+        return bytes(buf[2:25]).decode('ascii').rstrip('\0')
+
+    # 系统信息 (Message Type 0x4)
+    @property
+    def classification_type(self) -> ClassificationType:
+        buf = self._require(_SYSTEM)
+        return _lookup(_CLASSIFICATION_TYPES, ClassificationType, (buf[1] >> 2) & 0x07)
+
+    @property
+    def operator_location_source_type(self) -> OperatorLocationSourceType:
+        buf = self._require(_SYSTEM)
+        return _lookup(_LOCATION_SOURCE_TYPES, OperatorLocationSourceType, buf[1] & 0x03)
+
+    @property
+    def operator_latitude(self) -> float:
+        buf = self._require(_SYSTEM)
+        return _unpack_i32(buf, 2)[0] / 1e7
+
+    @property
+    def operator_longitude(self) -> float:
+        buf = self._require(_SYSTEM)
+        return _unpack_i32(buf, 6)[0] / 1e7
+
+    @property
+    def area_count(self) -> int:
+        buf = self._require(_SYSTEM)
+        return _unpack_u16(buf, 10)[0]
+
+    @property
+    def area_radius(self) -> int:
+        buf = self._require(_SYSTEM)
+        return buf[12] * 10
+
+    @property
+    def area_ceiling(self) -> float:
+        buf = self._require(_SYSTEM)
+        return _unpack_u16(buf, 13)[0] * 0.5 - 1000
+
+    @property
+    def area_floor(self) -> float:
+        buf = self._require(_SYSTEM)
+        return _unpack_u16(buf, 15)[0] * 0.5 - 1000
+
+    @property
+    def eu_ua_category(self) -> EUUACategory:
+        buf = self._require(_SYSTEM)
+        if (buf[1] >> 2) & 0x07 != _EUROPEAN_UNION:
+            return EUUACategory.UNDEFINED
+        return _lookup(_EU_UA_CATEGORIES, EUUACategory, (buf[17] >> 4) & 0x0F)
+
+    @property
+    def eu_ua_class(self) -> EUUAClass:
+        buf = self._require(_SYSTEM)
+        if (buf[1] >> 2) & 0x07 != _EUROPEAN_UNION:
+            return EUUAClass.UNDEFINED
+        return _lookup(_EU_UA_CLASSES, EUUAClass, buf[17] & 0x0F)
+
+    @property
+    def china_ua_category(self) -> ChinaUACategory:
+        buf = self._require(_SYSTEM)
+        if (buf[1] >> 2) & 0x07 != _CHINA:
+            return ChinaUACategory.UNDEFINED
+        return _lookup(_CHINA_UA_CATEGORIES, ChinaUACategory, (buf[17] >> 4) & 0x0F)
+
+    @property
+    def china_ua_class(self) -> ChinaUAClass:
+        buf = self._require(_SYSTEM)
+        if (buf[1] >> 2) & 0x07 != _CHINA:
+            return ChinaUAClass.MINI
+        return _lookup(_CHINA_UA_CLASSES, ChinaUAClass, buf[17] & 0x0F)
+
+    @property
+    def operator_altitude(self) -> float:
+        buf = self._require(_SYSTEM)
+        return _unpack_u16(buf, 18)[0] * 0.5 - 1000
+
+    @property
+    def system_timestamp(self) -> int:
+        """自2019-01-01 00:00:00 UTC起的秒数"""
+        buf = self._require(_SYSTEM)
+        return _unpack_u32(buf, SYSTEM_TIMESTAMP_OFFSET)[0]
+
+    # 控制站ID信息 (Message Type 0x5)
+    @property
+    def operator_id_type(self) -> OperatorIDType:
+        buf = self._require(_OPERATOR_ID)
+        return _lookup(_OPERATOR_ID_TYPES, OperatorIDType, buf[1])
+
+    @property
+    def operator_id(self) -> str:
+        buf = self._require(_OPERATOR_ID)
+        return bytes(buf[ID_OFFSET:ID_OFFSET + ID_LENGTH]).decode('ascii').rstrip('\0')
+
+
+def iter_views(data) -> Iterator[FrameView]:
+    """遍历报文的惰性视图，打包报文按子报文逐个返回，不复制数据"""
+    buf = memoryview(data)
+    if not buf:
+        raise ValueError("空数据")
+    if (buf[0] >> 4) & 0x0F != MessageType.PACK.value:
+        yield FrameView(buf)
+        return
+
+    if buf[1] != FRAME_SIZE:
+        raise ValueError("打包中每个报文的长度不符合要求")
+    num_messages = buf[2]
+    if num_messages > 9:
+        raise ValueError("打包中报文数量最多为9个")
+    for i in range(num_messages):
+        yield FrameView(buf, 3 + i * FRAME_SIZE)
@@ -0,0 +1,169 @@
+from dataclasses import dataclass
+from enum import IntFlag
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from enums import MessageType
+from filters import field
+from fleet import FleetStore
+from view import LATITUDE_OFFSET, LONGITUDE_OFFSET, GEODETIC_ALTITUDE_OFFSET, EARTH_RADIUS, INVALID_ALTITUDE
+
+DEFAULT_VLOS_RANGE = 500.0  # 默认目视视距范围，米
+_RELEVANT = {MessageType.LOCATION.value, MessageType.SYSTEM.value, MessageType.PACK.value}
+
+
+class Violation(IntFlag):
+    """视距与运行区域检查结果，可按位组合"""
+    NONE = 0x0
+    BEYOND_VLOS = 0x1  # 与控制站的三维距离超出目视视距范围
+    OUTSIDE_AREA = 0x2  # 与控制站的水平距离超出运行区域半径
+    ABOVE_CEILING = 0x4  # 几何高度高于运行区域高度上限
+    BELOW_FLOOR = 0x8  # 几何高度低于运行区域高度下限
+
+
+@dataclass
+class Separation:
+    """一架航空器与其控制站的距离及检查结果，距离未知时为 NaN"""
+    horizontal: float
+    distance: float
+    violations: Violation
+
+
+def haversine(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """向量化的大圆距离（米），参数为经纬度数组"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype=np.float64)) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class VLOSMonitor:
+    """控制站与航空器距离及目视视距合规监视
+
+    报文写入 FleetStore 时只记录涉及的行号；每次调用 tick 时，对上次以来有更新的航空器联合其最近的
+    系统报文和位置向量报文，向量化计算水平（大圆）距离和三维距离并检查运行区域，结果按行号保存在数组中，
+    代价与有更新的航空器数量成正比。修改 vlos_range 后调用 refresh 重新计算整个机群。
+
+    只收到其中一类报文，或控制站/航空器位置未知（经纬度均为0）时距离为 NaN，不做任何检查；
+    高度无效（-1000米）时三维距离按水平距离计算，并跳过高度上下限检查；
+    运行区域半径为0或高度上下限无效表示未声明，不做对应检查。
+    """
+
+    def __init__(self, store: Optional[FleetStore] = None, vlos_range: float = DEFAULT_VLOS_RANGE):
+        if vlos_range <= 0:
+            raise ValueError("目视视距范围必须大于0")
+        self.store = store if store is not None else FleetStore()
+        self.vlos_range = vlos_range
+        self._horizontal = np.empty(0, dtype=np.float64)
+        self._distance = np.empty(0, dtype=np.float64)
+        self._violations = np.empty(0, dtype=np.uint8)
+        self._dirty: List[int] = []  # update 标记的待检查行号
+        self._dirty_batches: List[np.ndarray] = []  # update_many 标记的待检查行号
+        self._resize()
+
+    def _resize(self) -> None:
+        """状态表扩容后同步扩大结果数组"""
+        capacity = self.store.capacity
+        old = len(self._distance)
+        if old == capacity:
+            return
+        for name, fill in (('_horizontal', np.nan), ('_distance', np.nan), ('_violations', 0)):
+            array = getattr(self, name)
+            grown = np.full(capacity, fill, dtype=array.dtype)
+            grown[:old] = array
+            setattr(self, name, grown)
+
+    def update(self, address: bytes, data: bytes, received: Optional[float] = None) -> int:
+        """写入一个报文并将该航空器标记为待检查，返回行号"""
+        slot = self.store.update(address, data, received)
+        if data[0] >> 4 in _RELEVANT:
+            self._dirty.append(slot)
+        return slot
+
+    def update_many(self, addresses: Sequence[bytes], frames, received=None) -> np.ndarray:
+        """批量写入25字节报文并将涉及的航空器标记为待检查，返回各报文的行号"""
+        slots = self.store.update_many(addresses, frames, received)
+        self._dirty_batches.append(slots)
+        return slots
+
+    def tick(self) -> np.ndarray:
+        """重新检查上次以来有更新的航空器，返回检查结果发生变化的行号"""
+        batches = self._dirty_batches
+        if self._dirty:
+            batches.append(np.array(self._dirty, dtype=np.intp))
+        if not batches:
+            return np.empty(0, dtype=np.intp)
+        slots = np.unique(np.concatenate(batches))
+        self._dirty = []
+        self._dirty_batches = []
+        return self._evaluate(slots)
+
+    def refresh(self) -> np.ndarray:
+        """重新检查整个机群，返回检查结果发生变化的行号"""
+        self._dirty = []
+        self._dirty_batches = []
+        return self._evaluate(np.arange(len(self.store), dtype=np.intp))
+
+    def _evaluate(self, slots: np.ndarray) -> np.ndarray:
+        self._resize()
+        store = self.store
+        # 只解码需要的字段，偏移与 columns 模块一致
+        location = store.frames(MessageType.LOCATION)[slots]
+        system = store.frames(MessageType.SYSTEM)[slots]
+        lat = field(location, LATITUDE_OFFSET, '<i4') / 1e7
+        lon = field(location, LONGITUDE_OFFSET, '<i4') / 1e7
+        op_lat = field(system, 2, '<i4') / 1e7
+        op_lon = field(system, 6, '<i4') / 1e7
+        known = (~np.isnan(store.received(MessageType.LOCATION)[slots])
+                 & ~np.isnan(store.received(MessageType.SYSTEM)[slots])
+                 & ((lat != 0) | (lon != 0)) & ((op_lat != 0) | (op_lon != 0)))
+
+        altitude = field(location, GEODETIC_ALTITUDE_OFFSET, '<u2') * 0.5 - 1000
+        op_altitude = field(system, 18, '<u2') * 0.5 - 1000
+        horizontal = np.where(known, haversine(op_lat, op_lon, lat, lon), np.nan)
+        vertical = np.where((altitude != INVALID_ALTITUDE) & (op_altitude != INVALID_ALTITUDE), altitude - op_altitude, 0.0)
+        distance = np.hypot(horizontal, vertical)
+
+        radius = system[:, 12] * 10.0
+        ceiling = field(system, 13, '<u2') * 0.5 - 1000
+        floor = field(system, 15, '<u2') * 0.5 - 1000
+        valid_altitude = known & (altitude != INVALID_ALTITUDE)
+        violations = (
+            np.where(distance > self.vlos_range, Violation.BEYOND_VLOS, 0)
+            | np.where((radius > 0) & (horizontal > radius), Violation.OUTSIDE_AREA, 0)
+            | np.where(valid_altitude & (ceiling != INVALID_ALTITUDE) & (altitude > ceiling), Violation.ABOVE_CEILING, 0)
+            | np.where(valid_altitude & (floor != INVALID_ALTITUDE) & (altitude < floor), Violation.BELOW_FLOOR, 0)
+        ).astype(np.uint8)
+
+        changed = slots[self._violations[slots] != violations]
+        self._horizontal[slots] = horizontal
+        self._distance[slots] = distance
+        self._violations[slots] = violations
+        return changed
+
+    def horizontal_distance(self) -> np.ndarray:
+        """各航空器与控制站的水平距离（米），按行号排列"""
+        return self._horizontal[:len(self.store)]
+
+    def distance(self) -> np.ndarray:
+        """各航空器与控制站的三维距离（米），按行号排列"""
+        return self._distance[:len(self.store)]
+
+    def violations(self) -> np.ndarray:
+        """各航空器的检查结果（Violation 取值），按行号排列"""
+        return self._violations[:len(self.store)]
+
+    def get(self, address: bytes) -> Optional[Separation]:
+        """一架航空器的距离及检查结果"""
+        if address not in self.store:
+            return None
+        slot = self.store.slot(address)
+        return Separation(float(self._horizontal[slot]), float(self._distance[slot]),
+                          Violation(int(self._violations[slot])))
+
+    def violating(self, flags: Optional[Violation] = None) -> List[bytes]:
+        """检查结果包含任一指定标志（默认为任一标志）的航空器广播地址"""
+        violations = self.violations()
+        slots = np.flatnonzero(violations != 0 if flags is None else violations & int(flags))
+        addresses = self.store.addresses
+        return [addresses[i] for i in slots.tolist()]